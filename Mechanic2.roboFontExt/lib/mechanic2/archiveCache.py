@@ -0,0 +1,159 @@
+import os
+import time
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import threading
+import atexit
+import logging
+from contextlib import contextmanager
+
+from .mechanicTools import downloadURLToFile, mechanicCacheFolder
+from .zipTools import HTTPRangeFile, RangeNotSupported, RemoteFileChanged
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class ArchiveCache(object):
+
+    """
+    A short lived cache of remote zip files, for the duration of a session.
+
+    Zip files read with range requests keep their downloaded parts in
+    memory, a following install from the same zip file only downloads
+    the missing members. Zip files downloaded completely are stored in
+    `folder`, named by the sha1 of their content, so identical zip files
+    at different urls are stored once.
+    Entries older than `timeToLive` seconds are opened again, the folder
+    is cleared when the session ends. A zip file read with range requests
+    is checked with a single byte request before it is reused, and opened
+    again when the remote zip file changed.
+    """
+
+    def __init__(self, folder, timeToLive=60 * 15, maxMemorySize=100 * 1024 * 1024):
+        self.folder = folder
+        self.timeToLive = timeToLive
+        self.maxMemorySize = maxMemorySize
+        self._entries = dict()
+        self._urlLocks = dict()
+        self._lock = threading.Lock()
+        atexit.register(self.clear)
+
+    @contextmanager
+    def open(self, url):
+        """
+        Open the zip file at `url` as a `zipfile.ZipFile`, use it as a context manager.
+        The same url is never read by two threads at the same time.
+        """
+        with self._urlLock(url):
+            entry = self._entry(url)
+            if entry is not None and isinstance(entry["source"], HTTPRangeFile) and not entry["source"].isUnchanged():
+                # never combine parts of different zip files
+                self._remove(url)
+                entry = None
+            if entry is None:
+                entry = self._download(url)
+            source = entry["source"]
+            if isinstance(source, HTTPRangeFile):
+                source.seek(0)
+            try:
+                zipFile = zipfile.ZipFile(source)
+            except RemoteFileChanged:
+                self._remove(url)
+                raise
+            try:
+                yield zipFile
+            except RemoteFileChanged:
+                # the remote zip file changed while reading, open it again the next time
+                self._remove(url)
+                raise
+            finally:
+                zipFile.close()
+                self._prune()
+
+    def clear(self):
+        with self._lock:
+            self._entries = dict()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    # helpers
+
+    def _urlLock(self, url):
+        with self._lock:
+            if url not in self._urlLocks:
+                self._urlLocks[url] = threading.Lock()
+            return self._urlLocks[url]
+
+    def _remove(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def _entry(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if entry["storedAt"] + self.timeToLive < time.time():
+                del self._entries[url]
+                return None
+            source = entry["source"]
+            if not isinstance(source, HTTPRangeFile) and not os.path.exists(source):
+                del self._entries[url]
+                return None
+            return entry
+
+    def _download(self, url):
+        try:
+            source = HTTPRangeFile(url)
+        except RangeNotSupported:
+            os.makedirs(self.folder, exist_ok=True)
+            fd, tempPath = tempfile.mkstemp(dir=self.folder)
+            os.close(fd)
+            try:
+                downloadURLToFile(url, tempPath)
+                digest = hashlib.sha1()
+                with open(tempPath, "rb") as f:
+                    for chunk in iter(lambda: f.read(65536), b""):
+                        digest.update(chunk)
+                source = os.path.join(self.folder, "%s.zip" % digest.hexdigest())
+                os.replace(tempPath, source)
+            except Exception:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+                raise
+        entry = dict(source=source, storedAt=time.time())
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def _prune(self):
+        # remove expired entries and keep the parts in memory below the maximum size
+        now = time.time()
+        with self._lock:
+            for url, entry in list(self._entries.items()):
+                if entry["storedAt"] + self.timeToLive < now:
+                    del self._entries[url]
+            rangeEntries = sorted(
+                ((entry["storedAt"], url) for url, entry in self._entries.items() if isinstance(entry["source"], HTTPRangeFile)),
+                reverse=True
+            )
+            memorySize = 0
+            for storedAt, url in rangeEntries:
+                memorySize += self._entries[url]["source"].bytesDownloaded
+                if memorySize > self.maxMemorySize:
+                    del self._entries[url]
+            used = set(entry["source"] for entry in self._entries.values() if not isinstance(entry["source"], HTTPRangeFile))
+        if not os.path.exists(self.folder):
+            return
+        for fileName in os.listdir(self.folder):
+            path = os.path.join(self.folder, fileName)
+            if fileName.endswith(".zip") and path not in used:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+archiveCache = ArchiveCache(mechanicCacheFolder("archives"))
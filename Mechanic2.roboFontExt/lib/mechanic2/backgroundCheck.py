@@ -0,0 +1,99 @@
+import threading
+import logging
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class BackgroundUpdateChecker(object):
+
+    """
+    Check all extension items for updates without any ui.
+
+    The url streams are fetched, the items are created and checked for
+    updates on worker threads, streams which cannot be read fall back to
+    the last loaded catalog. The result is stored in the catalog snapshot,
+    so the Mechanic window shows the updates right away.
+
+    When done `callback(items)` is called with a list of the items which
+    need an update, through `dispatch(function, *args)`. Pass `callAfter`
+    to get the callback on the main thread.
+    Optionally download the updates in the background with `prefetch`.
+
+    All modules are imported on the background thread, starting a check
+    costs the calling thread nothing.
+    """
+
+    def __init__(self, urlStreams, singleExtensions=(), callback=None, dispatch=None, prefetch=False, maxBytesPerSecond=1024 * 1024, cacheSizes=None):
+        self.urlStreams = list(urlStreams)
+        self.singleExtensions = list(singleExtensions)
+        self.callback = callback
+        self.dispatch = dispatch
+        self.prefetch = prefetch
+        self.maxBytesPerSecond = maxBytesPerSecond
+        self.cacheSizes = cacheSizes
+        self._cancelled = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._check, name="MechanicUpdateCheck")
+        # never keep the application from quitting
+        self._thread.daemon = True
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def isDone(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    # helpers
+
+    def _check(self):
+        # called from a background thread
+        try:
+            updates = self.check()
+        except Exception as e:
+            logger.error("Cannot check for updates in the background")
+            logger.error(e)
+            return
+        if self._cancelled or updates is None or self.callback is None:
+            return
+        if self.dispatch is None:
+            self.callback(updates)
+        else:
+            self.dispatch(self.callback, updates)
+
+    def check(self):
+        """
+        Check for updates on the current thread.
+        Return a list of the items which need an update, or `None` when cancelled.
+        """
+        from .mechanicTools import httpCache
+        from .bundleStore import bundleStore
+        from .streams import fetchStreams, createStreamItems, createSingleItems
+        from .updateChecker import UpdateChecker
+        from .updatePrefetcher import UpdatePrefetcher
+        from .catalogSnapshot import catalogSnapshot
+
+        if self.cacheSizes:
+            httpCache.setMaxSize(self.cacheSizes["httpCacheSize"])
+            bundleStore.setMaxSize(self.cacheSizes["bundleStoreSize"])
+            bundleStore.setMaxVersions(self.cacheSizes["bundleStoreVersions"])
+        snapshot = catalogSnapshot.load() or dict()
+        streams = fetchStreams(self.urlStreams, fallback=snapshot.get("streams"))
+        if self._cancelled:
+            return None
+        items = []
+        for url in self.urlStreams:
+            items.extend(createStreamItems(url, streams.get(url, []), checkForUpdates=True))
+        items.extend(createSingleItems(self.singleExtensions, checkForUpdates=True))
+        results = UpdateChecker().check(items)
+        if self._cancelled:
+            return None
+        catalogSnapshot.save(streams, items)
+        updates = [item for item in items if results.get(item)]
+        if self.prefetch and updates:
+            prefetcher = UpdatePrefetcher(maxBytesPerSecond=self.maxBytesPerSecond)
+            prefetcher.start(updates)
+        return updates
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import hashlib
+import zipfile
+import tempfile
+import threading
+import logging
+
+from .mechanicTools import mechanicCacheFolder
+from .zipTools import extractBundle
+
+
+logger = logging.getLogger("Mechanic")
+
+
+def bundleHash(bundlePath):
+    """
+    Return the sha1 of the relative paths and contents of all files in a bundle.
+    """
+    digest = hashlib.sha1()
+    for relativePath, path in _bundleFiles(bundlePath):
+        digest.update(relativePath.encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _bundleFiles(bundlePath):
+    files = []
+    for root, dirs, fileNames in os.walk(bundlePath):
+        dirs.sort()
+        for fileName in sorted(fileNames):
+            path = os.path.join(root, fileName)
+            files.append((os.path.relpath(path, bundlePath).replace(os.sep, "/"), path))
+    return files
+
+
+class BundleStore(object):
+
+    """
+    A local store with the last versions of extension bundles.
+
+    Each version is stored as a zip file named by the hash of the bundle
+    content, with the url it was downloaded from. Only the last
+    `maxVersions` versions of a bundle are kept, the oldest versions of
+    all bundles are removed when the store is larger than `maxSize` bytes.
+    """
+
+    indexFileName = "index.json"
+
+    def __init__(self, folder, maxVersions=3, maxSize=200 * 1024 * 1024):
+        self.folder = folder
+        self.maxVersions = maxVersions
+        self.maxSize = maxSize
+        self._index = None
+        self._lock = threading.RLock()
+
+    def versions(self, bundleName):
+        """
+        Return a list of the stored entries of a bundle, newest first.
+        Each entry is a dict with the `version`, `url`, `hash`, `size` and `storedAt` keys.
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._getIndex().get(bundleName, [])]
+
+    def find(self, bundleName, version, url=None):
+        """
+        Return the stored entry of a bundle version, or `None`.
+        When a `url` is given only a version downloaded from that url is returned.
+        """
+        version = str(version)
+        for entry in self.versions(bundleName):
+            if entry["version"] != version:
+                continue
+            if url is not None and entry.get("url") != url:
+                continue
+            return entry
+        return None
+
+    def store(self, bundleName, bundlePath, version, url=None):
+        """
+        Store a version of a bundle from the bundle folder at `bundlePath`.
+        """
+        version = str(version)
+        contentHash = bundleHash(bundlePath)
+        with self._lock:
+            index = self._getIndex()
+            entries = [entry for entry in index.get(bundleName, []) if entry["version"] != version]
+            path = self._archivePath(contentHash)
+            if not os.path.exists(path):
+                os.makedirs(self.folder, exist_ok=True)
+                fd, tempPath = tempfile.mkstemp(dir=self.folder)
+                with os.fdopen(fd, "wb") as f:
+                    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zipFile:
+                        for relativePath, filePath in _bundleFiles(bundlePath):
+                            zipFile.write(filePath, "%s/%s" % (bundleName, relativePath))
+                os.replace(tempPath, path)
+            entry = dict(
+                version=version,
+                url=url,
+                hash=contentHash,
+                size=os.path.getsize(path),
+                storedAt=time.time()
+            )
+            entries.insert(0, entry)
+            index[bundleName] = entries[:self.maxVersions]
+            self._evict()
+            self._save()
+            return dict(entry)
+
+    def open(self, bundleName, version, url=None):
+        """
+        Return a `zipfile.ZipFile` with a stored version of a bundle, or `None` when the version is not stored.
+        """
+        entry = self.find(bundleName, version, url)
+        if entry is None:
+            return None
+        path = self._archivePath(entry["hash"])
+        if not os.path.exists(path):
+            self.remove(bundleName, version)
+            return None
+        return zipfile.ZipFile(path)
+
+    def extract(self, bundleName, version, destination, url=None):
+        """
+        Extract a stored version of a bundle into `destination`.
+        Return the path to the extracted bundle or `None` when the version is not stored.
+        """
+        zipFile = self.open(bundleName, version, url)
+        if zipFile is None:
+            return None
+        with zipFile:
+            return extractBundle(zipFile, bundleName, destination)
+
+    def remove(self, bundleName, version=None):
+        """
+        Remove a stored version of a bundle, or all versions.
+        """
+        with self._lock:
+            index = self._getIndex()
+            if version is None:
+                index.pop(bundleName, None)
+            else:
+                index[bundleName] = [entry for entry in index.get(bundleName, []) if entry["version"] != str(version)]
+            self._evict()
+            self._save()
+
+    def totalSize(self):
+        with self._lock:
+            sizes = dict()
+            for entries in self._getIndex().values():
+                for entry in entries:
+                    sizes[entry["hash"]] = entry["size"]
+            return sum(sizes.values())
+
+    def setMaxSize(self, maxSize):
+        if maxSize == self.maxSize:
+            return
+        with self._lock:
+            self.maxSize = maxSize
+            self._evict()
+            self._save()
+
+    def setMaxVersions(self, maxVersions):
+        if maxVersions == self.maxVersions:
+            return
+        with self._lock:
+            self.maxVersions = maxVersions
+            index = self._getIndex()
+            for bundleName in index:
+                index[bundleName] = index[bundleName][:maxVersions]
+            self._evict()
+            self._save()
+
+    # helpers
+
+    def _archivePath(self, contentHash):
+        return os.path.join(self.folder, "%s.zip" % contentHash)
+
+    def _getIndex(self):
+        if self._index is None:
+            self._index = dict()
+            path = os.path.join(self.folder, self.indexFileName)
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        self._index = json.loads(f.read())
+                except Exception as e:
+                    logger.error("Cannot read the bundle store index '%s'" % path)
+                    logger.error(e)
+        return self._index
+
+    def _evict(self):
+        # remove the oldest versions until the store fits, then remove unused zip files
+        index = self._getIndex()
+        for bundleName in [bundleName for bundleName, entries in index.items() if not entries]:
+            del index[bundleName]
+        while self.totalSize() > self.maxSize:
+            entries = [(entry["storedAt"], bundleName, entry) for bundleName, bundleEntries in index.items() for entry in bundleEntries]
+            if not entries:
+                break
+            storedAt, bundleName, entry = min(entries, key=lambda item: item[0])
+            index[bundleName].remove(entry)
+            if not index[bundleName]:
+                del index[bundleName]
+        used = set(entry["hash"] for entries in index.values() for entry in entries)
+        if not os.path.exists(self.folder):
+            return
+        for fileName in os.listdir(self.folder):
+            if fileName.endswith(".zip") and fileName[:-4] not in used:
+                try:
+                    os.remove(os.path.join(self.folder, fileName))
+                except OSError:
+                    pass
+
+    def _save(self):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            fd, tempPath = tempfile.mkstemp(dir=self.folder)
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(self._getIndex(), separators=(",", ":")).encode("utf-8"))
+            os.replace(tempPath, os.path.join(self.folder, self.indexFileName))
+        except Exception as e:
+            logger.error("Cannot write the bundle store index '%s'" % self.folder)
+            logger.error(e)
+
+
+bundleStore = BundleStore(mechanicCacheFolder("bundles"))
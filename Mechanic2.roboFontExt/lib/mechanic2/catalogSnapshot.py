@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import tempfile
+import logging
+
+from .mechanicTools import getRemembered, getRememberedTime, setRemembered, mechanicCacheFolder
+from .versionTools import LooseVersion
+from .extensionItem import remoteVersionTimeToLive
+
+
+logger = logging.getLogger("Mechanic")
+
+
+def remoteVersionKey(item):
+    """
+    Return the key to store the remote version of an item,
+    `None` for items without a remote info.plist.
+    """
+    remoteInfoPath = getattr(item, "remoteInfoPath", None)
+    if remoteInfoPath is None:
+        return None
+    try:
+        return remoteInfoPath()
+    except Exception:
+        return None
+
+
+def collectRemoteVersions(items):
+    """
+    Return a dict with the already retrieved remote versions of the given items,
+    as `(version, retrievedAt)` tuples.
+    """
+    remoteVersions = dict()
+    for item in items:
+        key = remoteVersionKey(item)
+        if key is None:
+            continue
+        version = getRemembered(item, "remoteVersion")
+        if version is not None:
+            retrievedAt = getRememberedTime(item, "remoteVersion") or time.time()
+            remoteVersions[key] = (str(version), retrievedAt)
+    return remoteVersions
+
+
+def applyRemoteVersions(items, remoteVersions):
+    """
+    Set the remote versions of the given items from a dict of remote versions.
+    Items with a remote version will show updates without checking again,
+    until the time to live since the version was retrieved is passed.
+    """
+    for item in items:
+        key = remoteVersionKey(item)
+        if key in remoteVersions:
+            version, retrievedAt = remoteVersions[key]
+            item._shouldCheckForUpdates = True
+            setRemembered(item, "remoteVersion", LooseVersion(version), rememberedAt=retrievedAt)
+
+
+class CatalogSnapshot(object):
+
+    """
+    The last successfully loaded catalog, stored on disk.
+
+    A snapshot contains the parsed entries of each url stream
+    and the remote versions retrieved by the last update checks,
+    each with the time it was retrieved.
+    The install state is not stored, it is read from the installed
+    extensions index.
+    """
+
+    version = 2
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """
+        Return the snapshot data, or `None` when there is no valid snapshot.
+        Remote versions older than a day are left out.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = json.loads(f.read())
+        except Exception as e:
+            logger.error("Cannot read the catalog snapshot '%s'" % self.path)
+            logger.error(e)
+            return None
+        if data.get("version") != self.version:
+            return None
+        expired = time.time() - remoteVersionTimeToLive
+        data["remoteVersions"] = dict(
+            (key, (version, retrievedAt)) for key, (version, retrievedAt) in data.get("remoteVersions", dict()).items()
+            if retrievedAt > expired
+        )
+        return data
+
+    def save(self, streams, items):
+        """
+        Store the entries of the given url `streams` dict and the remote versions of the given `items`.
+        """
+        previous = self.load() or dict()
+        remoteVersions = collectRemoteVersions(items)
+        if not remoteVersions:
+            # keep the remote versions of the last update check
+            remoteVersions = previous.get("remoteVersions", dict())
+        data = dict(
+            version=self.version,
+            time=time.time(),
+            streams=streams,
+            remoteVersions=remoteVersions,
+        )
+        try:
+            folder = os.path.dirname(self.path)
+            os.makedirs(folder, exist_ok=True)
+            fd, tempPath = tempfile.mkstemp(dir=folder)
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+            os.replace(tempPath, self.path)
+        except Exception as e:
+            logger.error("Cannot write the catalog snapshot '%s'" % self.path)
+            logger.error(e)
+
+
+catalogSnapshot = CatalogSnapshot(mechanicCacheFolder("catalog.json"))
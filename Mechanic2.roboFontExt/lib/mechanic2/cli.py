@@ -0,0 +1,203 @@
+"""
+Command line interface for Mechanic, runs without RoboFont.
+
+    python -m mechanic2 list
+    python -m mechanic2 check --json
+    python -m mechanic2 install "Batch" "Glyph Construction"
+    python -m mechanic2 update --all
+    python -m mechanic2 sync extensions.json
+
+Add the `lib` folder of the Mechanic extension to the `PYTHONPATH`.
+Extensions are installed into the RoboFont extensions folder,
+RoboFont registers them at the next launch.
+
+The exit code is 1 when a stream cannot be read or an install fails,
+and 2 when an extension cannot be found.
+"""
+
+import sys
+import json
+import argparse
+import logging
+
+from .defaults import mechanicDefaults
+from .mechanicTools import httpCache
+from .installedIndex import installedExtensions
+from .streams import fetchStreams, createStreamItems, findItems
+from .updateChecker import UpdateChecker
+from .installPipeline import InstallPipeline
+from .manifest import Manifest, Lockfile, syncManifest
+
+
+logger = logging.getLogger("Mechanic")
+
+
+def loadItems(urls):
+    """
+    Return a list of extension items from all url streams, all streams are fetched at the same time,
+    and a dict with the error of each stream which cannot be read.
+    """
+    errors = dict()
+    streams = fetchStreams(urls, errors=errors)
+    items = []
+    for url in urls:
+        items.extend(createStreamItems(url, streams.get(url, []), checkForUpdates=True))
+    return items, errors
+
+
+def itemInfo(item, needsUpdate=None, error=None):
+    """
+    Return a dict describing an extension item.
+    """
+    installedVersion = installedExtensions.version(item.extensionBundleName())
+    remoteVersion = item.knownRemoteVersion()
+    info = dict(
+        name=item.extensionName(),
+        bundleName=item.extensionBundleName(),
+        developer=item.extensionDeveloper(),
+        source=item.extensionSource(),
+        installedVersion=installedVersion,
+        remoteVersion=str(remoteVersion) if remoteVersion is not None else None,
+    )
+    if needsUpdate is not None:
+        info["needsUpdate"] = needsUpdate
+    if error is not None:
+        info["error"] = str(error)
+    return info
+
+
+# commands
+
+def listCommand(arguments, urls):
+    items, errors = loadItems(urls)
+    if arguments.installed:
+        items = [item for item in items if item.isExtensionInstalled()]
+    return int(bool(errors)), [itemInfo(item) for item in items]
+
+
+def checkCommand(arguments, urls):
+    items, errors = loadItems(urls)
+    items = [item for item in items if item.isExtensionInstalled()]
+    results = UpdateChecker().check(items)
+    return int(bool(errors)), [itemInfo(item, needsUpdate=True) for item in items if results.get(item)]
+
+
+def installCommand(arguments, urls):
+    items, errors = loadItems(urls)
+    found, missing = findItems(items, arguments.names)
+    if missing:
+        logger.error("Cannot find the extensions: %s" % ", ".join(missing))
+        return 2, None
+    return _install(found, forcedUpdate=arguments.force)
+
+
+def updateCommand(arguments, urls):
+    items, errors = loadItems(urls)
+    if arguments.all:
+        found = items
+    else:
+        found, missing = findItems(items, arguments.names)
+        if missing:
+            logger.error("Cannot find the extensions: %s" % ", ".join(missing))
+            return 2, None
+    found = [item for item in found if item.isExtensionInstalled()]
+    results = UpdateChecker().check(found)
+    exitCode, infos = _install([item for item in found if results.get(item)])
+    return max(exitCode, int(bool(errors))), infos
+
+
+def _install(items, forcedUpdate=False):
+    results = InstallPipeline().run(items, forcedUpdate=forcedUpdate)
+    infos = [itemInfo(item, error=results.get(item)) for item in items]
+    failed = any(results.get(item) is not None for item in items)
+    return int(failed), infos
+
+
+def syncCommand(arguments, urls):
+    manifest = Manifest.read(arguments.manifest)
+    lockfile = Lockfile(arguments.lockfile or manifest.lockPath())
+    results = syncManifest(manifest, lockfile, streams=urls, update=arguments.update)
+    failed = any(result["action"] == "failed" for result in results)
+    return int(failed), results
+
+
+commands = dict(
+    list=listCommand,
+    check=checkCommand,
+    install=installCommand,
+    update=updateCommand,
+    sync=syncCommand,
+)
+
+
+# output
+
+def formatInfos(command, infos):
+    lines = []
+    for info in infos:
+        if info.get("error"):
+            line = "%s: failed, %s" % (info["name"], info["error"])
+        elif command == "sync":
+            line = "%s: %s (%s)" % (info["name"], info["version"], info["action"])
+        elif command == "check":
+            line = "%s: %s -> %s" % (info["name"], info["installedVersion"], info["remoteVersion"])
+        elif command in ("install", "update"):
+            line = "%s: %s" % (info["name"], info["installedVersion"])
+        else:
+            line = "%s: %s" % (info["name"], info["installedVersion"] or "not installed")
+            if info["developer"]:
+                line += " (%s)" % info["developer"]
+        lines.append(line)
+    if not infos:
+        lines.append(dict(check="No updates.", update="Nothing to update.").get(command, "No extensions."))
+    return "\n".join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="mechanic2", description="Install and update RoboFont extensions.")
+    parser.add_argument("--stream", action="append", dest="streams", metavar="URL", help="An extension json stream, repeat for more streams (default: the extension store and the Mechanic registry).")
+    parser.add_argument("--extensions-folder", metavar="PATH", help="The RoboFont extensions folder.")
+    parser.add_argument("--json", action="store_true", help="Write the result as json.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    listParser = subparsers.add_parser("list", help="List all extensions in the streams.")
+    listParser.add_argument("--installed", action="store_true", help="Only list installed extensions.")
+
+    subparsers.add_parser("check", help="List the installed extensions with an update.")
+
+    installParser = subparsers.add_parser("install", help="Install extensions by name.")
+    installParser.add_argument("names", nargs="+")
+    installParser.add_argument("--force", action="store_true", help="Install even when the installed version is up to date.")
+
+    updateParser = subparsers.add_parser("update", help="Update installed extensions.")
+    updateParser.add_argument("names", nargs="*")
+    updateParser.add_argument("--all", action="store_true", help="Update all installed extensions.")
+
+    syncParser = subparsers.add_parser("sync", help="Install the extensions of a manifest file and write a lockfile.")
+    syncParser.add_argument("manifest", help="A json or yaml manifest file.")
+    syncParser.add_argument("--lockfile", metavar="PATH", help="The lockfile (default: <manifest>.lock.json).")
+    syncParser.add_argument("--update", action="store_true", help="Install the latest version of entries without a pinned version.")
+
+    arguments = parser.parse_args(args)
+    if arguments.command == "update" and not (arguments.all or arguments.names):
+        parser.error("provide extension names or --all")
+
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+    if arguments.extensions_folder:
+        installedExtensions.setFolder(arguments.extensions_folder)
+    httpCache.setMaxSize(mechanicDefaults["com.mechanic.httpCacheSize"])
+    urls = arguments.streams or list(mechanicDefaults["com.mechanic.urlstreams"])
+
+    exitCode, infos = commands[arguments.command](arguments, urls)
+    if infos is None:
+        return exitCode
+    if arguments.json:
+        print(json.dumps(infos, indent=2))
+    else:
+        print(formatInfos(arguments.command, infos))
+    return exitCode
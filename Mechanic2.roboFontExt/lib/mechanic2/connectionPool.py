@@ -0,0 +1,332 @@
+import ssl
+import base64
+import threading
+import http.client
+import urllib.request
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, urljoin, unquote
+from urllib.error import HTTPError
+
+
+redirectStatusCodes = (301, 302, 303, 307, 308)
+
+_transferObservers = threading.local()
+
+
+@contextmanager
+def observeTransfers(callback):
+    """
+    Call `callback` with the size of each chunk of a response body read on the current thread.
+    The callback can sleep to slow down the transfer or raise an error to abort it.
+    """
+    previous = getattr(_transferObservers, "callback", None)
+    _transferObservers.callback = callback
+    try:
+        yield
+    finally:
+        _transferObservers.callback = previous
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+
+    """
+    A https connection resuming the tls session of previous connections to the same host.
+    """
+
+    def __init__(self, host, pool, **kwargs):
+        super(_HTTPSConnection, self).__init__(host, **kwargs)
+        self._pool = pool
+
+    def serverHostName(self):
+        # through a proxy the connection is tunneled to the server
+        return self._tunnel_host or self.host
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        serverHostName = self.serverHostName()
+        session = self._pool._tlsSessions.get(serverHostName)
+        try:
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=serverHostName, session=session)
+        except ssl.SSLError:
+            if session is None:
+                raise
+            # the server refused the session, start a fresh one
+            self._pool._tlsSessions.pop(serverHostName, None)
+            http.client.HTTPConnection.connect(self)
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=serverHostName)
+
+
+class PooledResponse(object):
+
+    """
+    A response object wrapping a `http.client.HTTPResponse`.
+
+    The connection is given back to the pool when the response is closed.
+    Use it as a context manager or close it explicitly.
+    """
+
+    def __init__(self, pool, key, connection, response, url):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self, amt=None):
+        observer = getattr(_transferObservers, "callback", None)
+        if observer is None:
+            return self._response.read(amt)
+        if amt is None:
+            # read in chunks to report the progress
+            return b"".join(self.iterChunks())
+        data = self._response.read(amt)
+        observer(len(data))
+        return data
+
+    def iterChunks(self, chunkSize=65536):
+        """
+        Iterate over the body in chunks of `chunkSize` bytes.
+        """
+        observer = getattr(_transferObservers, "callback", None)
+        while True:
+            chunk = self._response.read(chunkSize)
+            if not chunk:
+                break
+            if observer is not None:
+                observer(len(chunk))
+            yield chunk
+
+    def close(self):
+        if self._connection is None:
+            return
+        reusable = self._response.isclosed() and not self._response.will_close
+        if not reusable:
+            self._response.close()
+        self._pool._release(self._key, self._connection, reusable)
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool(object):
+
+    """
+    A thread safe pool of keep-alive http(s) connections.
+
+    All https connections share a single ssl context and reuse
+    the tls session of the previous connection to the same host.
+    The amount of open connections per host is limited, requests
+    wait for a free connection.
+
+    The proxies of the environment or the system settings are used, like
+    `urlopen` does: http requests are sent to the proxy, https connections
+    are tunneled through it. Hosts in `no_proxy` are connected directly.
+    """
+
+    def __init__(self, maxConnectionsPerHost=6, timeout=5, maxRedirects=10, proxies=None):
+        self.maxConnectionsPerHost = maxConnectionsPerHost
+        self.timeout = timeout
+        self.maxRedirects = maxRedirects
+        self.sslContext = ssl._create_unverified_context()
+        self._idle = dict()
+        self._hostLimits = dict()
+        self._tlsSessions = dict()
+        self._hostAliases = dict()
+        self._proxies = proxies
+        self._proxyBypass = dict()
+        self._lock = threading.Lock()
+
+    def setProxies(self, proxies):
+        """
+        Set a dict of proxy urls by scheme, like `urllib.request.getproxies()` returns,
+        with an optional `no` key. Set `proxies` to `None` to use the environment proxies again.
+        """
+        with self._lock:
+            self._proxies = proxies
+            self._proxyBypass = dict()
+
+    def setHostAlias(self, host, target):
+        """
+        Send all requests for `host` to `target`, a url like `http://127.0.0.1:8000`,
+        for example to a local stand-in server. Set `target` to `None` to remove the alias.
+        """
+        with self._lock:
+            if target is None:
+                self._hostAliases.pop(host, None)
+            else:
+                self._hostAliases[host] = target
+
+    def request(self, url, headers=None, method="GET"):
+        """
+        Send a request to the given `url`, following redirects.
+        Return a `PooledResponse`, the caller must close it.
+        """
+        url = url.replace(" ", "%20")
+        for _ in range(self.maxRedirects + 1):
+            response = self._request(url, headers, method)
+            if response.status not in redirectStatusCodes:
+                return response
+            location = response.headers.get("Location")
+            response.read()
+            response.close()
+            if location is None:
+                raise HTTPError(url, response.status, "Redirect without a location", response.headers, None)
+            url = urljoin(url, location).replace(" ", "%20")
+            if response.status == 303:
+                method = "GET"
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+    def getData(self, url, headers=None):
+        """
+        Return the body of the given `url`, raise an `HTTPError` for an error status.
+        """
+        with self.request(url, headers=headers) as response:
+            data = response.read()
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return data
+
+    def clear(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = dict()
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    # helpers
+
+    def _aliasURL(self, url):
+        parts = urlsplit(url)
+        target = self._hostAliases.get(parts.hostname)
+        if target is None:
+            return url
+        target = urlsplit(target)
+        return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+    def _request(self, url, headers, method):
+        if self._hostAliases:
+            url = self._aliasURL(url)
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError("Unsupported url scheme: '%s'" % url)
+        proxy = self._proxy(scheme, parts.hostname)
+        key = (scheme, parts.hostname, parts.port, proxy)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        requestHeaders = {
+            "Host": parts.netloc,
+            "User-Agent": "Mechanic2",
+            "Connection": "keep-alive",
+        }
+        if proxy is not None and scheme == "http":
+            # send the absolute url to the proxy
+            path = urlunsplit((scheme, parts.netloc, path, "", ""))
+            proxyHost, proxyPort, proxyAuthorization = proxy
+            if proxyAuthorization:
+                requestHeaders["Proxy-Authorization"] = proxyAuthorization
+        if headers:
+            requestHeaders.update(headers)
+
+        self._hostLimit(key).acquire()
+        try:
+            while True:
+                connection, reused = self._acquire(key)
+                try:
+                    connection.request(method, path, headers=requestHeaders)
+                    response = connection.getresponse()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.CannotSendRequest):
+                    connection.close()
+                    if reused:
+                        # the server closed an idle keep-alive connection, try again
+                        continue
+                    raise
+                except Exception:
+                    connection.close()
+                    raise
+                return PooledResponse(self, key, connection, response, url)
+        except Exception:
+            self._hostLimit(key).release()
+            raise
+
+    def _hostLimit(self, key):
+        with self._lock:
+            if key not in self._hostLimits:
+                self._hostLimits[key] = threading.BoundedSemaphore(self.maxConnectionsPerHost)
+            return self._hostLimits[key]
+
+    def _proxy(self, scheme, host):
+        # return a (host, port, authorization) tuple of the proxy for a url, or `None`
+        with self._lock:
+            proxies = self._proxies
+            if proxies is None:
+                proxies = self._proxies = urllib.request.getproxies()
+            proxyURL = proxies.get(scheme)
+            if not proxyURL:
+                return None
+            if host not in self._proxyBypass:
+                if "no" in proxies:
+                    bypass = urllib.request.proxy_bypass_environment(host, proxies)
+                else:
+                    bypass = urllib.request.proxy_bypass(host)
+                self._proxyBypass[host] = bool(bypass)
+            if self._proxyBypass[host]:
+                return None
+        if "://" not in proxyURL:
+            proxyURL = "http://" + proxyURL
+        parts = urlsplit(proxyURL)
+        authorization = None
+        if parts.username is not None:
+            credentials = "%s:%s" % (unquote(parts.username), unquote(parts.password or ""))
+            authorization = "Basic %s" % base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+        return parts.hostname, parts.port or 8080, authorization
+
+    def _acquire(self, key):
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        scheme, host, port, proxy = key
+        if proxy is not None:
+            proxyHost, proxyPort, proxyAuthorization = proxy
+            if scheme == "https":
+                connection = _HTTPSConnection(proxyHost, self, port=proxyPort, timeout=self.timeout, context=self.sslContext)
+                tunnelHeaders = dict()
+                if proxyAuthorization:
+                    tunnelHeaders["Proxy-Authorization"] = proxyAuthorization
+                connection.set_tunnel(host, port, headers=tunnelHeaders)
+            else:
+                connection = http.client.HTTPConnection(proxyHost, port=proxyPort, timeout=self.timeout)
+        elif scheme == "https":
+            connection = _HTTPSConnection(host, self, port=port, timeout=self.timeout, context=self.sslContext)
+        else:
+            connection = http.client.HTTPConnection(host, port=port, timeout=self.timeout)
+        return connection, False
+
+    def _release(self, key, connection, reusable):
+        # keep the tls session, with tls 1.3 the session ticket
+        # is only available after reading from the socket
+        session = getattr(connection.sock, "session", None)
+        if session is not None:
+            self._tlsSessions[connection.serverHostName()] = session
+        if reusable:
+            with self._lock:
+                self._idle.setdefault(key, []).append(connection)
+        else:
+            connection.close()
+        self._hostLimit(key).release()
+
+
+sharedConnectionPool = ConnectionPool()
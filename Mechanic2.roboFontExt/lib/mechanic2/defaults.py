@@ -0,0 +1,37 @@
+try:
+    from mojo.extensions import registerExtensionDefaults, removeExtensionDefault
+except ImportError:
+    # outside RoboFont, like the command line interface
+    registerExtensionDefaults = removeExtensionDefault = None
+
+
+extensionStoreDataURL = "http://extensionstore.robofont.com/data.json"
+mechanicDataURL = "https://robofont-mechanic.github.io/mechanic-2-server/api/v2/registry.json"
+
+mechanicDefaults = {
+    "com.mechanic.urlstreams": [extensionStoreDataURL, mechanicDataURL],
+    "com.mechanic.checkForUpdate": True,
+    "com.mechanic.singleExtensionItems": [],
+    "com.mechanic.lastUpdateCheck": 0,
+    "com.mechanic.httpCacheSize": 50 * 1024 * 1024,
+    "com.mechanic.bundleStoreSize": 200 * 1024 * 1024,
+    "com.mechanic.bundleStoreVersions": 3,
+    "com.mechanic.prefetchUpdates": False,
+    "com.mechanic.prefetchMaxBytesPerSecond": 1024 * 1024,
+    "com.mechanic.deltaDownloads": False,
+}
+
+
+def registerMechanicDefaults(reset=False):
+    if registerExtensionDefaults is None:
+        return
+    defaults = dict(mechanicDefaults)
+    defaults["com.mechanic.urlstreams"] = list(defaults["com.mechanic.urlstreams"])
+    defaults["com.mechanic.singleExtensionItems"] = list(defaults["com.mechanic.singleExtensionItems"])
+    if reset:
+        for key in defaults:
+            removeExtensionDefault(key)
+    registerExtensionDefaults(defaults)
+
+
+registerMechanicDefaults()
@@ -0,0 +1,155 @@
+import os
+import time
+import zlib
+import shutil
+import plistlib
+import tempfile
+import logging
+
+from .mechanicTools import mechanicCacheFolder
+from .zipTools import HTTPRangeFile, findBundlePrefix, bundleMembers, memberRanges
+
+
+logger = logging.getLogger("Mechanic")
+
+
+# info.plist keys used by RoboFont to register an extension,
+# when one of these changes the extension must be installed completely
+registrationKeys = (
+    "name",
+    "addToMenu",
+    "launchAtStartUp",
+    "mainScript",
+    "uninstallScript",
+    "requiresVersionMajor",
+    "requiresVersionMinor",
+    "expireDate",
+)
+
+# staged bundles are kept outside the extensions folder
+stagingFolder = mechanicCacheFolder("staging")
+
+
+def fileCRC32(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xffffffff
+
+
+def bundleDelta(members, installedPath):
+    """
+    Compare the members of a bundle in a zip file with an installed bundle.
+
+    `members` is a dict of relative paths and `ZipInfo` objects.
+    Return a tuple with a dict of the added or changed members
+    and a list of the unchanged relative paths.
+    """
+    changed = dict()
+    unchanged = []
+    for relativePath, info in members.items():
+        if info.is_dir():
+            continue
+        path = os.path.join(installedPath, *relativePath.split("/"))
+        if os.path.isfile(path) and os.path.getsize(path) == info.file_size and fileCRC32(path) == info.CRC:
+            unchanged.append(relativePath)
+        else:
+            changed[relativePath] = info
+    return changed, unchanged
+
+
+def needsFullInstall(oldInfo, newInfo):
+    """
+    Return bool if the registration of the extension changed between two info.plist dicts.
+    """
+    return any(oldInfo.get(key) != newInfo.get(key) for key in registrationKeys)
+
+
+class StagedBundle(object):
+
+    """
+    A new version of an installed bundle, staged in the Mechanic cache folder.
+
+    This is a download only delta: unchanged files are copied from the
+    installed bundle, hard linked when possible, and only the added and
+    changed files are read from the zip file. The staged bundle is installed
+    like any extracted bundle, with `ExtensionBundle.install`, so RoboFont
+    runs the uninstall script of the installed bundle and loads the new one.
+    """
+
+    def __init__(self, path, installedPath, folder, changed, unchanged):
+        self.path = path
+        self.installedPath = installedPath
+        self.folder = folder
+        self.changed = changed
+        self.unchanged = unchanged
+
+    def discard(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def stageDeltaBundle(zipFile, extensionPath, installedPath):
+    """
+    Stage the bundle at `extensionPath` in a zip file as an update of the bundle at `installedPath`.
+
+    Only the added and changed members are read, and downloaded, from the zip file.
+    Return a `StagedBundle`, or `None` when the extension must be installed completely.
+    """
+    prefix = findBundlePrefix(zipFile.namelist(), extensionPath)
+    if prefix is None or not os.path.isdir(installedPath):
+        return None
+    members = bundleMembers(zipFile, prefix)
+    if "info.plist" not in members:
+        return None
+    try:
+        with open(os.path.join(installedPath, "info.plist"), "rb") as f:
+            oldInfo = plistlib.load(f)
+    except Exception:
+        return None
+    newInfo = plistlib.loads(zipFile.read(members["info.plist"]))
+    if needsFullInstall(oldInfo, newInfo):
+        return None
+
+    changed, unchanged = bundleDelta(members, installedPath)
+    os.makedirs(stagingFolder, exist_ok=True)
+    _removeStaleStagingFolders(stagingFolder)
+    folder = tempfile.mkdtemp(dir=stagingFolder)
+    stagedPath = os.path.join(folder, os.path.basename(installedPath))
+    try:
+        os.makedirs(stagedPath)
+        for relativePath, info in members.items():
+            if info.is_dir():
+                os.makedirs(os.path.join(stagedPath, *relativePath.split("/")), exist_ok=True)
+        for relativePath in unchanged:
+            source = os.path.join(installedPath, *relativePath.split("/"))
+            target = os.path.join(stagedPath, *relativePath.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                # not on the same file system
+                shutil.copy2(source, target)
+        if isinstance(zipFile.fp, HTTPRangeFile):
+            # only download the changed members
+            zipFile.fp.prefetch(memberRanges(zipFile, changed.values()))
+        for relativePath, info in changed.items():
+            target = os.path.join(stagedPath, *relativePath.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zipFile.open(info) as source, open(target, "wb") as f:
+                shutil.copyfileobj(source, f)
+    except Exception:
+        shutil.rmtree(folder, ignore_errors=True)
+        raise
+    return StagedBundle(stagedPath, installedPath, folder, changed, unchanged)
+
+
+def _removeStaleStagingFolders(folder, maxAge=60 * 60):
+    now = time.time()
+    for fileName in os.listdir(folder):
+        path = os.path.join(folder, fileName)
+        try:
+            if os.stat(path).st_mtime + maxAge < now:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
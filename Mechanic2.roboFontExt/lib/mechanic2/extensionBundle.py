@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import logging
+
+from .installedIndex import installedExtensions
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class FolderExtensionBundle(object):
+
+    """
+    A minimal stand-in for `mojo.extensions.ExtensionBundle` outside RoboFont.
+
+    Installing copies the bundle into the extensions folder of the
+    installed extensions index, RoboFont registers it at the next launch.
+    """
+
+    def __init__(self, name=None, path=None):
+        if path is None:
+            path = os.path.join(installedExtensions.folder, name)
+        self.path = path
+        self.fileName = os.path.basename(path.rstrip(os.sep))
+
+    def bundleExists(self):
+        return os.path.isdir(self.path)
+
+    def install(self, showMessages=False):
+        folder = installedExtensions.folder
+        os.makedirs(folder, exist_ok=True)
+        destination = os.path.join(folder, self.fileName)
+        # copy next to the installed bundle first, a failing copy leaves the installed bundle alone
+        tempFolder = tempfile.mkdtemp(prefix=".mechanic-install-", dir=folder)
+        try:
+            tempPath = os.path.join(tempFolder, self.fileName)
+            shutil.copytree(self.path, tempPath)
+            if os.path.exists(destination):
+                shutil.rmtree(destination)
+            os.rename(tempPath, destination)
+        finally:
+            shutil.rmtree(tempFolder, ignore_errors=True)
+        self.path = destination
+        return True
+
+    def deinstall(self):
+        shutil.rmtree(self.path)
+
+
+try:
+    from mojo.extensions import ExtensionBundle
+except ImportError:
+    # outside RoboFont
+    ExtensionBundle = FolderExtensionBundle
@@ -1,44 +1,68 @@
-import AppKit
-from distutils.version import LooseVersion
-import zipfile
 import tempfile
 import shutil
 import os
-from io import BytesIO
 from urllib.parse import urlparse
 import logging
+from contextlib import contextmanager
 
 import plistlib
+import webbrowser
 
-from mojo.extensions import ExtensionBundle
-
-from .mechanicTools import remember, clearRemembered, findExtensionInRoot, getDataFromURL, ExtensionRepoError
+from .mechanicTools import remember, clearRemembered, getRemembered, getDataFromURL, ExtensionRepoError
+from .versionTools import LooseVersion
+from .zipTools import extractBundle, RemoteFileChanged
+from .archiveCache import archiveCache
+from .bundleStore import bundleStore
+from .deltaUpdate import StagedBundle, stageDeltaBundle
+from .extensionBundle import ExtensionBundle
+from .installedIndex import installedExtensions
+from .repositoryHeads import repositoryHeads
 
 
 logger = logging.getLogger("Mechanic")
 
+# remote versions are checked again after a day
+remoteVersionTimeToLive = 60 * 60 * 24
+
+_notRemembered = object()
+
 
 class BaseExtensionItem(object):
 
-    def __init__(self, data, checkForUpdates=True):
+    # only download the changed files of installed extensions
+    useDeltaDownloads = False
+
+    def __init__(self, data, checkForUpdates=True, source=None):
         valid, report = self.validateData(data)
         if not valid:
             raise ExtensionRepoError(report)
         self._data = data
         self._shouldCheckForUpdates = checkForUpdates
+        self._source = source
         self._init()
 
     def _init(self):
         pass
 
-    def resetRemembered(self):
-        clearRemembered(self)
+    def resetRemembered(self, *names):
+        """
+        Reset all cached data, or only for the given method `names`.
+        """
+        clearRemembered(self, *names)
+
+    # names of the cached data depending on the installed bundle
+    installedStateNames = ("isExtensionInstalled", "extensionVersion", "extensionStoreKey")
 
-    @remember
     def isExtensionInstalled(self):
-        bundle = self.extensionBundle()
         # return if the bundle exists
-        return bundle.bundleExists()
+        return installedExtensions.isInstalled(self.extensionBundleName())
+
+    def extensionSource(self):
+        """
+        Return the url of the stream the extension comes from.
+        (`None` for single extension items).
+        """
+        return self._source
 
     def extensionName(self):
         """
@@ -86,24 +110,14 @@ class BaseExtensionItem(object):
         """
         return False
 
-    @remember
-    def extensionIcon(self):
-        imageURL = self._data.get("icon", None)
-        if imageURL:
-            try:
-                data = getDataFromURL(imageURL)
-            except Exception as e:
-                logger.error("Could not download the image from '%s'" % imageURL)
-                logger.error(e)
-                return None
-            if data is None:
-                return None
-            data = AppKit.NSData.dataWithBytes_length_(data, len(data))
-            image = AppKit.NSImage.alloc().initWithData_(data)
-            return image
-        return None
+    def extensionIconURL(self):
+        """
+        Return the extension icon url.
+        (not required).
+        """
+        return self._data.get("icon", None)
 
-    @remember
+    @remember(dependsOn=("extensionNeedsUpdate", "isExtensionInstalled"))
     def extensionSearchString(self):
         """
         Return the extension search string.
@@ -113,7 +127,7 @@ class BaseExtensionItem(object):
             self.extensionName(),
             self.extensionDeveloper(),
             self.extensionDescription(),
-            ("", "?update?")[self.extensionNeedsUpdate()],
+            ("", "?update?")[self.knownExtensionNeedsUpdate()],
             ("", "?installed?")[self.isExtensionInstalled()],
             ("", "?not_installed?")[not self.isExtensionInstalled()],
             " ".join(self.extensionTags())
@@ -121,12 +135,11 @@ class BaseExtensionItem(object):
 
     # updates
 
-    @remember
     def extensionVersion(self):
-        bundle = self.extensionBundle()
+        version = installedExtensions.version(self.extensionBundleName())
         # check if the bundle exists
-        if bundle.bundleExists():
-            return LooseVersion(bundle.version)
+        if version is not None:
+            return LooseVersion(version)
         return None
 
     def forceCheckExtensionNeedsUpdate(self):
@@ -134,24 +147,50 @@ class BaseExtensionItem(object):
         self.resetRemembered()
         return self.extensionNeedsUpdate()
 
-    @remember
+    @remember(dependsOn=("remoteVersion", "extensionVersion"), ttl=remoteVersionTimeToLive)
     def extensionNeedsUpdate(self):
         """
         Return bool if the extension needs an update.
         """
         if not self._shouldCheckForUpdates:
             return False
+        # get the installed version first, not installed extensions never need an update
+        extensionVersion = self.extensionVersion()
+        if extensionVersion is None:
+            # could be None if it fails
+            return False
         # get the version from the repository
         remoteVersion = self.remoteVersion()
         if remoteVersion is None:
             # could be None if it fails
             return False
+        return extensionVersion < remoteVersion
+
+    def knownExtensionNeedsUpdate(self):
+        """
+        Return bool if the extension needs an update, without any network request.
+
+        A remote version past its time to live is still used,
+        `False` when the remote version is not known.
+        """
+        if not self._shouldCheckForUpdates:
+            return False
         extensionVersion = self.extensionVersion()
         if extensionVersion is None:
-            # could be None if it fails
+            return False
+        remoteVersion = self.knownRemoteVersion(allowExpired=True)
+        if remoteVersion is None:
             return False
         return extensionVersion < remoteVersion
 
+    def shouldRefreshRemoteVersion(self):
+        """
+        Return bool if the remote version of an installed extension is not retrieved yet or expired.
+        """
+        if not self._shouldCheckForUpdates or not self.isExtensionInstalled():
+            return False
+        return getRemembered(self, "remoteVersion", _notRemembered) is _notRemembered
+
     # download and install
 
     def remoteInstall(self, forcedUpdate=False, showMessages=False):
@@ -160,47 +199,207 @@ class BaseExtensionItem(object):
 
         Optional set `forcedUpdate` to `True` if its needed to install the extension anyhow
         """
-        if self.isExtensionInstalled() and not self.extensionNeedsUpdate() and not forcedUpdate:
+        if not self.shouldRemoteInstall(forcedUpdate):
             # dont download and install if the current intall is newer (only when it forced)
             return
+        # create a temp folder
+        tempFolder = tempfile.mkdtemp()
+        extensionPath = None
+        try:
+            extensionPath = self.prepareRemoteInstall(tempFolder, forcedUpdate=forcedUpdate)
+            self.installBundle(extensionPath, showMessages=showMessages)
+        finally:
+            # remove the temp folder with the downloaded zip
+            shutil.rmtree(tempFolder, ignore_errors=True)
+            if isinstance(extensionPath, StagedBundle):
+                extensionPath.discard()
+
+    def shouldRemoteInstall(self, forcedUpdate=False):
+        """
+        Return bool if the extension must be installed from the remote.
+        """
+        return forcedUpdate or not self.isExtensionInstalled() or self.extensionNeedsUpdate()
+
+    def prepareRemoteInstall(self, tempFolder, forcedUpdate=False):
+        """
+        Download the zip file and extract the extension into `tempFolder`,
+        return the path to the extracted extension.
+        With `forcedUpdate` the zip file is always downloaded, a stored version is not used.
+
+        This does not touch any installed extension and can be called from any thread.
+        """
         # get the zip path
         zipPath = self.remoteZipPath()
-
+        # keep the installed version before it is replaced
+        self.storeInstalledBundle()
+        extensionPath = None
+        if not forcedUpdate:
+            # a version downloaded before is extracted from the bundle store
+            extensionPath = self.extractCachedBundle(tempFolder, zipPath)
+        if extensionPath is None:
+            with self.openRemoteArchive(zipPath) as zipFile:
+                extensionPath = self.extractUpdate(zipFile, tempFolder)
+            self.storeBundle(extensionPath, zipPath)
+        return extensionPath
+
+    @contextmanager
+    def openRemoteArchive(self, zipPath):
+        """
+        Open the remote zip file as a context manager, a zip file opened not so long ago is reused.
+        """
         try:
-            # try to download the zip file
+            # try to open the remote zip file, only the extension will be downloaded
             # and fail silently with a custom error message
-            contents = getDataFromURL(zipPath)
+            with archiveCache.open(zipPath) as zipFile:
+                yield zipFile
+        except ExtensionRepoError:
+            raise
         except Exception as e:
             message = "Could not download the extension zip file for: '%s'" % self.extensionName()
             logger.error(message)
             logger.error(e)
             raise ExtensionRepoError(message)
-        # create a temp folder
-        tempFolder = tempfile.mkdtemp()
+
+    def extractRemoteBundle(self, zipFile, tempFolder):
+        """
+        Extract the extension from an opened zip file into `tempFolder`,
+        return the path to the extracted extension.
+        """
         try:
-            # try to extract the zip
+            # try to extract only the extension from the zip
             # and fail silently with a custom message
-            with zipfile.ZipFile(BytesIO(contents)) as z:
-                z.extractall(tempFolder)
+            extensionPath = extractBundle(zipFile, self.extensionPath, tempFolder)
+        except (ExtensionRepoError, RemoteFileChanged):
+            raise
         except Exception as e:
             message = "Could not extract the extension zip file for: '%s'" % self.extensionName()
             logger.error(message)
             logger.error(e)
             raise ExtensionRepoError(message)
-        # find the extension path
-        extensionPath = findExtensionInRoot(os.path.basename(self.extensionPath), tempFolder)
-        if extensionPath:
-            # if found get the bundle and install it
-            bundle = ExtensionBundle(path=extensionPath)
-            bundle.install(showMessages=showMessages)
-            self.resetRemembered()
-        else:
+        if not extensionPath:
             # raise an custom error when the extension is not found in the zip
             message = "Could not find the extension: '%s'" % self.extensionPath
             logger.error(message)
             raise ExtensionRepoError(message)
-        # remove the temp folder with the extracted zip
-        shutil.rmtree(tempFolder)
+        return extensionPath
+
+    def extractUpdate(self, zipFile, tempFolder):
+        """
+        Extract the extension from an opened zip file into `tempFolder`.
+
+        With `useDeltaDownloads` an installed extension is staged instead,
+        only added or changed files are read from the zip file.
+        Return the path to the extracted extension or a `StagedBundle`.
+        """
+        if self.useDeltaDownloads and self.isExtensionInstalled():
+            installedPath = os.path.join(installedExtensions.folder, self.extensionBundleName())
+            try:
+                stagedBundle = stageDeltaBundle(zipFile, self.extensionPath, installedPath)
+            except Exception as e:
+                logger.error("Cannot stage the changed files of '%s'" % self.extensionName())
+                logger.error(e)
+                stagedBundle = None
+            if stagedBundle is not None:
+                return stagedBundle
+        return self.extractRemoteBundle(zipFile, tempFolder)
+
+    def installBundle(self, extensionPath, showMessages=False):
+        """
+        Install an extracted extension or a `StagedBundle`.
+        This must be called from the main thread.
+        """
+        stagedBundle = None
+        if isinstance(extensionPath, StagedBundle):
+            stagedBundle = extensionPath
+            extensionPath = stagedBundle.path
+        try:
+            bundle = ExtensionBundle(path=extensionPath)
+            bundle.install(showMessages=showMessages)
+        finally:
+            if stagedBundle is not None:
+                stagedBundle.discard()
+        installedExtensions.invalidate(self.extensionBundleName())
+        self.resetRemembered(*self.installedStateNames)
+
+    # cached versions
+
+    def cachedVersions(self):
+        """
+        Return a list of the versions of the extension kept in the bundle store, newest first.
+        """
+        return [entry["version"] for entry in bundleStore.versions(self.extensionBundleName())]
+
+    def restoreCachedVersion(self, version, showMessages=False):
+        """
+        Install a version of the extension from the bundle store, without downloading anything.
+        """
+        # keep the installed version before it is replaced
+        self.storeInstalledBundle()
+        tempFolder = tempfile.mkdtemp()
+        try:
+            extensionPath = bundleStore.extract(self.extensionBundleName(), version, tempFolder)
+            if extensionPath is None:
+                message = "Version '%s' of the extension '%s' is not cached." % (version, self.extensionName())
+                logger.error(message)
+                raise ExtensionRepoError(message)
+            self.installBundle(extensionPath, showMessages=showMessages)
+        finally:
+            shutil.rmtree(tempFolder, ignore_errors=True)
+
+    def knownRemoteVersion(self, allowExpired=False):
+        """
+        Return the remote version when it is known without any network request, otherwise `None`.
+        Set `allowExpired` to `True` to return a remote version past its time to live.
+        """
+        return getRemembered(self, "remoteVersion", allowExpired=allowExpired)
+
+    def extractCachedBundle(self, tempFolder, zipPath=None):
+        """
+        Extract the known remote version from the bundle store into `tempFolder`,
+        return the path to the extracted extension or `None` when that version is not stored.
+        """
+        version = self.knownRemoteVersion()
+        if version is None:
+            return None
+        try:
+            zipFile = bundleStore.open(self.extensionBundleName(), version, url=zipPath)
+            if zipFile is None:
+                return None
+            with zipFile:
+                return self.extractUpdate(zipFile, tempFolder)
+        except Exception as e:
+            logger.error("Cannot extract '%s' from the bundle store" % self.extensionName())
+            logger.error(e)
+        return None
+
+    def storeBundle(self, extensionPath, zipPath=None):
+        """
+        Keep an extracted extension in the bundle store.
+        """
+        if isinstance(extensionPath, StagedBundle):
+            extensionPath = extensionPath.path
+        try:
+            with open(os.path.join(extensionPath, "info.plist"), "rb") as f:
+                version = plistlib.load(f).get("version")
+            if version is not None:
+                bundleStore.store(self.extensionBundleName(), extensionPath, version, url=zipPath)
+        except Exception as e:
+            logger.error("Cannot keep '%s' in the bundle store" % self.extensionName())
+            logger.error(e)
+
+    def storeInstalledBundle(self):
+        """
+        Keep the installed version of the extension in the bundle store.
+        """
+        bundleName = self.extensionBundleName()
+        version = installedExtensions.version(bundleName)
+        if version is None or bundleStore.find(bundleName, version) is not None:
+            return
+        try:
+            bundleStore.store(bundleName, os.path.join(installedExtensions.folder, bundleName), version)
+        except Exception as e:
+            logger.error("Cannot keep the installed '%s' in the bundle store" % self.extensionName())
+            logger.error(e)
 
     def remoteZipPath(self):
         # subclass must overwrite this method
@@ -243,19 +442,27 @@ class BaseExtensionItem(object):
 
     # helpers
 
+    def extensionBundleName(self):
+        return self.extensionPath.split("/")[-1]
+
     def extensionBundle(self):
-        # get the bundleName
-        bundleName = self.extensionPath.split("/")[-1]
         # get the bundle
-        return ExtensionBundle(bundleName)
+        return ExtensionBundle(self.extensionBundleName())
 
     def extensionUninstall(self):
         bundle = self.extensionBundle()
         if bundle.bundleExists():
             bundle.deinstall()
-            self.resetRemembered()
+            installedExtensions.invalidate(self.extensionBundleName())
+            self.resetRemembered(*self.installedStateNames)
 
     def openUrl(self, url, background=False):
+        try:
+            import AppKit
+        except ImportError:
+            # outside RoboFont
+            webbrowser.open(url, autoraise=not background)
+            return
         ws = AppKit.NSWorkspace.sharedWorkspace()
         option = AppKit.NSWorkspaceLaunchDefault
         if background:
@@ -305,15 +512,18 @@ class ExtensionRepository(BaseExtensionItem):
     urlFormatters = dict(
         github=dict(
             zipPath="https://github.com{repositoryPath}/archive/master.zip",
-            infoPlistPath="https://raw.githubusercontent.com{repositoryPath}/master/{extensionPath}/info.plist"
+            infoPlistPath="https://raw.githubusercontent.com{repositoryPath}/{ref}/{extensionPath}/info.plist",
+            refsPath="https://github.com{repositoryPath}.git/info/refs?service=git-upload-pack"
         ),
         gitlab=dict(
             zipPath="https://gitlab.com{repositoryPath}/-/archive/master/{repositoryName}-master.zip",
-            infoPlistPath="https://gitlab.com{repositoryPath}/raw/master/{extensionPath}/info.plist"
+            infoPlistPath="https://gitlab.com{repositoryPath}/raw/{ref}/{extensionPath}/info.plist",
+            refsPath="https://gitlab.com{repositoryPath}.git/info/refs?service=git-upload-pack"
         ),
         bitbucket=dict(
             zipPath="https://bitbucket.org{repositoryPath}/get/master.zip",
-            infoPlistPath="https://bitbucket.org{repositoryPath}/src/master/{extensionPath}/info.plist"
+            infoPlistPath="https://bitbucket.org{repositoryPath}/src/{ref}/{extensionPath}/info.plist",
+            refsPath="https://bitbucket.org{repositoryPath}.git/info/refs?service=git-upload-pack"
         )
     )
 
@@ -336,40 +546,80 @@ class ExtensionRepository(BaseExtensionItem):
 
     # info path
 
-    def remoteInfoPath(self):
+    def remoteInfoPath(self, ref=None):
         """
         Return the url to the info.plist file based on the formatters and supported services.
         If a `remoteInfoPath` is given this will be returned.
+        Optionally provide a commit `ref`, by default the info.plist on the master branch.
         """
+        if ref is not None and self._data.get("infoPath") is None:
+            return self._formatInfoPath(ref)
         if self._remoteInfoPath is None:
-            # get the formattter base ont he service
-            formatter = self.urlFormatters[self.service()]["infoPlistPath"]
-            # format the with given data
-            self._remoteInfoPath = formatter.format(
-                repositoryPath=self.repositoryParsedURL.path,
-                repositoryName=self.extensionName(),
-                extensionPath=self.extensionPath
-            )
+            self._remoteInfoPath = self._formatInfoPath("master")
         return self._remoteInfoPath.replace(" ", "%20")
 
+    def _formatInfoPath(self, ref):
+        # get the formattter base ont he service
+        formatter = self.urlFormatters[self.service()]["infoPlistPath"]
+        # format the with given data
+        return formatter.format(
+            repositoryPath=self.repositoryParsedURL.path,
+            repositoryName=self.extensionName(),
+            extensionPath=self.extensionPath,
+            ref=ref
+        ).replace(" ", "%20")
+
+    # refs path
+
+    def remoteRefsPath(self):
+        """
+        Return the url to the refs of the repository, to look up the head commit of the branch.
+        Return `None` when a `remoteInfoPath` is given, the info.plist could be anywhere.
+        """
+        if self._data.get("infoPath") is not None:
+            return None
+        # get the formatter based on the service
+        formatter = self.urlFormatters[self.service()]["refsPath"]
+        repositoryPath = self.repositoryParsedURL.path.rstrip("/")
+        if repositoryPath.endswith(".git"):
+            repositoryPath = repositoryPath[:-4]
+        return formatter.format(repositoryPath=repositoryPath).replace(" ", "%20")
+
     def remoteURL(self):
         return self.repository
 
-    @remember
+    @remember(ttl=remoteVersionTimeToLive)
     def remoteVersion(self):
         """
         Return the version of the repository, retrieved from the `info.plist`.
+
+        The `info.plist` is only downloaded again when the head commit of
+        the repository moved since the version was retrieved. It is then
+        downloaded at that commit, as the branch file can be cached for a
+        while after a push.
         """
         # get the info.plist path
         path = self.remoteInfoPath()
+        # get the head commit of the repository
+        head = None
+        refsPath = self.remoteRefsPath()
+        if refsPath is not None:
+            head = repositoryHeads.head(refsPath)
+        fetchPath = path
+        if head is not None:
+            version = repositoryHeads.version(path, head)
+            if version is not None:
+                # nothing changed in the repository
+                return LooseVersion(version)
+            fetchPath = self.remoteInfoPath(ref=head)
         infoContents = ""
         try:
             # try to download the info.plist
             # and fail silently with a custom message
-            infoContents = getDataFromURL(path)
+            infoContents = getDataFromURL(fetchPath)
         except Exception as e:
             # can not get the contens of the info.plist file
-            logger.error("Cannot read '%s' for '%s'" % (path, self.extensionName()))
+            logger.error("Cannot read '%s' for '%s'" % (fetchPath, self.extensionName()))
             logger.error(e)
             return None
         try:
@@ -378,7 +628,7 @@ class ExtensionRepository(BaseExtensionItem):
             info = plistlib.loads(infoContents)
         except Exception as e:
             # can not parse the plist
-            logger.error("Cannot parse '%s' for '%s'" % (path, self.extensionName()))
+            logger.error("Cannot parse '%s' for '%s'" % (fetchPath, self.extensionName()))
             logger.error(e)
             return None
         # get the version
@@ -386,6 +636,8 @@ class ExtensionRepository(BaseExtensionItem):
         # the version must be set
         if version is None:
             return None
+        if head is not None:
+            repositoryHeads.setVersion(path, head, str(version))
         # return the version from the info
         return LooseVersion(version)
 
@@ -441,7 +693,14 @@ class ExtensionStoreItem(BaseExtensionItem):
     def remoteVersion(self):
         return self._data["version"]
 
-    @remember
+    def knownRemoteVersion(self, allowExpired=False):
+        return self.remoteVersion()
+
+    def shouldRefreshRemoteVersion(self):
+        # the remote version is part of the stream
+        return False
+
+    @remember(dependsOn=("extensionStoreKey",))
     def remoteZipPath(self):
         extensionStoreKey = self.extensionStoreKey()
         if extensionStoreKey is None:
@@ -458,14 +717,9 @@ class ExtensionStoreItem(BaseExtensionItem):
         """
         return True
 
-    @remember
     def extensionStoreKey(self):
-        bundle = self.extensionBundle()
-        extensionStoreKey = bundle.getInfo("com.roboFont.extensionStore")
-        if extensionStoreKey is None:
-            # this was a typo but some extension will have this...
-            extensionStoreKey = bundle.getInfo("com.roboFont.extenionsStore")
-        return extensionStoreKey
+        # some extensions have a typo in the key, the index looks for both
+        return installedExtensions.storeKey(self.extensionBundleName())
 
     def remotePurchaseURL(self):
         return self._data["purchaseURL"]
@@ -477,7 +731,7 @@ class ExtensionStoreItem(BaseExtensionItem):
 
 class ExtensionYamlItem(ExtensionRepository):
 
-    def __init__(self, data, checkForUpdates=True):
+    def __init__(self, data, checkForUpdates=True, source=None):
         if "tags" in data:
             data["tags"] = list(data["tags"])
-        super(ExtensionYamlItem, self).__init__(data, checkForUpdates)
+        super(ExtensionYamlItem, self).__init__(data, checkForUpdates, source)
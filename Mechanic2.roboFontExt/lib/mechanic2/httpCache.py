@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import atexit
+import logging
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class HTTPCache(object):
+
+    """
+    A persistent cache of http response bodies with their validators.
+
+    Bodies are stored as separate files next to an `index.json` file,
+    the least recently used entries are removed when the total size
+    exceeds `maxSize` bytes.
+    Only responses with an `ETag` or a `Last-Modified` header are stored,
+    as they can be revalidated with a conditional request.
+
+    The index is written when a batch of requests is done, see `flush`,
+    at most every `flushInterval` seconds while storing and when the
+    session ends.
+    """
+
+    indexFileName = "index.json"
+
+    def __init__(self, path, maxSize=50 * 1024 * 1024, flushInterval=10):
+        self.path = path
+        self.maxSize = maxSize
+        self.flushInterval = flushInterval
+        self._index = None
+        self._dirty = False
+        self._flushedAt = 0
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def validators(self, url):
+        """
+        Return the conditional request headers for a cached `url`.
+        """
+        with self._lock:
+            entry = self._getIndex().get(url)
+            headers = dict()
+            if entry is None:
+                return headers
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+            return headers
+
+    def read(self, url):
+        """
+        Return the cached body for a `url`, or `None` when not cached.
+        """
+        with self._lock:
+            entry = self._getIndex().get(url)
+            if entry is None:
+                return None
+            try:
+                with open(os.path.join(self.path, entry["file"]), "rb") as f:
+                    data = f.read()
+            except Exception:
+                self._remove(url)
+                return None
+            entry["accessed"] = time.time()
+            self._dirty = True
+            return data
+
+    def store(self, url, data, headers):
+        """
+        Store the body of a response with the validators from its `headers`.
+        """
+        etag = headers.get("ETag")
+        lastModified = headers.get("Last-Modified")
+        cacheControl = headers.get("Cache-Control", "")
+        if not (etag or lastModified) or "no-store" in cacheControl:
+            return
+        if len(data) > self.maxSize:
+            return
+        fileName = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with self._lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                self._writeFile(fileName, data)
+            except Exception as e:
+                logger.error("Cannot write to the cache '%s'" % self.path)
+                logger.error(e)
+                return
+            self._getIndex()[url] = dict(
+                file=fileName,
+                etag=etag,
+                lastModified=lastModified,
+                size=len(data),
+                accessed=time.time()
+            )
+            self._dirty = True
+            self._evict()
+            if self._flushedAt + self.flushInterval < time.time():
+                self.flush()
+
+    def setMaxSize(self, maxSize):
+        with self._lock:
+            self.maxSize = maxSize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for url in list(self._getIndex()):
+                self._remove(url)
+            self.flush()
+
+    def flush(self):
+        """
+        Write the index to disk, if there are any changes.
+        Call it when a batch of requests is done.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                self._writeFile(self.indexFileName, json.dumps(self._index).encode("utf-8"))
+                self._dirty = False
+                self._flushedAt = time.time()
+            except Exception as e:
+                logger.error("Cannot write to the cache '%s'" % self.path)
+                logger.error(e)
+
+    # helpers
+
+    def _getIndex(self):
+        if self._index is None:
+            self._index = dict()
+            indexPath = os.path.join(self.path, self.indexFileName)
+            if os.path.exists(indexPath):
+                try:
+                    with open(indexPath, "rb") as f:
+                        self._index = json.loads(f.read())
+                except Exception as e:
+                    logger.error("Cannot read the cache index '%s'" % indexPath)
+                    logger.error(e)
+        return self._index
+
+    def _writeFile(self, fileName, data):
+        # write to a temp file first, a replace is atomic
+        fd, tempPath = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tempPath, os.path.join(self.path, fileName))
+
+    def _remove(self, url):
+        entry = self._getIndex().pop(url, None)
+        if entry is None:
+            return
+        self._dirty = True
+        try:
+            os.remove(os.path.join(self.path, entry["file"]))
+        except OSError:
+            pass
+
+    def _evict(self):
+        index = self._getIndex()
+        totalSize = sum(entry["size"] for entry in index.values())
+        if totalSize <= self.maxSize:
+            return
+        for url in sorted(index, key=lambda url: index[url]["accessed"]):
+            totalSize -= index[url]["size"]
+            self._remove(url)
+            if totalSize <= self.maxSize:
+                break
@@ -0,0 +1,154 @@
+import os
+import shutil
+import plistlib
+import tempfile
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .deltaUpdate import StagedBundle
+from .mechanicTools import ExtensionRepoError
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class InstallPipeline(object):
+
+    """
+    Install or update many extension items at once.
+
+    All zip files are downloaded and extracted at the same time by a
+    bounded pool of worker threads. Items sharing the same zip file are
+    extracted from a single download, versions kept in the bundle store are
+    not downloaded again. The extracted extensions are installed
+    on the calling thread, in the order of the given items, as soon as
+    they are ready. An error for one item does not stop the others.
+    """
+
+    def __init__(self, maxWorkers=6):
+        self.maxWorkers = maxWorkers
+
+    def run(self, items, callback=None, forcedUpdate=False, showMessages=False, versions=None):
+        """
+        Install the given extension items from the remote.
+
+        Optionally provide a `callback`, called with each item and an error
+        or `None` as soon as the item is handled.
+        Items which are already installed and up to date are skipped,
+        unless `forcedUpdate` is set to `True`, then the zip files are always
+        downloaded.
+        Optionally provide a `versions` dict with the expected version per item,
+        an extracted extension with another version is not installed. These items
+        are always installed, from the bundle store when that version is stored.
+
+        Return a dict with items as keys and an error or `None` as values.
+        """
+        results = dict()
+        if not items:
+            return results
+        versions = versions or dict()
+        futures = dict()
+        tempRoot = tempfile.mkdtemp()
+        try:
+            # group the items by zip file
+            groups = OrderedDict()
+            for item in items:
+                try:
+                    if item in versions or item.shouldRemoteInstall(forcedUpdate):
+                        groups.setdefault(item.remoteZipPath(), []).append(item)
+                except Exception as e:
+                    results[item] = e
+            if groups:
+                executor = ThreadPoolExecutor(max_workers=min(self.maxWorkers, len(groups)))
+                for index, (zipPath, groupItems) in enumerate(groups.items()):
+                    tempFolder = os.path.join(tempRoot, str(index))
+                    os.mkdir(tempFolder)
+                    storeItems = [item for item in groupItems if not forcedUpdate or item in versions]
+                    future = executor.submit(self._prepareGroup, zipPath, groupItems, tempFolder, storeItems)
+                    for item in groupItems:
+                        futures[item] = future
+                executor.shutdown(wait=False)
+            for item in items:
+                if item in futures:
+                    try:
+                        extensionPath = futures[item].result()[item]
+                        if isinstance(extensionPath, Exception):
+                            raise extensionPath
+                        if item in versions:
+                            self._checkVersion(item, extensionPath, versions[item])
+                        item.installBundle(extensionPath, showMessages=showMessages)
+                        results[item] = None
+                    except Exception as e:
+                        results[item] = e
+                else:
+                    # nothing to install or checking failed
+                    results.setdefault(item, None)
+                error = results[item]
+                if error is not None:
+                    logger.error("Could not install '%s'" % item.extensionName())
+                    logger.error(error)
+                if callback is not None:
+                    callback(item, error)
+        finally:
+            # wait for all workers before removing the downloaded zip files
+            for future in set(futures.values()):
+                future.cancel()
+                try:
+                    if future.exception() is None:
+                        # remove staged bundles which are not installed
+                        for extensionPath in future.result().values():
+                            if isinstance(extensionPath, StagedBundle):
+                                extensionPath.discard()
+                except Exception:
+                    pass
+            shutil.rmtree(tempRoot, ignore_errors=True)
+        return results
+
+    # helpers
+
+    def _checkVersion(self, item, extensionPath, version):
+        if isinstance(extensionPath, StagedBundle):
+            extensionPath = extensionPath.path
+        with open(os.path.join(extensionPath, "info.plist"), "rb") as f:
+            foundVersion = plistlib.load(f).get("version")
+        if str(foundVersion) != str(version):
+            message = "Version '%s' of '%s' is not available, found version '%s'" % (version, item.extensionName(), foundVersion)
+            raise ExtensionRepoError(message)
+
+    def _prepareGroup(self, zipPath, items, tempFolder, storeItems):
+        # called from a worker thread
+        # return a dict with the extracted extension path or an error for each item
+        # only the `storeItems` are extracted from the bundle store
+        prepared = dict()
+        download = []
+        for index, item in enumerate(items):
+            itemFolder = os.path.join(tempFolder, str(index))
+            os.mkdir(itemFolder)
+            try:
+                # keep the installed version before it is replaced
+                item.storeInstalledBundle()
+                extensionPath = None
+                if item in storeItems:
+                    extensionPath = item.extractCachedBundle(itemFolder, zipPath)
+            except Exception as e:
+                prepared[item] = e
+                continue
+            if extensionPath is None:
+                download.append((item, itemFolder))
+            else:
+                prepared[item] = extensionPath
+        if not download:
+            return prepared
+        try:
+            with download[0][0].openRemoteArchive(zipPath) as zipFile:
+                for item, itemFolder in download:
+                    try:
+                        prepared[item] = item.extractUpdate(zipFile, itemFolder)
+                        item.storeBundle(prepared[item], zipPath)
+                    except Exception as e:
+                        prepared[item] = e
+        except Exception as e:
+            for item, itemFolder in download:
+                prepared.setdefault(item, e)
+        return prepared
@@ -0,0 +1,158 @@
+import os
+import time
+import plistlib
+import threading
+import logging
+
+
+logger = logging.getLogger("Mechanic")
+
+
+# only used outside RoboFont, like in the command line interface
+extensionsFolder = os.path.expanduser("~/Library/Application Support/RoboFont/plugins")
+
+extensionStoreKeys = ("com.roboFont.extensionStore", "com.roboFont.extenionsStore")
+
+
+def roboFontExtensionsFolder():
+    """
+    Return the folder RoboFont installs extensions into.
+    Outside RoboFont the default RoboFont extensions folder is returned.
+    """
+    try:
+        from mojo.extensions import ExtensionBundle
+    except ImportError:
+        return extensionsFolder
+    try:
+        # a bundle created by name is located in the extensions folder
+        return os.path.dirname(ExtensionBundle("Mechanic2.roboFontExt").bundlePath)
+    except Exception as e:
+        logger.error("Cannot find the RoboFont extensions folder")
+        logger.error(e)
+        return extensionsFolder
+
+
+class InstalledExtensionsIndex(object):
+
+    """
+    An in memory index of the installed extension bundles.
+
+    The extensions folder is scanned once, after that only bundles with a
+    changed modification time are read again. The folder modification time
+    is checked at most every `checkInterval` seconds.
+    Without a `folder` the RoboFont extensions folder is used.
+    """
+
+    def __init__(self, folder=None, checkInterval=2):
+        self.folder = folder or roboFontExtensionsFolder()
+        self.checkInterval = checkInterval
+        self._bundles = dict()
+        self._folderModificationTime = None
+        self._lastCheck = 0
+        self._lock = threading.RLock()
+
+    def setFolder(self, folder):
+        with self._lock:
+            self.folder = folder
+            self._bundles = dict()
+            self._folderModificationTime = None
+            self._lastCheck = 0
+
+    def refresh(self, force=False):
+        """
+        Read the bundles changed since the last refresh.
+        """
+        now = time.time()
+        if not force and now - self._lastCheck < self.checkInterval:
+            return
+        with self._lock:
+            self._lastCheck = now
+            try:
+                folderModificationTime = os.stat(self.folder).st_mtime
+            except OSError:
+                self._bundles = dict()
+                self._folderModificationTime = None
+                return
+            if not force and folderModificationTime == self._folderModificationTime:
+                return
+            self._folderModificationTime = folderModificationTime
+            found = set()
+            for entry in os.scandir(self.folder):
+                if not entry.name.endswith(".roboFontExt"):
+                    continue
+                found.add(entry.name)
+                self._readBundle(entry.name)
+            for bundleName in set(self._bundles) - found:
+                del self._bundles[bundleName]
+
+    def invalidate(self, bundleName):
+        """
+        Read a bundle again, like after an install or an uninstall.
+        """
+        with self._lock:
+            self._bundles.pop(bundleName, None)
+            self._readBundle(bundleName)
+            self._lastCheck = 0
+
+    # queries
+
+    def bundleNames(self):
+        self.refresh()
+        return sorted(self._bundles)
+
+    def bundleInfo(self, bundleName):
+        """
+        Return the info dict of an installed bundle, or `None` when the bundle is not installed.
+        """
+        self.refresh()
+        bundle = self._bundles.get(bundleName)
+        if bundle is None:
+            return None
+        return bundle["info"]
+
+    def isInstalled(self, bundleName):
+        self.refresh()
+        return bundleName in self._bundles
+
+    def version(self, bundleName):
+        info = self.bundleInfo(bundleName)
+        if info is None:
+            return None
+        return info.get("version")
+
+    def storeKey(self, bundleName):
+        info = self.bundleInfo(bundleName)
+        if info is None:
+            return None
+        for key in extensionStoreKeys:
+            if info.get(key) is not None:
+                return info[key]
+        return None
+
+    # helpers
+
+    def _readBundle(self, bundleName):
+        bundlePath = os.path.join(self.folder, bundleName)
+        infoPath = os.path.join(bundlePath, "info.plist")
+        if not os.path.isdir(bundlePath):
+            self._bundles.pop(bundleName, None)
+            return
+        try:
+            modificationTime = os.stat(infoPath).st_mtime
+        except OSError:
+            modificationTime = None
+        bundle = self._bundles.get(bundleName)
+        if bundle is not None and bundle["modificationTime"] == modificationTime:
+            return
+        info = dict()
+        if modificationTime is not None:
+            try:
+                with open(infoPath, "rb") as f:
+                    info = plistlib.load(f)
+            except Exception as e:
+                logger.error("Cannot read '%s'" % infoPath)
+                logger.error(e)
+        self._bundles[bundleName] = dict(modificationTime=modificationTime, info=info)
+
+
+installedExtensions = InstalledExtensionsIndex()
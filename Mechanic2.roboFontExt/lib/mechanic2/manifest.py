@@ -0,0 +1,296 @@
+import os
+import json
+import tempfile
+import logging
+
+from .mechanicTools import setRemembered, ExtensionRepoError
+from .versionTools import LooseVersion
+from .installedIndex import installedExtensions
+from .bundleStore import bundleHash
+from .extensionItem import ExtensionRepository
+from .streams import fetchStreams, createStreamItems, itemClassForStream, findItems
+from .updateChecker import UpdateChecker
+from .installPipeline import InstallPipeline
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class Manifest(object):
+
+    """
+    A list of extensions to install, with optional pinned versions.
+
+    Each entry is an extension name, found in the url streams, or a dict
+    with a `name` or a `repository` and an `extensionPath`, and an optional
+    `version`. An entry without a version is installed at the latest version.
+
+        {
+            "streams": ["https://.../registry.json"],
+            "extensions": [
+                "Batch",
+                {"name": "Glyph Construction", "version": "0.6"},
+                {"repository": "https://github.com/user/repo", "extensionPath": "My.roboFontExt"}
+            ]
+        }
+    """
+
+    def __init__(self, entries, streams=None, path=None):
+        self.entries = [self._normalizeEntry(entry) for entry in entries]
+        self.streams = list(streams) if streams else None
+        self.path = path
+
+    @classmethod
+    def read(cls, path):
+        """
+        Read a manifest from a json file, or a yaml file when PyYAML is installed.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ExtensionRepoError("Reading the manifest '%s' requires PyYAML" % path)
+            data = yaml.safe_load(data)
+        else:
+            data = json.loads(data)
+        if isinstance(data, list):
+            data = dict(extensions=data)
+        return cls(data.get("extensions", []), streams=data.get("streams"), path=path)
+
+    def lockPath(self):
+        """
+        Return the path of the lockfile next to the manifest.
+        """
+        return "%s.lock.json" % os.path.splitext(self.path)[0]
+
+    # helpers
+
+    def _normalizeEntry(self, entry):
+        if isinstance(entry, str):
+            entry = dict(name=entry)
+        entry = dict(entry)
+        if "version" in entry and entry["version"] is not None:
+            entry["version"] = str(entry["version"])
+        if "repository" in entry:
+            if "extensionPath" not in entry:
+                raise ExtensionRepoError("Manifest entry '%s' requires an 'extensionPath'" % entry["repository"])
+            entry["key"] = "%s/%s" % (entry["repository"].rstrip("/"), entry["extensionPath"])
+        elif "name" in entry:
+            entry["key"] = entry["name"].lower()
+        else:
+            raise ExtensionRepoError("Manifest entry '%s' requires a 'name' or a 'repository'" % entry)
+        return entry
+
+
+class Lockfile(object):
+
+    """
+    The resolved extensions of a manifest: the item data, the zip url,
+    the installed version and the hash of the installed bundle.
+
+    With a lockfile an installed extension at the locked version with the
+    locked bundle hash is up to date, without any network request.
+    """
+
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.extensions = dict()
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = json.loads(f.read())
+                if data.get("version") == self.version:
+                    self.extensions = data.get("extensions", dict())
+            except Exception as e:
+                logger.error("Cannot read the lockfile '%s'" % path)
+                logger.error(e)
+
+    def get(self, key):
+        return self.extensions.get(key)
+
+    def set(self, key, entry):
+        self.extensions[key] = entry
+
+    def save(self, keys=None):
+        """
+        Write the lockfile, optionally only with the given `keys`.
+        """
+        if keys is not None:
+            self.extensions = dict((key, self.extensions[key]) for key in keys if key in self.extensions)
+        data = dict(version=self.version, extensions=self.extensions)
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tempPath = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(data, indent=2, sort_keys=True).encode("utf-8"))
+        os.replace(tempPath, self.path)
+
+
+def installedBundleHash(bundleName):
+    path = os.path.join(installedExtensions.folder, bundleName)
+    if not os.path.isdir(path):
+        return None
+    return bundleHash(path)
+
+
+def syncManifest(manifest, lockfile, streams=None, update=False, callback=None):
+    """
+    Install the extensions of a manifest and update the lockfile.
+
+    Entries already installed at the pinned or locked version are skipped
+    without any network request, the url streams are only read for entries
+    not in the lockfile. Set `update` to `True` to ignore the locked versions
+    of entries without a pinned version and install their latest version.
+
+    Optionally provide a `callback`, called with each result as soon as
+    the extension is handled.
+
+    Return a list of dicts with the `name`, `bundleName`, `version`,
+    `action` ("unchanged", "installed" or "failed") and `error` of each entry.
+    """
+    results = dict()
+    items = dict()
+    targets = dict()
+
+    def _done(entry, item, action, error=None):
+        result = dict(
+            name=item.extensionName() if item is not None else entry.get("name", entry["key"]),
+            bundleName=item.extensionBundleName() if item is not None else None,
+            version=installedExtensions.version(item.extensionBundleName()) if item is not None else None,
+            action=action,
+            error=str(error) if error is not None else None
+        )
+        results[entry["key"]] = result
+        if callback is not None:
+            callback(result)
+
+    # create the items from the manifest and the lockfile
+    unresolved = []
+    for entry in manifest.entries:
+        locked = lockfile.get(entry["key"])
+        if locked is not None and update and entry.get("version") is None:
+            locked = None
+        try:
+            if "repository" in entry:
+                data = dict((key, value) for key, value in entry.items() if key not in ("key", "name", "version"))
+                if "name" in entry:
+                    data["extensionName"] = entry["name"]
+                items[entry["key"]] = ExtensionRepository(data, checkForUpdates=True)
+            elif locked is not None:
+                source = locked.get("source")
+                items[entry["key"]] = itemClassForStream(source)(dict(locked["data"]), checkForUpdates=True, source=source)
+            else:
+                unresolved.append(entry)
+        except Exception as e:
+            _done(entry, None, "failed", e)
+            continue
+        targets[entry["key"]] = entry.get("version") or (locked or dict()).get("version")
+
+    # find the other entries in the url streams, all streams are fetched at the same time
+    if unresolved:
+        urls = manifest.streams or streams
+        catalog = fetchStreams(urls)
+        streamItems = []
+        for url in urls:
+            streamItems.extend(createStreamItems(url, catalog.get(url, []), checkForUpdates=True))
+        for entry in unresolved:
+            found, missing = findItems(streamItems, [entry["name"]])
+            if missing:
+                _done(entry, None, "failed", ExtensionRepoError("Cannot find the extension '%s'" % entry["name"]))
+                continue
+            items[entry["key"]] = found[0]
+            targets[entry["key"]] = entry.get("version")
+
+    # skip everything already at the target version
+    install = []
+    latest = []
+    for entry in manifest.entries:
+        key = entry["key"]
+        if key in results:
+            continue
+        item = items[key]
+        installedVersion = installedExtensions.version(item.extensionBundleName())
+        target = targets[key]
+        if installedVersion is None:
+            install.append(entry)
+        elif target is None:
+            latest.append(entry)
+        elif LooseVersion(installedVersion) != LooseVersion(target):
+            install.append(entry)
+        else:
+            locked = lockfile.get(key)
+            if locked is not None and locked.get("version") == installedVersion and locked.get("hash") != installedBundleHash(item.extensionBundleName()):
+                # the installed bundle is changed
+                logger.error("The installed '%s' does not match the lockfile" % item.extensionName())
+                install.append(entry)
+            else:
+                _done(entry, item, "unchanged")
+
+    # check the entries without a version for updates, all at the same time
+    if latest:
+        checks = UpdateChecker().check([items[entry["key"]] for entry in latest])
+        for entry in latest:
+            item = items[entry["key"]]
+            if checks.get(item):
+                install.append(entry)
+            else:
+                _done(entry, item, "unchanged")
+
+    # download and install all at the same time
+    if install:
+        installItems = []
+        versions = dict()
+        # entries resolving to the same extension, like a name and a bundle name, are installed once
+        bundleEntries = dict()
+        for entry in install:
+            item = items[entry["key"]]
+            target = targets[entry["key"]]
+            bundleName = item.extensionBundleName()
+            if bundleName in bundleEntries:
+                otherTarget = targets[bundleEntries[bundleName][0]["key"]]
+                if target != otherTarget:
+                    _done(entry, item, "failed", ExtensionRepoError("Version '%s' of '%s' conflicts with version '%s' in the manifest" % (target, item.extensionName(), otherTarget)))
+                else:
+                    bundleEntries[bundleName].append(entry)
+                continue
+            bundleEntries[bundleName] = [entry]
+            if target is not None:
+                # a stored version is installed without downloading
+                setRemembered(item, "remoteVersion", LooseVersion(target))
+                versions[item] = target
+            installItems.append(item)
+
+        def _installed(item, error):
+            for entry in bundleEntries[item.extensionBundleName()]:
+                _done(entry, item, "failed" if error is not None else "installed", error)
+
+        InstallPipeline().run(installItems, callback=_installed, versions=versions)
+
+    # lock all installed entries
+    for entry in manifest.entries:
+        key = entry["key"]
+        item = items.get(key)
+        result = results[key]
+        if item is None or result["version"] is None:
+            continue
+        locked = lockfile.get(key)
+        if result["action"] == "unchanged" and locked is not None and locked.get("version") == result["version"]:
+            continue
+        try:
+            zipPath = item.remoteZipPath()
+        except Exception:
+            zipPath = None
+        lockfile.set(key, dict(
+            name=item.extensionName(),
+            bundleName=item.extensionBundleName(),
+            version=result["version"],
+            url=zipPath,
+            hash=installedBundleHash(item.extensionBundleName()),
+            source=item.extensionSource(),
+            data=item._data,
+        ))
+    lockfile.save(keys=[entry["key"] for entry in manifest.entries])
+    return [results[entry["key"]] for entry in manifest.entries]
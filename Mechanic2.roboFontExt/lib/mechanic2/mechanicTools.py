@@ -1,66 +1,296 @@
 import os
-import ssl
-from urllib.request import urlopen
+import time
+import weakref
+import threading
+from collections import OrderedDict, deque
+from urllib.error import HTTPError
+
+from .connectionPool import sharedConnectionPool
+from .httpCache import HTTPCache
 
 
 class ExtensionRepoError(Exception):
     pass
 
 
-def getDataFromURL(url, formatter=None):
+mechanicCacheRoot = os.path.expanduser("~/Library/Caches/Mechanic2")
+
+
+def mechanicCacheFolder(*names):
+    """
+    Return the path of a folder in the Mechanic cache folder.
+    """
+    return os.path.join(mechanicCacheRoot, *names)
+
+
+httpCache = HTTPCache(mechanicCacheFolder("http"))
+
+
+def getDataFromURL(url, formatter=None, useCache=True):
+    """
+    Return the data from the given url.
+
+    When `useCache` is set the request is revalidated against the on-disk http cache,
+    a `304 Not Modified` response is served from disk.
+    """
     url = url.replace(" ", "%20")
-    context = ssl._create_unverified_context()
-    response = urlopen(url, timeout=5, context=context)
-    data = response.read()
+    headers = None
+    if useCache:
+        headers = httpCache.validators(url)
+    with sharedConnectionPool.request(url, headers=headers) as response:
+        data = response.read()
+    if response.status == 304:
+        data = httpCache.read(url)
+        if data is None:
+            # removed from the cache in the meantime
+            return getDataFromURL(url, formatter=formatter, useCache=False)
+    elif response.status >= 400:
+        raise HTTPError(url, response.status, response.reason, response.headers, None)
+    elif useCache:
+        httpCache.store(url, data, response.headers)
     if formatter:
         data = formatter(data)
-    response.close()
     return data
 
 
-def findExtensionInRoot(name, path):
+def downloadURLToFile(url, path, chunkSize=65536):
     """
-    return the path of the extension with a given file name in a given directory.
+    Download the data from the given url into a file, in chunks of `chunkSize` bytes.
     """
-    for root, dirs, files in os.walk(path):
-        if name in dirs:
-            return os.path.join(root, name)
-    return None
+    url = url.replace(" ", "%20")
+    with sharedConnectionPool.request(url) as response:
+        if response.status >= 400:
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        with open(path, "wb") as f:
+            for chunk in response.iterChunks(chunkSize):
+                f.write(chunk)
 
 
+# memos of remembered functions without arguments
 remembered = []
 
+# remembered method names with the names of the methods depending on them
+rememberedDependents = dict()
+
+# remembered method names with the amount of seconds their values are valid
+rememberedTimeToLive = dict()
+
+
+class RememberedRegistry(object):
+
+    """
+    Keep track of the remembered values of all instances, in least recently used order.
+
+    Instances are only referenced weakly, entries of deleted instances are removed
+    with the next change. When there are more than `maxEntries` entries the least
+    recently used values are cleared.
+    """
+
+    def __init__(self, maxEntries=50000):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._names = dict()
+        self._deadReferences = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._removeDeadReferences()
+            return len(self._entries)
+
+    def touch(self, obj, name):
+        """
+        Mark a remembered value as recently used.
+        """
+        ref = obj.__dict__.get("_rememberedRef")
+        if ref is None:
+            ref = obj.__dict__.setdefault("_rememberedRef", weakref.ref(obj, self._removeReference))
+        key = ref, name
+        with self._lock:
+            self._removeDeadReferences()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = None
+            self._names.setdefault(ref, set()).add(name)
+            evicted = []
+            while len(self._entries) > self.maxEntries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self._names[evicted[-1][0]].discard(evicted[-1][1])
+        for evictedRef, evictedName in evicted:
+            evictedObj = evictedRef()
+            if evictedObj is not None:
+                evictedObj.__dict__.get("_remembered", dict()).pop(evictedName, None)
+
+    def forget(self, obj, names=None):
+        """
+        Remove the entries of an instance, only for the given `names` if provided.
+        """
+        ref = obj.__dict__.get("_rememberedRef")
+        if ref is None:
+            return
+        with self._lock:
+            self._removeDeadReferences()
+            if names is None:
+                names = self._names.pop(ref, set())
+            else:
+                self._names.get(ref, set()).difference_update(names)
+            for name in names:
+                self._entries.pop((ref, name), None)
+
+    def setMaxEntries(self, maxEntries):
+        self.maxEntries = maxEntries
+
+    def _removeReference(self, ref):
+        # called by the garbage collector, possibly while this thread holds the lock
+        self._deadReferences.append(ref)
+
+    def _removeDeadReferences(self):
+        # call with the lock held
+        while self._deadReferences:
+            ref = self._deadReferences.popleft()
+            for name in self._names.pop(ref, ()):
+                self._entries.pop((ref, name), None)
 
-def clearRemembered(*args):
-    [m.reset(args) for m in remembered]
 
+rememberedRegistry = RememberedRegistry()
 
-def remember(function):
+
+def _expandRemembered(names):
+    # collect the given names with all the names depending on them
+    found = set()
+    names = list(names)
+    while names:
+        name = names.pop()
+        if name not in found:
+            found.add(name)
+            names.extend(rememberedDependents.get(name, ()))
+    return found
+
+
+def clearRemembered(obj=None, *names):
+    """
+    Clear the remembered values of an object, only for the given method `names` if provided.
+    Values of methods depending on these methods are cleared as well.
+
+    Without an object the memos of all remembered functions without arguments are cleared.
+    """
+    if obj is None:
+        for memo in remembered:
+            memo.clear()
+        return
+    memo = obj.__dict__.get("_remembered")
+    if not memo:
+        return
+    if not names:
+        memo.clear()
+        rememberedRegistry.forget(obj)
+        return
+    names = _expandRemembered(names)
+    for name in names:
+        memo.pop(name, None)
+    rememberedRegistry.forget(obj, names)
+
+
+def getRemembered(obj, name, default=None, allowExpired=False):
+    """
+    Return the remembered value of a method without arguments, without calling the method.
+    Return `default` when there is no valid remembered value.
+    Set `allowExpired` to `True` to return a value after its time to live has passed.
+    """
+    memo = obj.__dict__.get("_remembered", dict()).get(name)
+    if not memo or () not in memo:
+        return default
+    value, expires = memo[()]
+    if not allowExpired and expires is not None and expires <= time.time():
+        return default
+    return value
+
+
+def getRememberedTime(obj, name):
+    """
+    Return the time the remembered value of a method without arguments was retrieved.
+    Return `None` when there is no valid remembered value or the method has no time to live.
+    """
+    memo = obj.__dict__.get("_remembered", dict()).get(name)
+    timeToLive = rememberedTimeToLive.get(name)
+    if not memo or () not in memo or timeToLive is None:
+        return None
+    value, expires = memo[()]
+    if expires <= time.time():
+        return None
+    return expires - timeToLive
+
+
+def setRemembered(obj, name, value, rememberedAt=None):
+    """
+    Set the remembered value of a method without arguments.
+    Optionally provide the time the value was retrieved, to calculate when it expires.
+    Remembered values of methods depending on this method are cleared.
+    """
+    clearRemembered(obj, name)
+    expires = None
+    timeToLive = rememberedTimeToLive.get(name)
+    if timeToLive is not None:
+        if rememberedAt is None:
+            rememberedAt = time.time()
+        expires = rememberedAt + timeToLive
+    objectMemo = obj.__dict__.get("_remembered")
+    if objectMemo is None:
+        objectMemo = obj.__dict__.setdefault("_remembered", dict())
+    objectMemo.setdefault(name, dict())[()] = value, expires
+    rememberedRegistry.touch(obj, name)
+
+
+def remember(function=None, dependsOn=(), ttl=None):
     """
     A decorator caching the result of a method.
+
+    The values are stored on the instance, use `clearRemembered` to clear them.
+    Optionally provide the names of the remembered methods this method depends on in `dependsOn`,
+    clearing those also clears this method.
+    Optionally provide a `ttl`, the amount of seconds a value is valid.
+
+    Functions without arguments are remembered as well.
     """
-    memo = {}
+    if function is None:
+        return lambda function: remember(function, dependsOn=dependsOn, ttl=ttl)
+
+    name = function.__name__
+    for dependency in dependsOn:
+        rememberedDependents.setdefault(dependency, set()).add(name)
+    if ttl is not None:
+        rememberedTimeToLive[name] = ttl
+
+    functionMemo = {}
+    remembered.append(functionMemo)
 
     def wrapper(*args):
-        if args in memo:
-            return memo[args]
+        if args:
+            obj = args[0]
+            objectMemo = obj.__dict__.get("_remembered")
+            if objectMemo is None:
+                objectMemo = obj.__dict__.setdefault("_remembered", dict())
+            memo = objectMemo.get(name)
+            if memo is None:
+                memo = objectMemo.setdefault(name, dict())
+            rememberedRegistry.touch(obj, name)
+            key = args[1:]
         else:
-            rv = function(*args)
-            memo[args] = rv
-            return rv
+            memo = functionMemo
+            key = args
+        if key in memo:
+            rv, expires = memo[key]
+            if expires is None or expires > time.time():
+                return rv
+        rv = function(*args)
+        expires = None
+        timeToLive = rememberedTimeToLive.get(name)
+        if timeToLive is not None:
+            expires = time.time() + timeToLive
+        memo[key] = rv, expires
+        return rv
 
-    def _reset(args):
-        if not args:
-            memo.clear()
-        else:
-            for key in list(memo):
-                found = True
-                for arg in args:
-                    if arg not in key:
-                        found = False
-                        break
-                if found:
-                    del memo[key]
-    wrapper.reset = _reset
-    remembered.append(wrapper)
+    wrapper.__name__ = name
+    wrapper.__doc__ = function.__doc__
     return wrapper
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import atexit
+import logging
+
+from .mechanicTools import getDataFromURL, mechanicCacheFolder
+
+
+logger = logging.getLogger("Mechanic")
+
+
+def parseRefs(data):
+    """
+    Return a dict with refs and commit shas from a git smart http ref advertisement,
+    like the response of `<repository>.git/info/refs?service=git-upload-pack`.
+    """
+    refs = dict()
+    position = 0
+    while position + 4 <= len(data):
+        try:
+            length = int(data[position:position + 4], 16)
+        except ValueError:
+            raise ValueError("Not a valid ref advertisement.")
+        if length == 0:
+            # flush packet
+            position += 4
+            continue
+        line = data[position + 4:position + length]
+        position += length
+        if line.startswith(b"#"):
+            # service announcement
+            continue
+        line = line.split(b"\0")[0].strip()
+        if b" " not in line:
+            continue
+        sha, ref = line.split(b" ", 1)
+        refs[ref.decode("utf-8")] = sha.decode("ascii")
+    return refs
+
+
+def headCommit(refsURL, branch="master"):
+    """
+    Return the commit sha of the head of a branch, or `None` when the branch is not found.
+    """
+    refs = parseRefs(getDataFromURL(refsURL, useCache=False))
+    return refs.get("refs/heads/%s" % branch)
+
+
+class RepositoryHeads(object):
+
+    """
+    The branch head commits of repositories with the version found at that commit, stored on disk.
+
+    When the head of a repository did not move since the previous check,
+    the stored version is still valid and the info.plist is not downloaded
+    again. Head lookups are kept in memory for `maxAge` seconds, as
+    extensions in the same repository share the same head.
+    """
+
+    def __init__(self, path, maxAge=60):
+        self.path = path
+        self.maxAge = maxAge
+        self._versions = None
+        self._heads = dict()
+        self._dirty = False
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def head(self, refsURL, branch="master"):
+        """
+        Return the commit sha of the head of the branch, or `None` when it cannot be retrieved.
+        """
+        key = (refsURL, branch)
+        with self._lock:
+            if key in self._heads:
+                sha, retrievedAt = self._heads[key]
+                if retrievedAt + self.maxAge > time.time():
+                    return sha
+        try:
+            sha = headCommit(refsURL, branch)
+        except Exception as e:
+            logger.error("Cannot read the refs '%s'" % refsURL)
+            logger.error(e)
+            sha = None
+        with self._lock:
+            self._heads[key] = sha, time.time()
+        return sha
+
+    def version(self, key, sha):
+        """
+        Return the stored version for `key` when it was retrieved at commit `sha`, otherwise `None`.
+        """
+        with self._lock:
+            entry = self._getVersions().get(key)
+            if entry is None or entry["sha"] != sha:
+                return None
+            return entry["version"]
+
+    def setVersion(self, key, sha, version):
+        with self._lock:
+            self._getVersions()[key] = dict(sha=sha, version=version)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._versions = dict()
+            self._heads = dict()
+            self._dirty = True
+            self.flush()
+
+    def flush(self):
+        """
+        Write the stored versions to disk.
+        """
+        with self._lock:
+            if not self._dirty or self._versions is None:
+                return
+            try:
+                folder = os.path.dirname(self.path)
+                os.makedirs(folder, exist_ok=True)
+                fd, tempPath = tempfile.mkstemp(dir=folder)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(json.dumps(self._versions, separators=(",", ":")).encode("utf-8"))
+                os.replace(tempPath, self.path)
+                self._dirty = False
+            except Exception as e:
+                logger.error("Cannot write the repository heads '%s'" % self.path)
+                logger.error(e)
+
+    # helpers
+
+    def _getVersions(self):
+        if self._versions is None:
+            self._versions = dict()
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "rb") as f:
+                        self._versions = json.loads(f.read())
+                except Exception as e:
+                    logger.error("Cannot read the repository heads '%s'" % self.path)
+                    logger.error(e)
+        return self._versions
+
+
+repositoryHeads = RepositoryHeads(mechanicCacheFolder("heads.json"))
@@ -0,0 +1,198 @@
+from collections import defaultdict
+
+
+class SearchIndex(object):
+
+    """
+    An index of extension items to search for words in the name, developer, description and tags.
+
+    All substrings of `gramSize` characters of every word are mapped to
+    the indexes of the items containing them. A search intersects these
+    posting lists and only verifies the remaining candidates, shorter
+    words are verified against all items. When a query extends the
+    previous query, only the previous results are searched.
+
+    Some words search for the state of an extension:
+    `?update?`, `?installed?` and `?not_installed?`.
+    Queries with state words are never narrowed, as the state can change,
+    call `invalidate` when the state of the items changes.
+    """
+
+    stateWords = {
+        "?update?": lambda item: item.knownExtensionNeedsUpdate(),
+        "?installed?": lambda item: item.isExtensionInstalled(),
+        "?not_installed?": lambda item: not item.isExtensionInstalled(),
+    }
+
+    def __init__(self, items, gramSize=3):
+        self.items = list(items)
+        self.gramSize = gramSize
+        self._texts = []
+        self._postings = defaultdict(set)
+        for index, item in enumerate(self.items):
+            text = " ".join([
+                item.extensionName() or "",
+                item.extensionDeveloper() or "",
+                item.extensionDescription() or "",
+                " ".join(item.extensionTags())
+            ]).lower()
+            self._texts.append(text)
+            grams = set()
+            for word in set(text.split()):
+                grams.update(word[i:i + gramSize] for i in range(len(word) - gramSize + 1))
+            for gram in grams:
+                self._postings[gram].add(index)
+        self._lastQuery = None
+        self._lastResult = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def invalidate(self):
+        """
+        Forget the previous result, the next search starts from all items.
+        """
+        self._lastQuery = None
+        self._lastResult = None
+
+    def search(self, query):
+        """
+        Return a set of indexes of the items containing all the words in the query.
+        """
+        query = query.lower().strip()
+        words = query.split()
+        if not words:
+            self.invalidate()
+            return set(range(len(self.items)))
+        candidates = None
+        if self._lastQuery and query.startswith(self._lastQuery) and not self._hasStateWords(self._lastQuery) and not self._hasStateWords(query):
+            # typing more characters can only narrow the previous result
+            candidates = self._lastResult
+        for word in sorted(words, key=len, reverse=True):
+            candidates = self._searchWord(word, candidates)
+            if not candidates:
+                break
+        self._lastQuery = query
+        self._lastResult = candidates
+        return set(candidates)
+
+    # helpers
+
+    def _hasStateWords(self, query):
+        # a partially typed state word matches nothing until it is complete
+        for word in query.split():
+            if any(stateWord.startswith(word) for stateWord in self.stateWords):
+                return True
+        return False
+
+    def _searchWord(self, word, candidates):
+        if word in self.stateWords:
+            test = self.stateWords[word]
+            if candidates is None:
+                candidates = range(len(self.items))
+            return {index for index in candidates if test(self.items[index])}
+        if len(word) < self.gramSize:
+            if candidates is None:
+                candidates = range(len(self.items))
+        elif candidates is None or len(candidates) > 64:
+            grams = sorted(
+                (self._postings.get(word[i:i + self.gramSize], set()) for i in range(len(word) - self.gramSize + 1)),
+                key=len
+            )
+            found = set(grams[0])
+            for gram in grams[1:]:
+                found &= gram
+                if not found:
+                    return found
+            if candidates is not None:
+                found &= candidates
+            candidates = found
+        return {index for index in candidates if word in self._texts[index]}
+
+
+def indexesToBitset(indexes):
+    """
+    Return an int with the bits set for the given indexes.
+    """
+    bitset = 0
+    for index in indexes:
+        bitset |= 1 << index
+    return bitset
+
+
+def bitsetToIndexes(bitset):
+    """
+    Return a sorted list of the indexes of the bits set in an int.
+    """
+    indexes = []
+    while bitset:
+        lowest = bitset & -bitset
+        indexes.append(lowest.bit_length() - 1)
+        bitset ^= lowest
+    return indexes
+
+
+def bitsetCount(bitset):
+    return bin(bitset).count("1")
+
+
+class FacetIndex(object):
+
+    """
+    Bitsets of item indexes for each value of each facet, like developers or tags.
+
+    `facets` is a dict with facet names as keys and functions returning
+    the values of an item for that facet as values.
+
+    Filtering combines the selected values of a facet with OR and
+    the facets with AND.
+    """
+
+    def __init__(self, items, facets):
+        self.items = list(items)
+        self.allItems = (1 << len(self.items)) - 1
+        self._bitsets = {name: dict() for name in facets}
+        for index, item in enumerate(self.items):
+            bit = 1 << index
+            for name, getValues in facets.items():
+                bitsets = self._bitsets[name]
+                for value in getValues(item):
+                    bitsets[value] = bitsets.get(value, 0) | bit
+
+    def facetNames(self):
+        return list(self._bitsets)
+
+    def values(self, name):
+        """
+        Return the sorted values of a facet.
+        """
+        return sorted(self._bitsets[name])
+
+    def bitset(self, name, value):
+        return self._bitsets[name].get(value, 0)
+
+    def filter(self, selection, exclude=None):
+        """
+        Return the bitset of the items matching the selection,
+        a dict with facet names and lists of selected values.
+        Optionally `exclude` a facet from the selection.
+        """
+        bitset = self.allItems
+        for name, values in selection.items():
+            if name == exclude or not values:
+                continue
+            facetBitset = 0
+            for value in values:
+                facetBitset |= self.bitset(name, value)
+            bitset &= facetBitset
+        return bitset
+
+    def counts(self, name, selection, bitset=None):
+        """
+        Return a dict with the amount of matching items for each value of a facet,
+        given the selection of the other facets and an optional bitset, like search results.
+        """
+        other = self.filter(selection, exclude=name)
+        if bitset is not None:
+            other &= bitset
+        return {value: bitsetCount(valueBitset & other) for value, valueBitset in self._bitsets[name].items()}
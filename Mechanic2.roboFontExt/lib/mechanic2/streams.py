@@ -0,0 +1,203 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .mechanicTools import getDataFromURL, httpCache
+from .extensionItem import ExtensionRepository, ExtensionStoreItem, ExtensionYamlItem
+from .defaults import extensionStoreDataURL
+
+
+logger = logging.getLogger("Mechanic")
+
+
+def fetchStream(url):
+    """
+    Return the extension entries of a url stream, raise an error when the stream cannot be read.
+    """
+    extensionData = getDataFromURL(url, formatter=json.loads)
+    return extensionData.get("extensions", [])
+
+
+def getExtensionData(url):
+    """
+    Return the extension entries of a url stream, or an empty list when the stream cannot be read.
+    """
+    try:
+        return fetchStream(url)
+    except Exception as e:
+        logger.error("Cannot read url '%s'" % url)
+        logger.error(e)
+    return []
+
+
+def fetchStreams(urls, fallback=None, maxWorkers=8, errors=None):
+    """
+    Return a dict with the extension entries for each url stream, all streams are fetched at the same time.
+    Optionally provide a `fallback` dict with entries for streams which cannot be read.
+    Optionally provide an `errors` dict, the error of each stream which cannot be read is added.
+    """
+    urls = list(urls)
+    if not urls:
+        return dict()
+
+    def _fetch(url):
+        try:
+            return fetchStream(url)
+        except Exception as e:
+            logger.error("Cannot read url '%s'" % url)
+            logger.error(e)
+            if errors is not None:
+                errors[url] = e
+            return (fallback or dict()).get(url, [])
+
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(urls))) as executor:
+        streams = dict(zip(urls, executor.map(_fetch, urls)))
+    httpCache.flush()
+    return streams
+
+
+class StreamLoader(object):
+
+    """
+    Fetch url streams at the same time without waiting for the result.
+
+    `callback(url, entries, error)` is called for each stream as soon as
+    it is read, `entries` is `None` when the stream failed. When all streams
+    are read `doneCallback(streams, errors)` is called with a dict of entries
+    and a dict of errors per url.
+
+    Callbacks are called through `dispatch(function, *args)`, by default
+    directly from the worker threads. Pass `callAfter` to get them on the
+    main thread.
+    """
+
+    def __init__(self, urls, callback=None, doneCallback=None, dispatch=None, maxWorkers=8):
+        self.urls = list(urls)
+        self.callback = callback
+        self.doneCallback = doneCallback
+        self.dispatch = dispatch
+        self.maxWorkers = maxWorkers
+        self.streams = dict()
+        self.errors = dict()
+        self._delivered = 0
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        if not self.urls:
+            self._call(self._done)
+            return
+        self._executor = ThreadPoolExecutor(max_workers=min(self.maxWorkers, len(self.urls)))
+        for url in self.urls:
+            self._executor.submit(self._fetch, url)
+        self._executor.shutdown(wait=False)
+
+    def cancel(self):
+        """
+        Stop calling the callbacks, streams already being read are left alone.
+        """
+        self._cancelled = True
+
+    def isDone(self):
+        with self._lock:
+            return self._delivered == len(self.urls)
+
+    # helpers
+
+    def _fetch(self, url):
+        # called from a worker thread
+        if self._cancelled:
+            return
+        entries = error = None
+        try:
+            entries = fetchStream(url)
+        except Exception as e:
+            logger.error("Cannot read url '%s'" % url)
+            logger.error(e)
+            error = e
+        httpCache.flush()
+        with self._lock:
+            if error is None:
+                self.streams[url] = entries
+            else:
+                self.errors[url] = error
+        self._call(self._loaded, url, entries, error)
+
+    def _call(self, function, *args):
+        if self.dispatch is None:
+            function(*args)
+        else:
+            self.dispatch(function, *args)
+
+    def _loaded(self, url, entries, error):
+        if self._cancelled:
+            return
+        if self.callback is not None:
+            self.callback(url, entries, error)
+        with self._lock:
+            self._delivered += 1
+            isDone = self._delivered == len(self.urls)
+        if isDone:
+            self._done()
+
+    def _done(self):
+        if self._cancelled or self.doneCallback is None:
+            return
+        self.doneCallback(dict(self.streams), dict(self.errors))
+
+
+def itemClassForStream(url):
+    if url == extensionStoreDataURL:
+        return ExtensionStoreItem
+    return ExtensionRepository
+
+
+def createStreamItems(url, entries, checkForUpdates=False):
+    """
+    Return a list of extension items for the entries of a url stream.
+    Entries which are not valid are logged and skipped.
+    """
+    clss = itemClassForStream(url)
+    items = []
+    for data in entries:
+        try:
+            items.append(clss(data, checkForUpdates=checkForUpdates, source=url))
+        except Exception as e:
+            logger.error("Creating extension item '%s' from url '%s' failed." % (data.get("extensionName", "unknow"), url))
+            logger.error(e)
+    return items
+
+
+def createSingleItems(singleExtensions, checkForUpdates=False):
+    """
+    Return a list of extension items for single extension items.
+    """
+    items = []
+    for singleExtension in singleExtensions:
+        try:
+            items.append(ExtensionYamlItem(singleExtension, checkForUpdates=checkForUpdates))
+        except Exception as e:
+            logger.error("Creating single extension item '%s' failed." % singleExtension.get("extensionName", "unknow"))
+            logger.error(e)
+    return items
+
+
+def findItems(items, names):
+    """
+    Return a list of the items matching the given extension names or bundle names
+    and a list of the names without any item.
+    """
+    found = []
+    missing = []
+    for name in names:
+        key = name.lower()
+        matches = [item for item in items if key in (item.extensionName().lower(), item.extensionBundleName().lower())]
+        if matches:
+            # the first stream wins
+            if matches[0] not in found:
+                found.append(matches[0])
+        else:
+            missing.append(name)
+    return found, missing
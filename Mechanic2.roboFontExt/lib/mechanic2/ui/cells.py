@@ -1,6 +1,8 @@
 import AppKit
 
 from mechanic2.mechanicTools import remember
+from mechanic2.ui.iconLoader import iconLoader
+from mechanic2.ui.remoteVersions import remoteVersionRefresher
 
 
 class MCExtensionCirleCell(AppKit.NSActionCell):
@@ -12,7 +14,7 @@ class MCExtensionCirleCell(AppKit.NSActionCell):
         if obj.isExtensionInstalled():
             if obj.isExtensionFromStore() and obj.extensionStoreKey() is None:
                 image = NotBoughtIndicator()
-            elif obj.extensionNeedsUpdate():
+            elif remoteVersionRefresher.needsUpdate(obj, view):
                 image = UpdateIndicator()
             else:
                 image = InstalledIndicator()
@@ -99,13 +101,37 @@ def UpdateIndicator():
     return image
 
 
+@remember
+def IconPlaceholder():
+    width = 39
+    height = 39
+    image = AppKit.NSImage.alloc().initWithSize_((width, height))
+    image.lockFocus()
+
+    path = AppKit.NSBezierPath.bezierPathWithRoundedRect_xRadius_yRadius_(((4, 4), (31, 31)), 6, 6)
+
+    color1 = AppKit.NSColor.colorWithCalibratedWhite_alpha_(0.0, 0.05)
+
+    color1.set()
+    path.fill()
+
+    image.unlockFocus()
+
+    return image
+
+
 class MCImageTextFieldCell(AppKit.NSTextFieldCell):
 
     def drawWithFrame_inView_(self, frame, view):
         controller = self.objectValue()
         obj = controller.extensionObject()
 
-        image = obj.extensionIcon()
+        image = None
+        imageURL = obj.extensionIconURL()
+        if imageURL:
+            # never download in the draw pass, draw a placeholder
+            # the view is redrawn when the icon is loaded
+            image = iconLoader.iconForURL(imageURL, view) or IconPlaceholder()
         if image:
             rowHeight = view.rowHeight()
             imageFrame = frame.copy()
@@ -1,18 +1,27 @@
 from AppKit import *
-import json
 import logging
 import time
 
 import vanilla
 from defconAppKit.windows.baseWindow import BaseWindowController
 
+from PyObjCTools.AppHelper import callAfter
+
 from mojo.extensions import getExtensionDefault, setExtensionDefault
 
 from mechanic2.ui.cells import MCExtensionCirleCell, MCImageTextFieldCell
 from mechanic2.ui.formatters import MCExtensionDescriptionFormatter
-from mechanic2.ui.settings import Settings, extensionStoreDataURL
-from mechanic2.extensionItem import ExtensionRepository, ExtensionStoreItem, ExtensionYamlItem
-from mechanic2.mechanicTools import getDataFromURL
+from mechanic2.ui.settings import Settings
+from mechanic2.ui.remoteVersions import remoteVersionRefresher
+from mechanic2.mechanicTools import httpCache
+from mechanic2.bundleStore import bundleStore
+from mechanic2.extensionItem import BaseExtensionItem
+from mechanic2.updateChecker import UpdateChecker
+from mechanic2.installPipeline import InstallPipeline
+from mechanic2.updatePrefetcher import UpdatePrefetcher
+from mechanic2.streams import StreamLoader, createStreamItems, createSingleItems
+from mechanic2.catalogSnapshot import catalogSnapshot, collectRemoteVersions, applyRemoteVersions
+from mechanic2.searchIndex import SearchIndex, FacetIndex, indexesToBitset, bitsetToIndexes
 
 
 from lib.tools.debugTools import ClassNameIncrementer
@@ -46,20 +55,15 @@ class MCExtensionListItem(NSObject, metaclass=ClassNameIncrementer):
         return self._extensionObject.extensionSearchString()
 
 
-def getExtensionData(url):
-    try:
-        extensionData = getDataFromURL(url, formatter=json.loads)
-    except Exception as e:
-        logger.error("Cannot read url '%s'" % url)
-        logger.error(e)
-        extensionData = dict()
-    return extensionData.get("extensions", [])
-
-
 class MechanicController(BaseWindowController):
 
     def __init__(self, checkForUpdates=False, shouldLoad=False):
 
+        httpCache.setMaxSize(getExtensionDefault("com.mechanic.httpCacheSize"))
+        bundleStore.setMaxSize(getExtensionDefault("com.mechanic.bundleStoreSize"))
+        bundleStore.setMaxVersions(getExtensionDefault("com.mechanic.bundleStoreVersions"))
+        BaseExtensionItem.useDeltaDownloads = getExtensionDefault("com.mechanic.deltaDownloads")
+
         self.w = vanilla.Window((800, 600), "Mechanic 2.1", minSize=(600, 400))
 
         # toolbar
@@ -132,21 +136,26 @@ class MechanicController(BaseWindowController):
 
         # filters
 
+        facetColumnDescriptions = [
+            dict(title="value", key="value", editable=False),
+            dict(title="count", key="count", width=40, editable=False),
+        ]
+
         developersGroup = vanilla.Group((0, 0, -0, -0))
         developersGroup.developersLabel = vanilla.TextBox((0, 0, -0, -0), 'developers', sizeStyle='small')
-        developersGroup.developersList  = vanilla.List((0, 20, -0, -0), [], drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
+        developersGroup.developersList  = vanilla.List((0, 20, -0, -0), [], columnDescriptions=facetColumnDescriptions, showColumnTitles=False, drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
         developersGroup.developersList.getNSTableView().setUsesAlternatingRowBackgroundColors_(False)
         # developersGroup.developersList.getNSTableView().setSelectionHighlightStyle_(NSTableViewSelectionHighlightStyleSourceList)
 
         tagsGroup = vanilla.Group((0, 0, -0, -0))
         tagsGroup.tagsLabel = vanilla.TextBox((0, 0, -0, -0), 'tags', sizeStyle='small')
-        tagsGroup.tagsList  = vanilla.List((0, 20, -0, -0), [], drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
+        tagsGroup.tagsList  = vanilla.List((0, 20, -0, -0), [], columnDescriptions=facetColumnDescriptions, showColumnTitles=False, drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
         tagsGroup.tagsList.getNSTableView().setUsesAlternatingRowBackgroundColors_(False)
         # tagsGroup.tagsList.getNSTableView().setSelectionHighlightStyle_(NSTableViewSelectionHighlightStyleSourceList)
 
         sourcesGroup = vanilla.Group((0, 0, -0, -0))
         sourcesGroup.sourcesLabel = vanilla.TextBox((0, 0, -0, -0), 'sources', sizeStyle='small')
-        sourcesGroup.sourcesList  = vanilla.List((0, 20, -0, -0), [], drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
+        sourcesGroup.sourcesList  = vanilla.List((0, 20, -0, -0), [], columnDescriptions=facetColumnDescriptions, showColumnTitles=False, drawHorizontalLines=False, drawFocusRing=False, selectionCallback=self.filtersCallback)
         sourcesGroup.sourcesList.getNSTableView().setUsesAlternatingRowBackgroundColors_(False)
         # sourcesGroup.sourcesList.getNSTableView().setSelectionHighlightStyle_(NSTableViewSelectionHighlightStyleSourceList)
 
@@ -184,76 +193,156 @@ class MechanicController(BaseWindowController):
         self._tagsGroup = tagsGroup
         self._sourcesGroup = sourcesGroup
 
+        self.w.bind("close", self.windowCloseCallback)
         self.w.open()
 
+        self._extensionItems = []
+        self._listItems = []
+        self._searchIndex = SearchIndex([])
+        self._facetIndex = FacetIndex([], self.facets)
+        self._updatingFacets = False
+        self._streams = dict()
+        self._streamItems = dict()
+        self._singleItems = []
+        self._streamStates = dict()
+        self._streamLoader = None
+        self._loadProgress = None
+        self._prefetcher = None
+        self._didLoadExtensions = False
+        self._windowClosed = False
         self._didCheckedForUpdates = False
         if shouldLoad:
             self.loadExtensions(checkForUpdates)
 
     def loadExtensions(self, checkForUpdates=False):
-        progress = self.startProgress("Loading extensions...")
-
-        wrappedItems = []
-
-        allDevelopers = []
-        allTags = []
-        allSources = []
-
-        # load extension streams
-        for urlStream in getExtensionDefault("com.mechanic.urlstreams"):
-            allSources.append(urlStream)
-
-            clss = ExtensionRepository
-            if urlStream == extensionStoreDataURL:
-                clss = ExtensionStoreItem
-
-            for data in getExtensionData(urlStream):
-                try:
-                    item = MCExtensionListItem(clss(data, checkForUpdates=checkForUpdates))
-                    wrappedItems.append(item)
-
-                    allDevelopers.append(data['developer'])
-                    allTags += data['tags']
+        urlStreams = list(getExtensionDefault("com.mechanic.urlstreams"))
+
+        if self._streamLoader is not None:
+            self._streamLoader.cancel()
+            self._streamLoader = None
+            if self._loadProgress is not None:
+                self._loadProgress.close()
+                self._loadProgress = None
+
+        # show the streams already known right away,
+        # the last loaded catalog when the window opens
+        remoteVersions = None
+        previousStreams = self._streams
+        if not self._didLoadExtensions:
+            snapshot = catalogSnapshot.load()
+            if snapshot is not None:
+                previousStreams = snapshot["streams"]
+                if not checkForUpdates:
+                    remoteVersions = snapshot["remoteVersions"]
+        elif not checkForUpdates:
+            remoteVersions = collectRemoteVersions(self._extensionItems)
+        streams = {url: previousStreams.get(url, []) for url in urlStreams}
+        self._streamStates = {url: "loading" for url in urlStreams}
+        self._setCatalog(streams, remoteVersions=remoteVersions)
 
-                except Exception as e:
-                    logger.error("Creating extension item '%s' from url '%s' failed." % (data.get("extensionName", "unknow"), urlStream))
-                    logger.error(e)
-
-        # load single extension items
-        for singleExtension in getExtensionDefault("com.mechanic.singleExtensionItems"):
-            try:
-                data = ExtensionYamlItem(singleExtension, checkForUpdates=checkForUpdates)
-                item = MCExtensionListItem(data)
-                wrappedItems.append(item)
-            except Exception as e:
-                logger.error("Creating single extension item '%s' failed." % singleExtension.get("extensionName", "unknow"))
-                logger.error(e)
-
-        # update UI list
-        progress.update("Setting Extensions...")
-        try:
-            self._extensionsGroup.extensionList.set(wrappedItems)
-            self._developersGroup.developersList.set(sorted(list(set(allDevelopers))))
-            self._tagsGroup.tagsList.set(sorted(list(set(allTags))))
-            self._sourcesGroup.sourcesList.set(allSources)
-
-        except Exception as e:
-            logger.error("Cannot set items in mechanic list.")
-            logger.error(e)
+        if checkForUpdates:
+            self._loadProgress = self.startProgress("Loading extensions...")
+
+        # load all streams at the same time,
+        # each stream is added to the list as soon as it arrives
+        self._streamLoader = StreamLoader(
+            urlStreams,
+            callback=self._streamLoaded,
+            doneCallback=lambda streams, errors: self._streamsLoaded(checkForUpdates),
+            dispatch=callAfter
+        )
+        self._streamLoader.start()
 
+    def _streamLoaded(self, url, entries, error):
+        if self._windowClosed:
+            return
+        if error is not None:
+            # keep the previous entries of a failing stream
+            self._streamStates[url] = "failed"
+            self._updateStreamStates()
+            return
+        self._streamStates[url] = None
+        if entries != self._streams.get(url):
+            # swap the items of this stream, keep the already known remote versions
+            items = createStreamItems(url, entries)
+            applyRemoteVersions(items, collectRemoteVersions(self._streamItems.get(url, [])))
+            self._streams[url] = entries
+            self._streamItems[url] = items
+            self._updateCatalog()
+        else:
+            self._updateStreamStates()
+
+    def _streamsLoaded(self, checkForUpdates):
+        progress = self._loadProgress
+        self._streamLoader = None
+        self._loadProgress = None
+        if self._windowClosed:
+            if progress is not None:
+                progress.close()
+            return
+        items = self._extensionItems
         if checkForUpdates:
             progress.update("Checking for updates...")
-            progress.setTickCount(len(wrappedItems))
-            for item in wrappedItems:
-                progress.update()
-                item.extensionObject().extensionNeedsUpdate()
+            progress.setTickCount(len(items))
+            for item in items:
+                item._shouldCheckForUpdates = True
+                item.resetRemembered("remoteVersion")
+            checker = UpdateChecker()
+            results = checker.check(items, callback=lambda item: progress.update())
             progress.setTickCount(None)
+            self._prefetchUpdates(results)
             now = time.time()
             setExtensionDefault("com.mechanic.lastUpdateCheck", now)
             title = time.strftime("Checked at %H:%M", time.localtime(now))
             self._extensionsGroup.checkForUpdates.setTitle(title)
             self._didCheckedForUpdates = True
-        progress.close()
+            self._extensionsGroup.extensionList.getNSTableView().reloadData()
+            self.extensionListSelectionCallback(self._extensionsGroup.extensionList)
+        if progress is not None:
+            progress.close()
+        catalogSnapshot.save(self._streams, items)
+
+    def _prefetchUpdates(self, results):
+        # download the updates in the background, an update only needs a local install
+        if not getExtensionDefault("com.mechanic.prefetchUpdates"):
+            return
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+        self._prefetcher = UpdatePrefetcher(maxBytesPerSecond=getExtensionDefault("com.mechanic.prefetchMaxBytesPerSecond"))
+        self._prefetcher.start([item for item, needsUpdate in results.items() if needsUpdate])
+
+    def _setCatalog(self, streams, remoteVersions=None):
+        self._streams = dict(streams)
+        self._streamItems = dict()
+        for urlStream, entries in streams.items():
+            self._streamItems[urlStream] = createStreamItems(urlStream, entries)
+        # load single extension items
+        self._singleItems = createSingleItems(getExtensionDefault("com.mechanic.singleExtensionItems"))
+        if remoteVersions:
+            for items in list(self._streamItems.values()) + [self._singleItems]:
+                applyRemoteVersions(items, remoteVersions)
+        self._didLoadExtensions = True
+        return self._updateCatalog()
+
+    def _updateCatalog(self):
+        # combine the items of all streams in the order of the streams
+        listItems = dict((id(item), listItem) for item, listItem in zip(self._extensionItems, self._listItems))
+        items = []
+        for urlStream in self._streams:
+            items.extend(self._streamItems.get(urlStream, []))
+        items.extend(self._singleItems)
+
+        self._extensionItems = items
+        self._listItems = [listItems.get(id(item)) or MCExtensionListItem(item) for item in items]
+        self._searchIndex = SearchIndex(items)
+        self._facetIndex = FacetIndex(items, self.facets)
+        try:
+            self._setFacetLists()
+            self._applyFilters()
+        except Exception as e:
+            logger.error("Cannot set items in mechanic list.")
+            logger.error(e)
+        return items
 
     def extensionListSelectionCallback(self, sender):
         items = self.getSelection()
@@ -261,7 +350,7 @@ class MechanicController(BaseWindowController):
 
         notInstalled = [item for item in items if not item.isExtensionInstalled()]
         installed = [item for item in items if item.isExtensionInstalled()]
-        needsUpdate = [item for item in installed if item.extensionNeedsUpdate()]
+        needsUpdate = [item for item in installed if remoteVersionRefresher.needsUpdate(item, sender.getNSTableView())]
         notInstalledStore = [item for item in notInstalled if item.isExtensionFromStore()]
         notInstalledNotStore = [item for item in notInstalled if not item.isExtensionFromStore()]
 
@@ -327,11 +416,13 @@ class MechanicController(BaseWindowController):
                     items = self.getSelection()
                     progress = self.startProgress("Updating %s extensions..." % len(items))
                     progress.setTickCount(len(items))
-                    for item in items:
-                        progress.update()
-                        item.forceCheckExtensionNeedsUpdate()
+                    checker = UpdateChecker()
+                    results = checker.check(items, callback=lambda item: progress.update(), force=True)
                     progress.setTickCount(None)
                     progress.close()
+                    self._prefetchUpdates(results)
+                    self._searchIndex.invalidate()
+                    self._applyFilters()
                     self._extensionsGroup.extensionList.getNSTableView().reloadData()
                     self.extensionListSelectionCallback(self._extensionsGroup.extensionList)
                 else:
@@ -374,7 +465,7 @@ class MechanicController(BaseWindowController):
 
     def updateCallback(self, sender):
         items = self.getSelection()
-        items = [item for item in items if item.isExtensionInstalled() and item.extensionNeedsUpdate()]
+        items = [item for item in items if item.isExtensionInstalled() and item.knownExtensionNeedsUpdate()]
         if not items:
             return
         self._extensionAction(items=items, message="Updating extensions...", action="remoteInstall")
@@ -385,15 +476,27 @@ class MechanicController(BaseWindowController):
         if multiSelection:
             progress.setTickCount(len(items))
         foundErrors = False
-        for item in items:
-            callback = getattr(item, action)
-            try:
-                callback(**kwargs)
-            except Exception as e:
-                print("Could not execute: '%s'. \n\n%s" % (action, e))
-                foundErrors = True
-            progress.update()
+        if action == "remoteInstall":
+            # download and extract all at once, install in order
+            pipeline = InstallPipeline()
+            results = pipeline.run(items, callback=lambda item, error: progress.update(), **kwargs)
+            for item, error in results.items():
+                if error is not None:
+                    print("Could not execute: '%s' for '%s'. \n\n%s" % (action, item.extensionName(), error))
+                    foundErrors = True
+        else:
+            for item in items:
+                callback = getattr(item, action)
+                try:
+                    callback(**kwargs)
+                except Exception as e:
+                    print("Could not execute: '%s'. \n\n%s" % (action, e))
+                    foundErrors = True
+                progress.update()
         progress.close()
+        # the installed state changed, search and filter again
+        self._searchIndex.invalidate()
+        self._applyFilters()
         self._extensionsGroup.extensionList.getNSTableView().reloadData()
         self.extensionListSelectionCallback(self._extensionsGroup.extensionList)
         if foundErrors:
@@ -402,61 +505,110 @@ class MechanicController(BaseWindowController):
     def settingsCallback(self, sender):
         self.loadExtensions()
 
+    def windowCloseCallback(self, sender):
+        self._windowClosed = True
+        if self._streamLoader is not None:
+            self._streamLoader.cancel()
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+
     # toolbar
 
     def toolbarSettings(self, sender):
         Settings(self.w, callback=self.settingsCallback)
 
     def toolbarSearch(self, sender):
-        search = sender.get()
-        arrayController = self._extensionsGroup.extensionList.getNSTableView().dataSource()
-        if not search:
-            arrayController.setFilterPredicate_(None)
-        else:
-            searches = search.lower().strip().split(" ")
-            query = []
-            for search in searches:
-                query.append('extensionSearchString CONTAINS "%s"' % search)
-            query = " AND ".join(query)
-            predicate = NSPredicate.predicateWithFormat_(query)
-            arrayController.setFilterPredicate_(predicate)
+        self._applyFilters()
 
     # filters
 
-    def filtersCallback(self, sender):
-        developers = self._developersGroup.developersList.get()
-        tags = self._tagsGroup.tagsList.get()
-        sources = self._sourcesGroup.sourcesList.get()
+    facets = dict(
+        developers=lambda item: [item.extensionDeveloper()] if item.extensionDeveloper() else [],
+        tags=lambda item: item.extensionTags(),
+        sources=lambda item: [item.extensionSource()] if item.extensionSource() else [],
+    )
 
-        searchDevelopers = [developers[i].lower() for i in self._developersGroup.developersList.getSelection()]
-        searchTags = [tags[i] for i in self._tagsGroup.tagsList.getSelection()]
-        searchSources = [sources[i] for i in self._sourcesGroup.sourcesList.getSelection()]
+    def filtersCallback(self, sender):
+        if self._updatingFacets:
+            return
+        self._applyFilters()
 
-        arrayController = self._extensionsGroup.extensionList.getNSTableView().dataSource()
-        if not (searchDevelopers or searchTags or searchSources):
-            arrayController.setFilterPredicate_(None)
+    def _facetLists(self):
+        return dict(
+            developers=self._developersGroup.developersList,
+            tags=self._tagsGroup.tagsList,
+            sources=self._sourcesGroup.sourcesList,
+        )
 
-        else:
-            searchDevelopers = [developers[i].lower() for i in self._developersGroup.developersList.getSelection()]
-            searchTags = [tags[i] for i in self._tagsGroup.tagsList.getSelection()]
-            # searchSources = [sources[i] for i in self._sourcesGroup.sourcesList.getSelection()]
-
-            queryDevelopers = [f'extensionSearchString CONTAINS "{s}"' for s in searchDevelopers]
-            queryTags = [f'extensionSearchString CONTAINS "{s}"' for s in searchTags]
-            # querySources = [f'extensionSearchString CONTAINS "{s}"' for s in searchSources]
-
-            queries = []
-            for q in [queryDevelopers, queryTags]: # querySources
-                if not q:
-                    continue
-                queries.append(f'({" OR ".join(q)})')
-
-            query = " AND ".join(queries) if len(queries) > 1 else queries[0]
-            print(query)
-
-            predicate = NSPredicate.predicateWithFormat_(query)
-            arrayController = self._extensionsGroup.extensionList.getNSTableView().dataSource()
-            arrayController.setFilterPredicate_(predicate)
+    def _facetSelection(self):
+        selection = dict()
+        for name, facetList in self._facetLists().items():
+            rows = facetList.get()
+            selection[name] = [rows[i]["value"] for i in facetList.getSelection()]
+        return selection
+
+    def _setFacetLists(self):
+        # set the facet values, keep the selected values
+        selection = self._facetSelection()
+        self._updatingFacets = True
+        try:
+            for name, facetList in self._facetLists().items():
+                values = self._facetIndex.values(name)
+                if name == "sources":
+                    # show streams without items, like streams still loading or failing
+                    values = sorted(set(values) | set(self._streamStates))
+                facetList.set([dict(value=value, count=0) for value in values])
+                facetList.setSelection([values.index(value) for value in selection[name] if value in values])
+        finally:
+            self._updatingFacets = False
+
+    def _applyFilters(self):
+        # combine the search results with the selected facets
+        # and set the matching items in the list, keep the selected items
+        extensionList = self._extensionsGroup.extensionList
+        selectedItems = set(id(item) for item in self.getSelection())
+        searchBitset = indexesToBitset(self._searchIndex.search(self._toolbarSearch.get()))
+        selection = self._facetSelection()
+        bitset = searchBitset & self._facetIndex.filter(selection)
+        indexes = bitsetToIndexes(bitset)
+        extensionList.set([self._listItems[index] for index in indexes])
+        if selectedItems:
+            extensionList.setSelection([i for i, index in enumerate(indexes) if id(self._extensionItems[index]) in selectedItems])
+        # update the facet counts
+        for name, facetList in self._facetLists().items():
+            if name == "sources":
+                continue
+            counts = self._facetIndex.counts(name, selection, searchBitset)
+            for row in facetList:
+                row["count"] = counts.get(row["value"], 0)
+            facetList.getNSTableView().reloadData()
+        self._updateStreamStates(selection, searchBitset)
+
+    def _updateStreamStates(self, selection=None, searchBitset=None):
+        # show streams still loading and failing streams inline in the sources list
+        if selection is None:
+            selection = self._facetSelection()
+        if searchBitset is None:
+            searchBitset = indexesToBitset(self._searchIndex.search(self._toolbarSearch.get()))
+        counts = self._facetIndex.counts("sources", selection, searchBitset)
+        sourcesList = self._sourcesGroup.sourcesList
+        for row in sourcesList:
+            state = self._streamStates.get(row["value"])
+            count = counts.get(row["value"], 0)
+            if state == "failed":
+                count = "failed"
+            elif state == "loading" and not count:
+                count = "..."
+            row["count"] = count
+        sourcesList.getNSTableView().reloadData()
+        failed = [url for url, state in self._streamStates.items() if state == "failed"]
+        loading = [url for url, state in self._streamStates.items() if state == "loading"]
+        label = "sources"
+        if failed:
+            label += " (%s failed)" % len(failed)
+        elif loading:
+            label += " (loading...)"
+        self._sourcesGroup.sourcesLabel.set(label)
 
     # helpers
 
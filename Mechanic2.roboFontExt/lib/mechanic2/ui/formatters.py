@@ -1,6 +1,8 @@
 import AppKit
 import logging
 
+from mechanic2.ui.remoteVersions import remoteVersionRefresher
+
 
 logger = logging.getLogger("Mechanic")
 
@@ -57,9 +59,9 @@ class MCExtensionDescriptionFormatter(AppKit.NSFormatter):
                 string.appendAttributedString_(update)
                 attrs[AppKit.NSForegroundColorAttributeName] = grayColor
 
-            if obj.extensionNeedsUpdate():
+            if remoteVersionRefresher.needsUpdate(obj):
                 attrs[AppKit.NSForegroundColorAttributeName] = AppKit.NSColor.orangeColor()
-                update = AppKit.NSAttributedString.alloc().initWithString_attributes_(u'Found update %s \u2192 %s\u2003' % (obj.extensionVersion(), obj.remoteVersion()), attrs)
+                update = AppKit.NSAttributedString.alloc().initWithString_attributes_(u'Found update %s \u2192 %s\u2003' % (obj.extensionVersion(), obj.knownRemoteVersion(allowExpired=True)), attrs)
                 string.appendAttributedString_(update)
                 attrs[AppKit.NSForegroundColorAttributeName] = grayColor
             elif obj.isExtensionInstalled():
@@ -0,0 +1,144 @@
+import AppKit
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyObjCTools.AppHelper import callAfter
+
+from mechanic2.mechanicTools import getDataFromURL, mechanicCacheFolder
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class IconLoader(object):
+
+    """
+    Load extension icons in the background.
+
+    Downloaded icons are scaled down to `size` points and stored as png
+    files in `cacheFolder`, keyed by url. The least recently used files are
+    removed when the cache folder exceeds `maxCacheSize` bytes. The views
+    waiting for an icon are redrawn on the main thread when the icon is available.
+    """
+
+    def __init__(self, cacheFolder, size=39, scale=2, maxWorkers=4, maxImages=500, maxCacheSize=20 * 1024 * 1024):
+        self.cacheFolder = cacheFolder
+        self.size = size
+        self.scale = scale
+        self.maxImages = maxImages
+        self.maxCacheSize = maxCacheSize
+        self._images = OrderedDict()
+        self._pending = dict()
+        self._failed = set()
+        self._pruneLock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers)
+
+    def iconForURL(self, url, view=None):
+        """
+        Return the icon for the given url or `None` when the icon is not loaded yet.
+        Optionally provide a `view` to redraw when the icon is loaded.
+
+        This must be called from the main thread.
+        """
+        if url in self._images:
+            self._images.move_to_end(url)
+            return self._images[url]
+        if url in self._failed:
+            return None
+        if url not in self._pending:
+            self._pending[url] = set()
+            self._executor.submit(self._load, url)
+        if view is not None:
+            self._pending[url].add(view)
+        return None
+
+    # helpers
+
+    def _cachePath(self, url):
+        return os.path.join(self.cacheFolder, "%s.png" % hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _load(self, url):
+        # called from a worker thread
+        data = None
+        path = self._cachePath(url)
+        try:
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                # mark as recently used
+                os.utime(path)
+            else:
+                data = self._thumbnailData(getDataFromURL(url, useCache=False))
+                os.makedirs(self.cacheFolder, exist_ok=True)
+                fd, tempPath = tempfile.mkstemp(dir=self.cacheFolder)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tempPath, path)
+                self._prune()
+        except Exception as e:
+            logger.error("Could not load the image from '%s'" % url)
+            logger.error(e)
+            data = None
+        callAfter(self._loaded, url, data)
+
+    def _prune(self):
+        # remove the least recently used icons when the cache folder is too big
+        with self._pruneLock:
+            entries = []
+            for entry in os.scandir(self.cacheFolder):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            totalSize = sum(size for modificationTime, size, path in entries)
+            for modificationTime, size, path in sorted(entries):
+                if totalSize <= self.maxCacheSize:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                totalSize -= size
+
+    def _thumbnailData(self, data):
+        data = AppKit.NSData.dataWithBytes_length_(data, len(data))
+        image = AppKit.NSImage.alloc().initWithData_(data)
+        if image is None:
+            raise ValueError("Not a valid image.")
+        pixels = int(self.size * self.scale)
+        rep = AppKit.NSBitmapImageRep.alloc().initWithBitmapDataPlanes_pixelsWide_pixelsHigh_bitsPerSample_samplesPerPixel_hasAlpha_isPlanar_colorSpaceName_bytesPerRow_bitsPerPixel_(
+            None, pixels, pixels, 8, 4, True, False, AppKit.NSDeviceRGBColorSpace, 0, 0
+        )
+        # a graphics context is bound to the current thread
+        context = AppKit.NSGraphicsContext.graphicsContextWithBitmapImageRep_(rep)
+        AppKit.NSGraphicsContext.saveGraphicsState()
+        AppKit.NSGraphicsContext.setCurrentContext_(context)
+        context.setImageInterpolation_(AppKit.NSImageInterpolationHigh)
+        image.drawInRect_fromRect_operation_fraction_(((0, 0), (pixels, pixels)), AppKit.NSZeroRect, AppKit.NSCompositeCopy, 1.0)
+        context.flushGraphics()
+        AppKit.NSGraphicsContext.restoreGraphicsState()
+        return bytes(rep.representationUsingType_properties_(AppKit.NSPNGFileType, dict()))
+
+    def _loaded(self, url, data):
+        # called on the main thread
+        views = self._pending.pop(url, set())
+        image = None
+        if data is not None:
+            data = AppKit.NSData.dataWithBytes_length_(data, len(data))
+            image = AppKit.NSImage.alloc().initWithData_(data)
+        if image is None:
+            self._failed.add(url)
+        else:
+            image.setSize_((self.size, self.size))
+            self._images[url] = image
+            while len(self._images) > self.maxImages:
+                self._images.popitem(last=False)
+        for view in views:
+            view.setNeedsDisplay_(True)
+
+
+iconLoader = IconLoader(mechanicCacheFolder("icons"))
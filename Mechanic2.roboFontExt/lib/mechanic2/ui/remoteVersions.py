@@ -0,0 +1,7 @@
+from PyObjCTools.AppHelper import callAfter
+
+from mechanic2.updateChecker import RemoteVersionRefresher
+
+
+# never check for updates while drawing, expired remote versions are refreshed in the background
+remoteVersionRefresher = RemoteVersionRefresher(dispatch=callAfter)
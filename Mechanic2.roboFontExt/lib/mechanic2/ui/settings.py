@@ -6,10 +6,11 @@ import logging
 
 from defconAppKit.windows.baseWindow import BaseWindowController
 
-from mojo.extensions import getExtensionDefault, setExtensionDefault, registerExtensionDefaults, removeExtensionDefault
+from mojo.extensions import getExtensionDefault, setExtensionDefault
 
 from mechanic2.extensionItem import ExtensionYamlItem
 from mechanic2.mechanicTools import getDataFromURL
+from mechanic2.defaults import extensionStoreDataURL, mechanicDataURL, registerMechanicDefaults
 
 
 logger = logging.getLogger("Mechanic")
@@ -18,26 +19,6 @@ logger = logging.getLogger("Mechanic")
 genericListPboardType = "mechanicListPBoardType"
 
 
-extensionStoreDataURL = "http://extensionstore.robofont.com/data.json"
-mechanicDataURL = "https://robofont-mechanic.github.io/mechanic-2-server/api/v2/registry.json"
-
-
-def registerMechanicDefaults(reset=False):
-    defaults = {
-        "com.mechanic.urlstreams": [extensionStoreDataURL, mechanicDataURL],
-        "com.mechanic.checkForUpdate": True,
-        "com.mechanic.singleExtensionItems": [],
-        "com.mechanic.lastUpdateCheck": 0,
-    }
-    if reset:
-        for key in defaults:
-            removeExtensionDefault(key)
-    registerExtensionDefaults(defaults)
-
-
-registerMechanicDefaults()
-
-
 class AddURLSheet(BaseWindowController):
 
     def __init__(self, parentWindow, callback, existingURLs):
@@ -98,12 +79,14 @@ class Settings(BaseWindowController):
         self._shouldCallCallback = False
 
         if debug:
-            self.w = vanilla.Window((400, 420))
+            self.w = vanilla.Window((400, 445))
         else:
-            self.w = vanilla.Sheet((400, 420), parentWindow=parentWindow)
+            self.w = vanilla.Sheet((400, 445), parentWindow=parentWindow)
 
         y = 10
         self.w.checkForUpdate = vanilla.CheckBox((10, y, -10, 22), "Check for Updates on Startup.")
+        y += 25
+        self.w.prefetchUpdates = vanilla.CheckBox((10, y, -10, 22), "Download Updates in the Background.")
         y += 30
 
         self.w.h1 = vanilla.HorizontalLine((0, y, 0, 1))
@@ -158,6 +141,9 @@ class Settings(BaseWindowController):
         # check for updates
         checkForUpdate = getExtensionDefault("com.mechanic.checkForUpdate")
         self.w.checkForUpdate.set(checkForUpdate)
+        # prefetch updates
+        prefetchUpdates = getExtensionDefault("com.mechanic.prefetchUpdates")
+        self.w.prefetchUpdates.set(prefetchUpdates)
         # urls
         urls = list(getExtensionDefault("com.mechanic.urlstreams"))
         urls = self.createURLItems(urls)
@@ -170,6 +156,9 @@ class Settings(BaseWindowController):
         # check for updates
         checkForUpdate = self.w.checkForUpdate.get()
         setExtensionDefault("com.mechanic.checkForUpdate", checkForUpdate)
+        # prefetch updates
+        prefetchUpdates = self.w.prefetchUpdates.get()
+        setExtensionDefault("com.mechanic.prefetchUpdates", prefetchUpdates)
         # urls
         urls = self.getURLItems()
         setExtensionDefault("com.mechanic.urlstreams", urls)
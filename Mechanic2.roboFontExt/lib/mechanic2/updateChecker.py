@@ -0,0 +1,243 @@
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from .mechanicTools import getRemembered, setRemembered, httpCache
+from .repositoryHeads import repositoryHeads
+
+
+logger = logging.getLogger("Mechanic")
+
+_notRemembered = object()
+
+
+class UpdatePlan(object):
+
+    """
+    The minimal set of remote info.plist fetches to check extension items for updates.
+
+    Items which are not installed or not checked for updates cannot need
+    an update and are skipped. Items with a known remote version, like
+    extension store items, need no fetch. All other items are grouped by
+    host and by `remoteInfoPath()`, each info.plist is fetched only once.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.skipped = []
+        self.resolved = []
+        self.hosts = OrderedDict()
+        for item in self.items:
+            if not item._shouldCheckForUpdates or not item.isExtensionInstalled():
+                self.skipped.append(item)
+                continue
+            remoteInfoPath = getattr(item, "remoteInfoPath", None)
+            if remoteInfoPath is None or getRemembered(item, "remoteVersion", _notRemembered) is not _notRemembered:
+                # no network involved (like extension store items)
+                self.resolved.append(item)
+                continue
+            try:
+                url = remoteInfoPath()
+            except Exception as e:
+                logger.error("Cannot check for updates for '%s'" % item.extensionName())
+                logger.error(e)
+                self.skipped.append(item)
+                continue
+            host = urlparse(url).netloc
+            self.hosts.setdefault(host, OrderedDict()).setdefault(url, []).append(item)
+
+    def fetchCount(self):
+        return sum(len(urls) for urls in self.hosts.values())
+
+    def fetches(self):
+        """
+        Return a list of `(host, remoteInfoPath, items)` tuples, alternating the hosts.
+        """
+        fetches = []
+        queues = [list(urls.items()) for urls in self.hosts.values()]
+        for index in range(max([len(queue) for queue in queues] or [0])):
+            for host, queue in zip(self.hosts, queues):
+                if index < len(queue):
+                    url, items = queue[index]
+                    fetches.append((host, url, items))
+        return fetches
+
+
+class UpdateChecker(object):
+
+    """
+    Resolve the remote versions of many extension items at once.
+
+    The network work is done by a bounded pool of worker threads,
+    with a limit on the amount of simultaneous requests per host.
+    Progress is reported on the calling thread, so it is safe to
+    update any UI from the `callback`.
+    """
+
+    def __init__(self, maxWorkers=16, maxPerHost=6):
+        self.maxWorkers = maxWorkers
+        self.maxPerHost = maxPerHost
+        self._hostLocks = dict()
+        self._hostLocksLock = threading.Lock()
+
+    def check(self, items, callback=None, force=False):
+        """
+        Resolve `remoteVersion()` for all given extension items.
+
+        Only the fetches in the `UpdatePlan` of the items are done,
+        the remote version is shared with all items using the same info.plist.
+
+        Optionally provide a `callback`, called with each item as soon as
+        its remote version is resolved.
+        Set `force` to `True` to reset all cached data of the items first.
+
+        Return a dict with items as keys and a bool as values, `True`
+        when the item needs an update.
+        """
+        results = dict()
+        if not items:
+            return results
+        if force:
+            for item in items:
+                item._shouldCheckForUpdates = True
+                item.resetRemembered()
+        plan = UpdatePlan(items)
+        for item in plan.skipped:
+            self._setResult(results, item, callback, needsUpdate=False)
+        for item in plan.resolved:
+            self._setResult(results, item, callback)
+        fetches = plan.fetches()
+        if not fetches:
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.maxWorkers, len(fetches))) as executor:
+            futures = dict()
+            for host, url, sharedItems in fetches:
+                future = executor.submit(self._resolveRemoteVersion, host, sharedItems[0])
+                futures[future] = sharedItems
+            for future in as_completed(futures):
+                sharedItems = futures[future]
+                try:
+                    remoteVersion = future.result()
+                except Exception as e:
+                    logger.error("Cannot check for updates for '%s'" % sharedItems[0].extensionName())
+                    logger.error(e)
+                    for item in sharedItems:
+                        self._setResult(results, item, callback, needsUpdate=False)
+                    continue
+                # fan out the remote version to all items sharing the info.plist
+                for item in sharedItems[1:]:
+                    setRemembered(item, "remoteVersion", remoteVersion)
+                for item in sharedItems:
+                    self._setResult(results, item, callback)
+        # store the versions found at the repository heads and the cached info.plists
+        repositoryHeads.flush()
+        httpCache.flush()
+        return results
+
+    # helpers
+
+    def _setResult(self, results, item, callback, needsUpdate=None):
+        if needsUpdate is None:
+            try:
+                needsUpdate = item.extensionNeedsUpdate()
+            except Exception as e:
+                logger.error("Cannot check for updates for '%s'" % item.extensionName())
+                logger.error(e)
+                needsUpdate = False
+        results[item] = needsUpdate
+        if callback is not None:
+            callback(item)
+
+    def _resolveRemoteVersion(self, host, item):
+        with self._hostLock(host):
+            return item.remoteVersion()
+
+    def _hostLock(self, host):
+        with self._hostLocksLock:
+            if host not in self._hostLocks:
+                self._hostLocks[host] = threading.BoundedSemaphore(self.maxPerHost)
+            return self._hostLocks[host]
+
+
+class RemoteVersionRefresher(object):
+
+    """
+    Refresh unknown or expired remote versions in the background.
+
+    `needsUpdate` never makes a network request, it is safe to call
+    while drawing. A remote version past its time to live is still used
+    and the item is checked again by an `UpdateChecker` on a worker thread.
+    The views given for an item are redrawn when its check is done,
+    through `dispatch` when given, like `callAfter` to redraw on the main thread.
+    """
+
+    def __init__(self, dispatch=None):
+        self.dispatch = dispatch
+        self._queue = []
+        self._pending = dict()
+        self._running = False
+        self._lock = threading.Lock()
+
+    def needsUpdate(self, item, view=None):
+        """
+        Return bool if the item needs an update, from the known remote version.
+        """
+        if item.shouldRefreshRemoteVersion():
+            self.refresh([item], view)
+        return item.knownExtensionNeedsUpdate()
+
+    def refresh(self, items, view=None):
+        """
+        Check the given items for updates in the background, items already waiting are skipped.
+        """
+        with self._lock:
+            for item in items:
+                if item not in self._pending:
+                    self._pending[item] = set()
+                    self._queue.append(item)
+                if view is not None:
+                    self._pending[item].add(view)
+            if self._running or not self._queue:
+                return
+            self._running = True
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def isRunning(self):
+        return self._running
+
+    # helpers
+
+    def _run(self):
+        # called from a worker thread
+        while True:
+            with self._lock:
+                items = self._queue
+                self._queue = []
+                if not items:
+                    self._running = False
+                    return
+            for item in items:
+                # the expired remote version is checked again
+                item.resetRemembered("extensionNeedsUpdate")
+            try:
+                UpdateChecker().check(items)
+            except Exception as e:
+                logger.error("Cannot refresh the remote versions")
+                logger.error(e)
+            views = set()
+            with self._lock:
+                for item in items:
+                    views.update(self._pending.pop(item, ()))
+            if not views:
+                continue
+            if self.dispatch is None:
+                self._redraw(views)
+            else:
+                self.dispatch(self._redraw, views)
+
+    def _redraw(self, views):
+        for view in views:
+            view.setNeedsDisplay_(True)
@@ -0,0 +1,139 @@
+import os
+import time
+import shutil
+import plistlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .bundleStore import bundleStore
+from .connectionPool import observeTransfers
+from .mechanicTools import ExtensionRepoError
+
+
+logger = logging.getLogger("Mechanic")
+
+
+class PrefetchCancelled(ExtensionRepoError):
+    pass
+
+
+class UpdatePrefetcher(object):
+
+    """
+    Download the updates of extension items in the background.
+
+    The new version of each extension is downloaded, extracted, checked
+    against the expected remote version and kept in the bundle store. An
+    update only needs a local extract and install afterwards.
+
+    Only `maxWorkers` zip files are downloaded at the same time and the
+    average download speed is kept below `maxBytesPerSecond`, checked for
+    each downloaded chunk. After `cancel()` running downloads are aborted,
+    no new download is started and no callback is called.
+    """
+
+    def __init__(self, maxWorkers=2, maxBytesPerSecond=1024 * 1024):
+        self.maxWorkers = maxWorkers
+        self.maxBytesPerSecond = maxBytesPerSecond
+        self.bytesDownloaded = 0
+        self._started = None
+        self._cancelled = False
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self, items, callback=None):
+        """
+        Start downloading the updates of the given items, without waiting for the result.
+
+        Optionally provide a `callback`, called from a worker thread with each item
+        and `True` when its update is ready.
+        """
+        groups = OrderedDict()
+        for item in items:
+            try:
+                version = item.knownRemoteVersion()
+                zipPath = item.remoteZipPath()
+            except Exception:
+                continue
+            if version is None or zipPath is None:
+                continue
+            if bundleStore.find(item.extensionBundleName(), version, url=zipPath) is not None:
+                # already downloaded
+                continue
+            groups.setdefault(zipPath, []).append((item, str(version)))
+        if not groups:
+            return
+        self._started = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=min(self.maxWorkers, len(groups)))
+        for zipPath, groupItems in groups.items():
+            self._executor.submit(self._prefetch, zipPath, groupItems, callback)
+        self._executor.shutdown(wait=False)
+
+    def cancel(self):
+        self._cancelled = True
+
+    def isCancelled(self):
+        return self._cancelled
+
+    # helpers
+
+    def _prefetch(self, zipPath, items, callback):
+        # called from a worker thread
+        if self._cancelled:
+            return
+        self._throttle()
+        tempFolder = tempfile.mkdtemp()
+        try:
+            with observeTransfers(self._transferred), items[0][0].openRemoteArchive(zipPath) as zipFile:
+                for index, (item, version) in enumerate(items):
+                    if self._cancelled:
+                        return
+                    itemFolder = os.path.join(tempFolder, str(index))
+                    os.mkdir(itemFolder)
+                    ready = False
+                    try:
+                        extensionPath = item.extractRemoteBundle(zipFile, itemFolder)
+                        with open(os.path.join(extensionPath, "info.plist"), "rb") as f:
+                            foundVersion = plistlib.load(f).get("version")
+                        if str(foundVersion) == version:
+                            item.storeBundle(extensionPath, zipPath)
+                            ready = True
+                        else:
+                            logger.error("Downloaded version '%s' of '%s', expected '%s'" % (foundVersion, item.extensionName(), version))
+                    except PrefetchCancelled:
+                        return
+                    except Exception as e:
+                        logger.error("Cannot download the update of '%s'" % item.extensionName())
+                        logger.error(e)
+                    if callback is not None and not self._cancelled:
+                        callback(item, ready)
+        except PrefetchCancelled:
+            pass
+        except Exception as e:
+            logger.error("Cannot download the updates from '%s'" % zipPath)
+            logger.error(e)
+        finally:
+            shutil.rmtree(tempFolder, ignore_errors=True)
+
+    def _transferred(self, size):
+        # called from a worker thread for each downloaded chunk
+        with self._lock:
+            self.bytesDownloaded += size
+        self._throttle()
+        if self._cancelled:
+            raise PrefetchCancelled("The download of the updates is cancelled.")
+
+    def _throttle(self):
+        # wait until the average speed drops below the maximum
+        if not self.maxBytesPerSecond:
+            return
+        while not self._cancelled:
+            with self._lock:
+                elapsed = time.time() - self._started
+                wait = self.bytesDownloaded / float(self.maxBytesPerSecond) - elapsed
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 0.5))
@@ -0,0 +1,68 @@
+import re
+import functools
+
+
+versionComponentRE = re.compile(r"(\d+|[a-z]+|\.)", re.IGNORECASE)
+
+
+@functools.total_ordering
+class LooseVersion(object):
+
+    """
+    A version number compared like `distutils.version.LooseVersion`,
+    which is not available since Python 3.12.
+
+    The version is split in numbers and letters, numbers are compared
+    as numbers, letters as strings. Letters sort before numbers, so
+    `1.0a` is lower than `1.0.1` instead of raising an error.
+    """
+
+    def __init__(self, vstring=None):
+        self.vstring = None
+        self.version = []
+        if vstring is not None:
+            self.parse(vstring)
+
+    def parse(self, vstring):
+        self.vstring = str(vstring)
+        self.version = []
+        for component in versionComponentRE.split(self.vstring):
+            if not component or component == ".":
+                continue
+            try:
+                self.version.append(int(component))
+            except ValueError:
+                self.version.append(component)
+
+    def __str__(self):
+        return self.vstring
+
+    def __repr__(self):
+        return "LooseVersion('%s')" % self.vstring
+
+    def __eq__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._key() == other._key()
+
+    def __lt__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._key() < other._key()
+
+    def __hash__(self):
+        return hash(tuple(self._key()))
+
+    # helpers
+
+    def _key(self):
+        return [(1, component) if isinstance(component, int) else (0, component) for component in self.version]
+
+    def _coerce(self, other):
+        if isinstance(other, LooseVersion):
+            return other
+        if isinstance(other, str):
+            return LooseVersion(other)
+        return NotImplemented
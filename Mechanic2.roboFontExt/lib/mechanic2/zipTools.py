@@ -0,0 +1,268 @@
+import os
+import io
+import re
+import bisect
+import shutil
+from urllib.error import HTTPError
+
+from .connectionPool import sharedConnectionPool
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class RemoteFileChanged(Exception):
+    pass
+
+
+contentRangeRE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+
+class HTTPRangeFile(io.RawIOBase):
+
+    """
+    A read only, seekable file object for a remote file.
+
+    Only the requested parts of the file are downloaded with http range requests.
+    Raise a `RangeNotSupported` error when the server does not support range requests.
+
+    The first request fetches the tail of the file, for zip files this
+    contains the end of central directory record and most likely the
+    central directory itself. All following requests send the etag or the
+    last modified date of the first response as `If-Range`, and raise
+    a `RemoteFileChanged` error when the remote file is changed.
+    """
+
+    def __init__(self, url, pool=None, blockSize=65536, tailSize=65536 + 22):
+        super(HTTPRangeFile, self).__init__()
+        self.url = url.replace(" ", "%20")
+        self.pool = pool or sharedConnectionPool
+        self.blockSize = blockSize
+        self.bytesDownloaded = 0
+        self.requestCount = 0
+        self.validator = None
+        self._position = 0
+        self._starts = []
+        self._segments = dict()
+        self._size = None
+        self._fetch("-%s" % tailSize)
+
+    def size(self):
+        return self._size
+
+    def isUnchanged(self):
+        """
+        Return bool if the remote file is unchanged since the first request, with a single byte request.
+        Always `False` when the server does not provide an etag or a last modified date.
+        """
+        if self.validator is None:
+            return False
+        try:
+            self._fetch("0-0", addSegment=False)
+        except RemoteFileChanged:
+            return False
+        return True
+
+    def prefetch(self, ranges):
+        """
+        Download a list of `(start, end)` byte ranges in advance.
+        """
+        for start, end in ranges:
+            start = max(0, start)
+            end = min(self._size, end)
+            if start < end and not self._isAvailable(start, end):
+                self._fetch("%s-%s" % (start, end - 1))
+
+    # file api
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError("Invalid whence: %s" % whence)
+        if position < 0:
+            raise ValueError("Negative seek position: %s" % position)
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._size - self._position)
+        if size <= 0:
+            return 0
+        start = self._position
+        if not self._isAvailable(start, start + size):
+            self._fetch("%s-%s" % (start, min(self._size, start + max(size, self.blockSize)) - 1))
+        segmentStart, segment = self._segmentAt(start)
+        offset = start - segmentStart
+        data = segment[offset:offset + size]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    # helpers
+
+    def _fetch(self, byteRange, addSegment=True):
+        self.requestCount += 1
+        headers = {"Range": "bytes=%s" % byteRange}
+        if self.validator is not None:
+            # only return the range when the remote file is unchanged
+            headers["If-Range"] = self.validator
+        with self.pool.request(self.url, headers=headers) as response:
+            if response.status == 200:
+                if self.validator is not None:
+                    raise RemoteFileChanged("'%s' changed since it was opened." % self.url)
+                raise RangeNotSupported("'%s' does not support range requests." % self.url)
+            if response.status != 206:
+                raise HTTPError(self.url, response.status, response.reason, response.headers, None)
+            match = contentRangeRE.match(response.headers.get("Content-Range", ""))
+            if match is None:
+                raise RangeNotSupported("'%s' returned an unknown content range." % self.url)
+            validator = self._responseValidator(response.headers)
+            start, end, size = [int(value) for value in match.groups()]
+            if self._size is None:
+                self.validator = validator
+            elif size != self._size or (validator is not None and validator != self.validator):
+                raise RemoteFileChanged("'%s' changed since it was opened." % self.url)
+            data = response.read()
+        self._size = size
+        self.bytesDownloaded += len(data)
+        if addSegment:
+            self._addSegment(start, data)
+
+    def _responseValidator(self, headers):
+        # weak etags cannot be used with If-Range
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return headers.get("Last-Modified")
+
+    def _addSegment(self, start, data):
+        if start in self._segments and len(self._segments[start]) >= len(data):
+            return
+        if start not in self._segments:
+            bisect.insort(self._starts, start)
+        self._segments[start] = data
+
+    def _segmentAt(self, position):
+        # return the segment with the most data after the given position
+        found = (position, b"")
+        index = bisect.bisect_right(self._starts, position)
+        for segmentStart in self._starts[:index]:
+            segment = self._segments[segmentStart]
+            if segmentStart + len(segment) - position > len(found[1]) - (position - found[0]):
+                found = (segmentStart, segment)
+        return found
+
+    def _isAvailable(self, start, end):
+        segmentStart, segment = self._segmentAt(start)
+        return segmentStart + len(segment) >= end
+
+
+def findBundlePrefix(names, extensionPath):
+    """
+    Return the member name prefix of the extension bundle in a list of zip member names.
+
+    The bundle with the given `extensionPath` is preferred, otherwise the
+    least nested folder with the same bundle name is used.
+    Return `None` if the bundle is not found.
+    """
+    extensionPath = extensionPath.strip("/")
+    bundleName = extensionPath.split("/")[-1]
+    candidates = set()
+    for name in names:
+        parts = name.split("/")
+        # only look at folders, the last part is a file name or empty
+        for index, part in enumerate(parts[:-1]):
+            if part == bundleName:
+                candidates.add("/".join(parts[:index + 1]) + "/")
+                break
+    if not candidates:
+        return None
+
+    def _sortKey(prefix):
+        path = prefix.rstrip("/")
+        atExtensionPath = path == extensionPath or path.endswith("/" + extensionPath)
+        return not atExtensionPath, path.count("/"), path
+
+    return sorted(candidates, key=_sortKey)[0]
+
+
+def bundleMembers(zipFile, prefix):
+    """
+    Return a dict of relative paths and `ZipInfo` objects for all the members with the given prefix.
+    """
+    members = dict()
+    for info in zipFile.infolist():
+        if not info.filename.startswith(prefix):
+            continue
+        relativePath = info.filename[len(prefix):]
+        if not relativePath:
+            continue
+        parts = relativePath.split("/")
+        if relativePath.startswith("/") or ".." in parts:
+            # never write outside the bundle
+            continue
+        members[relativePath] = info
+    return members
+
+
+def memberRanges(zipFile, infos, maxGap=65536):
+    """
+    Return a list of `(start, end)` byte ranges containing the given zip members.
+
+    Ranges of members closer than `maxGap` bytes to each other are merged.
+    """
+    offsets = sorted(info.header_offset for info in zipFile.infolist())
+    offsets.append(zipFile.start_dir)
+    ranges = []
+    for info in sorted(infos, key=lambda info: info.header_offset):
+        start = info.header_offset
+        end = offsets[bisect.bisect_right(offsets, start)]
+        if ranges and start - ranges[-1][1] <= maxGap:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def extractBundle(zipFile, extensionPath, destination):
+    """
+    Extract only the members of the extension bundle from a `zipfile.ZipFile` into `destination`.
+
+    The members are found in the central directory of the zip file,
+    no other files are written. Return the path to the extracted bundle
+    or `None` when the bundle is not in the zip file.
+    """
+    prefix = findBundlePrefix(zipFile.namelist(), extensionPath)
+    if prefix is None:
+        return None
+    bundleName = prefix.rstrip("/").split("/")[-1]
+    bundlePath = os.path.join(destination, bundleName)
+    os.makedirs(bundlePath, exist_ok=True)
+    members = bundleMembers(zipFile, prefix)
+    if isinstance(zipFile.fp, HTTPRangeFile):
+        # download all members in as few requests as possible
+        zipFile.fp.prefetch(memberRanges(zipFile, members.values()))
+    for relativePath, info in members.items():
+        targetPath = os.path.join(bundlePath, *relativePath.split("/"))
+        if info.is_dir():
+            os.makedirs(targetPath, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(targetPath), exist_ok=True)
+        with zipFile.open(info) as source, open(targetPath, "wb") as target:
+            shutil.copyfileobj(source, target)
+    return bundlePath
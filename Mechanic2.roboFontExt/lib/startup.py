@@ -1,16 +1,14 @@
-import yaml
 import logging
 import time
 
-from vanilla.dialogs import message, BaseMessageDialog
-
 from mojo.tools import registerFileExtension
 
 from mojo.events import addObserver
 from mojo.extensions import setExtensionDefault, getExtensionDefault
 
-from mechanic2.extensionItem import ExtensionYamlItem
-from mechanic2.ui.controller import MechanicController
+# only register the defaults at startup,
+# ui and yaml modules are imported when they are needed
+import mechanic2.defaults
 
 
 logger = logging.getLogger("Mechanic")
@@ -23,6 +21,7 @@ registerFileExtension(fileExtension)
 class MechanicObservers(object):
 
     def __init__(self):
+        self._updateChecker = None
         addObserver(self, "applicationOpenFile", "applicationOpenFile")
         addObserver(self, "applicationDidFinishLaunching", "applicationDidFinishLaunching")
 
@@ -31,6 +30,10 @@ class MechanicObservers(object):
         ext = notification["ext"]
         fileHandler = notification["fileHandler"]
         if ext == ".%s" % fileExtension:
+            import yaml
+            from vanilla.dialogs import message
+            from mechanic2.extensionItem import ExtensionYamlItem
+
             singleItems = list(getExtensionDefault("com.mechanic.singleExtensionItems"))
             try:
                 with open(path, "rb") as f:
@@ -64,18 +67,45 @@ class MechanicObservers(object):
         oneDay = 60 * 60 * 24
         now = time.time()
         if lastCheck + oneDay < now:
-            messageText = "Mechanic would like to check for updates."
-            informativeText = "Updating might take some time, you can check for updates later by opening the Mechanic extension."
+            from PyObjCTools.AppHelper import callAfter
+            from mechanic2.backgroundCheck import BackgroundUpdateChecker
 
-            alert = BaseMessageDialog.alloc().initWithMessageText_informativeText_alertStyle_buttonTitlesValues_window_resultCallback_(
-                messageText=messageText,
-                informativeText=informativeText,
-                buttonTitlesValues=[("Now", 1), ("Later", 0)]
+            cacheSizes = dict(
+                httpCacheSize=getExtensionDefault("com.mechanic.httpCacheSize"),
+                bundleStoreSize=getExtensionDefault("com.mechanic.bundleStoreSize"),
+                bundleStoreVersions=getExtensionDefault("com.mechanic.bundleStoreVersions"),
+            )
+            # check on a background thread, only show something when there are updates
+            self._updateChecker = BackgroundUpdateChecker(
+                getExtensionDefault("com.mechanic.urlstreams"),
+                getExtensionDefault("com.mechanic.singleExtensionItems"),
+                callback=self._updatesFound,
+                dispatch=callAfter,
+                prefetch=getExtensionDefault("com.mechanic.prefetchUpdates"),
+                maxBytesPerSecond=getExtensionDefault("com.mechanic.prefetchMaxBytesPerSecond"),
+                cacheSizes=cacheSizes
             )
-            if alert._value:
-                MechanicController(checkForUpdates=True)
+            self._updateChecker.start()
 
-            setExtensionDefault("com.mechanic.lastUpdateCheck", now)
+    def _updatesFound(self, items):
+        self._updateChecker = None
+        setExtensionDefault("com.mechanic.lastUpdateCheck", time.time())
+        if not items:
+            return
+        names = sorted(item.extensionName() for item in items)
+        if len(names) == 1:
+            title = "An update for '%s' is available." % names[0]
+        else:
+            title = "%s extension updates are available." % len(names)
+        text = "Open Mechanic to update %s." % ", ".join(names)
+        try:
+            from mojo.UI import PostBannerNotification
+        except ImportError:
+            # older RoboFont versions
+            from vanilla.dialogs import message
+            message(title, text)
+            return
+        PostBannerNotification(title, text)
 
 
 MechanicObservers()
@@ -0,0 +1,102 @@
+"""
+Tests for the Mechanic core, run them without RoboFont:
+
+    python -m pytest tests
+
+The caches and the extensions folder are created in a temporary home folder,
+http requests go to a local `StandInServer`.
+"""
+
+import io
+import os
+import sys
+import shutil
+import zipfile
+import plistlib
+import tempfile
+import unittest
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in (os.path.join(root, "Mechanic2.roboFontExt", "lib"), os.path.join(root, "tools")):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+# set the home folder before any mechanic2 module is imported
+os.environ["HOME"] = tempfile.mkdtemp(prefix="mechanic-tests-")
+
+from standInServer import StandInServer  # noqa: E402
+
+
+class StandInTestCase(unittest.TestCase):
+
+    """
+    A test case with a running `StandInServer` for all hosts Mechanic talks to,
+    empty caches and an empty extensions folder.
+    """
+
+    hosts = ("github.com", "raw.githubusercontent.com", "gitlab.com", "bitbucket.org", "extensionstore.robofont.com", "robofont-mechanic.github.io")
+    serverOptions = dict()
+
+    def setUp(self):
+        from mechanic2.connectionPool import sharedConnectionPool
+        from mechanic2.mechanicTools import httpCache
+        from mechanic2.repositoryHeads import repositoryHeads
+        from mechanic2.archiveCache import archiveCache
+        from mechanic2.bundleStore import bundleStore
+        from mechanic2.installedIndex import installedExtensions
+
+        self.server = StandInServer(**self.serverOptions).start()
+        for host in self.hosts:
+            sharedConnectionPool.setHostAlias(host, self.server.url())
+        httpCache.clear()
+        repositoryHeads.clear()
+        archiveCache.clear()
+        for bundleName in list(bundleStore._getIndex()):
+            bundleStore.remove(bundleName)
+        self.tempFolder = tempfile.mkdtemp(prefix="mechanic-test-")
+        self.extensionsFolder = os.path.join(self.tempFolder, "plugins")
+        os.makedirs(self.extensionsFolder)
+        installedExtensions.setFolder(self.extensionsFolder)
+
+    def tearDown(self):
+        from mechanic2.connectionPool import sharedConnectionPool
+
+        for host in self.hosts:
+            sharedConnectionPool.setHostAlias(host, None)
+        sharedConnectionPool.clear()
+        self.server.stop()
+        shutil.rmtree(self.tempFolder, ignore_errors=True)
+
+    # helpers
+
+    def infoPlist(self, name, version):
+        return plistlib.dumps(dict(name=name, version=version))
+
+    def installBundle(self, bundleName, version, files=None):
+        """
+        Create a bundle in the extensions folder.
+        """
+        from mechanic2.installedIndex import installedExtensions
+
+        path = os.path.join(self.extensionsFolder, bundleName)
+        files = dict(files or {})
+        files["info.plist"] = self.infoPlist(bundleName.split(".")[0], version)
+        for fileName, data in files.items():
+            filePath = os.path.join(path, fileName)
+            os.makedirs(os.path.dirname(filePath), exist_ok=True)
+            with open(filePath, "wb") as f:
+                f.write(data)
+        installedExtensions.invalidate(bundleName)
+        return path
+
+    def zipData(self, prefix, bundleName, version, files=None):
+        """
+        Return a zip with a bundle in the folder `prefix`, like a repository archive.
+        """
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zipFile:
+            zipFile.writestr("%s/%s/info.plist" % (prefix, bundleName), self.infoPlist(bundleName.split(".")[0], version))
+            for fileName, fileData in (files or {}).items():
+                zipFile.writestr("%s/%s/%s" % (prefix, bundleName, fileName), fileData)
+        return data.getvalue()
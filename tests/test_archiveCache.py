@@ -0,0 +1,70 @@
+import os
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.archiveCache import archiveCache
+from mechanic2.zipTools import HTTPRangeFile, RemoteFileChanged, extractBundle
+
+
+class ArchiveCacheTest(StandInTestCase):
+
+    path = "/owner/repo/archive/master.zip"
+
+    def addArchive(self, version, payloadSize=256 * 1024):
+        files = {"payload.bin": os.urandom(payloadSize)}
+        data = self.zipData("repo-master", "Tool.roboFontExt", version, files)
+        self.server.addFile(self.path, data)
+        return data
+
+    def extractedVersion(self, zipFile):
+        path = extractBundle(zipFile, "Tool.roboFontExt", self.tempFolder)
+        with open(os.path.join(path, "info.plist"), "rb") as f:
+            return f.read()
+
+    def test_reuse(self):
+        self.addArchive("1.0")
+        url = self.server.url(self.path)
+        with archiveCache.open(url) as zipFile:
+            self.assertEqual(zipFile.namelist()[0], "repo-master/Tool.roboFontExt/info.plist")
+        self.server.resetCounters()
+        with archiveCache.open(url) as zipFile:
+            self.assertIn(b"1.0", self.extractedVersion(zipFile))
+        # a single byte to check the zip file is unchanged and the members
+        ranges = [ranges for method, path, ranges in self.server.requests]
+        self.assertEqual(ranges[0], "bytes=0-0")
+
+    def test_changedBeforeReuse(self):
+        self.addArchive("1.0")
+        url = self.server.url(self.path)
+        with archiveCache.open(url) as zipFile:
+            pass
+        data = self.addArchive("2.0")
+        with archiveCache.open(url) as zipFile:
+            self.assertIn(b"2.0", self.extractedVersion(zipFile))
+            self.assertEqual(zipFile.fp.size(), len(data))
+
+    def test_changedWhileReading(self):
+        self.addArchive("1.0")
+        url = self.server.url(self.path)
+        with self.assertRaises(RemoteFileChanged):
+            with archiveCache.open(url) as zipFile:
+                self.addArchive("2.0")
+                self.extractedVersion(zipFile)
+        # opened again the next time
+        with archiveCache.open(url) as zipFile:
+            self.assertIn(b"2.0", self.extractedVersion(zipFile))
+
+    def test_rangeFileIfRange(self):
+        self.addArchive("1.0")
+        rangeFile = HTTPRangeFile(self.server.url(self.path))
+        self.assertIsNotNone(rangeFile.validator)
+        self.assertTrue(rangeFile.isUnchanged())
+        self.addArchive("1.0")
+        self.assertFalse(rangeFile.isUnchanged())
+        with self.assertRaises(RemoteFileChanged):
+            rangeFile.prefetch([(0, 100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
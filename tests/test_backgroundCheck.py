@@ -0,0 +1,122 @@
+import os
+import json
+import threading
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2 import catalogSnapshot as catalogSnapshotModule
+from mechanic2.catalogSnapshot import CatalogSnapshot
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.backgroundCheck import BackgroundUpdateChecker
+
+
+sha = "a" * 40
+
+streamURL = "https://robofont-mechanic.github.io/stream.json"
+
+toolEntry = dict(extensionName="Tool", repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt")
+
+
+class BackgroundUpdateCheckerTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.server.addFile("/stream.json", json.dumps(dict(extensions=[toolEntry])).encode("utf-8"))
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha, self.infoPlist("Tool", "2.0"))
+        self.snapshot = CatalogSnapshot(os.path.join(self.tempFolder, "catalog.json"))
+        patcher = mock.patch.object(catalogSnapshotModule, "catalogSnapshot", self.snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # record the threads retrieving remote versions
+        self.checkedOn = []
+        remoteVersion = ExtensionRepository.remoteVersion
+
+        def _remoteVersion(item):
+            self.checkedOn.append(threading.current_thread())
+            return remoteVersion(item)
+
+        patcher = mock.patch.object(ExtensionRepository, "remoteVersion", _remoteVersion)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.updates = None
+        self.calledOn = None
+
+    def callback(self, updates):
+        self.updates = updates
+        self.calledOn = threading.current_thread()
+
+    def runChecker(self, checker):
+        checker.start()
+        checker._thread.join(10)
+        self.assertTrue(checker.isDone())
+
+    def test_background(self):
+        checker = BackgroundUpdateChecker([streamURL], callback=self.callback)
+        self.runChecker(checker)
+        self.assertEqual([item.extensionName() for item in self.updates], ["Tool"])
+        self.assertTrue(self.checkedOn)
+        # nothing runs on the main thread
+        self.assertNotIn(threading.main_thread(), self.checkedOn)
+        self.assertIsNot(self.calledOn, threading.main_thread())
+        # the result is stored for the Mechanic window
+        snapshot = self.snapshot.load()
+        self.assertEqual(snapshot["streams"], {streamURL: [toolEntry]})
+        self.assertEqual([version for version, retrievedAt in snapshot["remoteVersions"].values()], ["2.0"])
+
+    def test_dispatch(self):
+        dispatched = []
+
+        def dispatch(function, *args):
+            dispatched.append((function, args))
+
+        checker = BackgroundUpdateChecker([streamURL], callback=self.callback, dispatch=dispatch)
+        self.runChecker(checker)
+        # the callback is only called through dispatch
+        self.assertIsNone(self.updates)
+        self.assertEqual(len(dispatched), 1)
+        function, args = dispatched[0]
+        self.assertEqual(function, self.callback)
+        self.assertEqual([item.extensionName() for item in args[0]], ["Tool"])
+
+    def test_noUpdates(self):
+        self.installBundle("Tool.roboFontExt", "2.0")
+        checker = BackgroundUpdateChecker([streamURL], callback=self.callback)
+        self.runChecker(checker)
+        self.assertEqual(self.updates, [])
+
+    def test_fallback(self):
+        self.snapshot.save({"https://robofont-mechanic.github.io/missing.json": [toolEntry]}, [])
+        checker = BackgroundUpdateChecker(["https://robofont-mechanic.github.io/missing.json"], callback=self.callback)
+        self.runChecker(checker)
+        # the stream cannot be read, the last loaded catalog is used
+        self.assertEqual([item.extensionName() for item in self.updates], ["Tool"])
+
+    def test_cancel(self):
+        release = threading.Event()
+        requested = threading.Event()
+
+        def slowStream(path, headers):
+            requested.set()
+            release.wait(10)
+            return 200, dict(), json.dumps(dict(extensions=[toolEntry])).encode("utf-8")
+
+        self.server.addHandler("/slow.json", slowStream)
+        checker = BackgroundUpdateChecker(["https://robofont-mechanic.github.io/slow.json"], callback=self.callback)
+        checker.start()
+        self.assertTrue(requested.wait(10))
+        checker.cancel()
+        release.set()
+        checker._thread.join(10)
+        self.assertTrue(checker.isDone())
+        self.assertIsNone(self.updates)
+        # a cancelled check never checks the items or saves a snapshot
+        self.assertEqual(self.checkedOn, [])
+        self.assertIsNone(self.snapshot.load())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.mechanicTools import setRemembered
+from mechanic2.bundleStore import bundleStore
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.installPipeline import InstallPipeline
+from mechanic2.installedIndex import installedExtensions
+
+
+class BundleStoreTest(StandInTestCase):
+
+    zipPath = "/owner/repo/archive/master.zip"
+
+    def setUp(self):
+        super().setUp()
+        self.server.addFile(self.zipPath, self.zipData("repo-master", "Tool.roboFontExt", "1.0", {"lib/main.py": b"print('tool')"}))
+        self.item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=True)
+        # install and store version 1.0 from the zip file
+        self.item.remoteInstall()
+        self.server.resetCounters()
+        self.bundlePath = os.path.join(self.extensionsFolder, "Tool.roboFontExt")
+
+    def zipRequests(self):
+        return [path for method, path, ranges in self.server.requests if path == self.zipPath]
+
+    def breakInstall(self):
+        os.remove(os.path.join(self.bundlePath, "lib", "main.py"))
+
+    def test_storedAfterInstall(self):
+        entry = bundleStore.find("Tool.roboFontExt", "1.0", url=self.item.remoteZipPath())
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry["url"], self.item.remoteZipPath())
+
+    def test_exactURL(self):
+        shutil.copytree(self.bundlePath, os.path.join(self.tempFolder, "Other.roboFontExt"))
+        bundleStore.store("Other.roboFontExt", os.path.join(self.tempFolder, "Other.roboFontExt"), "1.0")
+        self.assertIsNotNone(bundleStore.find("Other.roboFontExt", "1.0"))
+        self.assertIsNone(bundleStore.find("Other.roboFontExt", "1.0", url="https://github.com/owner/other/archive/master.zip"))
+
+    def test_installFromStore(self):
+        shutil.rmtree(self.bundlePath)
+        installedExtensions.invalidate("Tool.roboFontExt")
+        setRemembered(self.item, "remoteVersion", "1.0")
+        self.item.remoteInstall()
+        self.assertEqual(installedExtensions.version("Tool.roboFontExt"), "1.0")
+        self.assertEqual(self.zipRequests(), [])
+
+    def test_forcedReinstall(self):
+        self.breakInstall()
+        setRemembered(self.item, "remoteVersion", "1.0")
+        self.item.remoteInstall(forcedUpdate=True)
+        self.assertTrue(os.path.exists(os.path.join(self.bundlePath, "lib", "main.py")))
+        self.assertNotEqual(self.zipRequests(), [])
+
+    def test_forcedReinstallPipeline(self):
+        self.breakInstall()
+        setRemembered(self.item, "remoteVersion", "1.0")
+        results = InstallPipeline().run([self.item], forcedUpdate=True)
+        self.assertEqual(results, {self.item: None})
+        self.assertTrue(os.path.exists(os.path.join(self.bundlePath, "lib", "main.py")))
+        self.assertNotEqual(self.zipRequests(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
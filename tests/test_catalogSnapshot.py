@@ -0,0 +1,50 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2 import catalogSnapshot as catalogSnapshotModule
+from mechanic2.catalogSnapshot import CatalogSnapshot, collectRemoteVersions, applyRemoteVersions
+from mechanic2.extensionItem import ExtensionRepository, remoteVersionTimeToLive
+from mechanic2.mechanicTools import getRemembered, setRemembered
+
+
+class CatalogSnapshotTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot = CatalogSnapshot(os.path.join(self.tempFolder, "catalog.json"))
+        self.retrievedAt = time.time() - remoteVersionTimeToLive + 400
+
+    def createItem(self):
+        return ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"))
+
+    def test_keepRetrievalTime(self):
+        item = self.createItem()
+        setRemembered(item, "remoteVersion", "2.0", rememberedAt=self.retrievedAt)
+        self.snapshot.save(dict(), [item])
+        # the next launch loads the snapshot and saves it again
+        newItem = self.createItem()
+        applyRemoteVersions([newItem], self.snapshot.load()["remoteVersions"])
+        self.assertEqual(str(getRemembered(newItem, "remoteVersion")), "2.0")
+        self.snapshot.save(dict(), [newItem])
+        version, retrievedAt = self.snapshot.load()["remoteVersions"][item.remoteInfoPath()]
+        self.assertEqual(version, "2.0")
+        self.assertAlmostEqual(retrievedAt, self.retrievedAt, places=3)
+        # the versions still expire
+        later = time.time() + 500
+        with mock.patch.object(catalogSnapshotModule.time, "time", return_value=later):
+            self.assertEqual(self.snapshot.load()["remoteVersions"], dict())
+
+    def test_expiredNotApplied(self):
+        item = self.createItem()
+        remoteVersions = {item.remoteInfoPath(): ("2.0", time.time() - remoteVersionTimeToLive - 1)}
+        applyRemoteVersions([item], remoteVersions)
+        self.assertIsNone(getRemembered(item, "remoteVersion"))
+        self.assertEqual(collectRemoteVersions([item]), dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import io
+import sys
+import json
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+
+from . import StandInTestCase, root
+
+from mechanic2.cli import main
+
+
+sha = "a" * 40
+
+streamURL = "https://robofont-mechanic.github.io/stream.json"
+unreachableStreamURL = "http://127.0.0.1:9/stream.json"
+
+toolEntry = dict(extensionName="Tool", developer="Developer", repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt")
+
+
+class CommandLineTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.addFile("/stream.json", json.dumps(dict(extensions=[toolEntry])).encode("utf-8"))
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha, self.infoPlist("Tool", "2.0"))
+
+    def mechanic(self, *args, streams=(streamURL, )):
+        arguments = ["--extensions-folder", self.extensionsFolder]
+        for url in streams:
+            arguments.extend(["--stream", url])
+        arguments.extend(args)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            exitCode = main(arguments)
+        return exitCode, output.getvalue()
+
+    def test_listJSON(self):
+        self.installBundle("Tool.roboFontExt", "1.0")
+        exitCode, output = self.mechanic("--json", "list")
+        self.assertEqual(exitCode, 0)
+        self.assertEqual(json.loads(output), [dict(
+            name="Tool",
+            bundleName="Tool.roboFontExt",
+            developer="Developer",
+            source=streamURL,
+            installedVersion="1.0",
+            remoteVersion=None,
+        )])
+
+    def test_listInstalled(self):
+        exitCode, output = self.mechanic("--json", "list", "--installed")
+        self.assertEqual(exitCode, 0)
+        self.assertEqual(json.loads(output), [])
+        exitCode, output = self.mechanic("list")
+        self.assertEqual(exitCode, 0)
+        self.assertEqual(output, "Tool: not installed (Developer)\n")
+
+    def test_unreachableStream(self):
+        exitCode, output = self.mechanic("--json", "list", streams=[unreachableStreamURL])
+        self.assertEqual(exitCode, 1)
+        self.assertEqual(json.loads(output), [])
+        # the readable streams are still listed
+        exitCode, output = self.mechanic("--json", "list", streams=[streamURL, unreachableStreamURL])
+        self.assertEqual(exitCode, 1)
+        self.assertEqual([info["name"] for info in json.loads(output)], ["Tool"])
+
+    def test_check(self):
+        self.installBundle("Tool.roboFontExt", "1.0")
+        exitCode, output = self.mechanic("--json", "check")
+        self.assertEqual(exitCode, 0)
+        infos = json.loads(output)
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0]["needsUpdate"], True)
+        self.assertEqual((infos[0]["installedVersion"], infos[0]["remoteVersion"]), ("1.0", "2.0"))
+        exitCode, output = self.mechanic("check")
+        self.assertEqual(output, "Tool: 1.0 -> 2.0\n")
+
+    def test_checkUpToDate(self):
+        self.installBundle("Tool.roboFontExt", "2.0")
+        exitCode, output = self.mechanic("check")
+        self.assertEqual(exitCode, 0)
+        self.assertEqual(output, "No updates.\n")
+
+    def test_installMissing(self):
+        exitCode, output = self.mechanic("--json", "install", "Unknown")
+        self.assertEqual(exitCode, 2)
+        self.assertEqual(output, "")
+
+    def test_usage(self):
+        with self.assertRaises(SystemExit) as context:
+            self.mechanic("update")
+        self.assertEqual(context.exception.code, 2)
+
+
+class ModuleTest(unittest.TestCase):
+
+    def test_unreachableStream(self):
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = os.path.join(root, "Mechanic2.roboFontExt", "lib")
+        process = subprocess.run(
+            [sys.executable, "-m", "mechanic2", "--json", "--stream", unreachableStreamURL, "list"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environment, timeout=60
+        )
+        self.assertEqual(process.returncode, 1)
+        self.assertEqual(json.loads(process.stdout), [])
+        self.assertIn(unreachableStreamURL, process.stderr.decode("utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from urllib.error import HTTPError
+
+from . import StandInTestCase
+
+from mechanic2.connectionPool import ConnectionPool
+
+
+class ConnectionPoolTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = ConnectionPool()
+        self.server.addFile("/data.json", b'{"extensions": []}')
+
+    def tearDown(self):
+        self.pool.clear()
+        super().tearDown()
+
+    def test_keepAlive(self):
+        with self.pool.request(self.server.url("/data.json")) as response:
+            response.read()
+            connection = response._connection
+        for _ in range(3):
+            with self.pool.request(self.server.url("/data.json")) as response:
+                self.assertEqual(response.read(), b'{"extensions": []}')
+                self.assertIs(response._connection, connection)
+        self.assertEqual(sum(len(connections) for connections in self.pool._idle.values()), 1)
+
+    def test_redirect(self):
+        self.server.addHandler("/moved.json", lambda path, headers: (302, {"Location": "/data.json"}, b""))
+        self.assertEqual(self.pool.getData(self.server.url("/moved.json")), b'{"extensions": []}')
+        self.assertEqual([path for method, path, ranges in self.server.requests], ["/moved.json", "/data.json"])
+
+    def test_hostAlias(self):
+        self.pool.setHostAlias("example.com", self.server.url())
+        self.assertEqual(self.pool.getData("https://example.com/data.json"), b'{"extensions": []}')
+        self.pool.setHostAlias("example.com", None)
+        self.assertEqual(self.pool._aliasURL("https://example.com/data.json"), "https://example.com/data.json")
+
+    def test_errorStatus(self):
+        with self.assertRaises(HTTPError) as context:
+            self.pool.getData(self.server.url("/missing.json"))
+        self.assertEqual(context.exception.code, 404)
+
+    def test_httpProxy(self):
+        received = []
+
+        def handler(path, headers):
+            received.append((path, headers.get("Host"), headers.get("Proxy-Authorization")))
+            return 200, dict(), b"proxied"
+
+        self.server.addHandler("/proxied.json", handler)
+        proxyURL = self.server.url().replace("://", "://user:secret@")
+        self.pool.setProxies({"http": proxyURL})
+        self.assertEqual(self.pool.getData("http://example.com/proxied.json"), b"proxied")
+        self.assertEqual(received, [("http://example.com/proxied.json", "example.com", "Basic dXNlcjpzZWNyZXQ=")])
+
+    def test_noProxy(self):
+        # nothing listens on the proxy port, the server must be connected directly
+        self.pool.setProxies({"http": "http://127.0.0.1:9", "no": "127.0.0.1,localhost"})
+        self.assertEqual(self.pool.getData(self.server.url("/data.json")), b'{"extensions": []}')
+        self.assertEqual([path for method, path, ranges in self.server.requests], ["/data.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
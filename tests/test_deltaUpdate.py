@@ -0,0 +1,54 @@
+import os
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2 import extensionItem
+from mechanic2.deltaUpdate import stagingFolder
+from mechanic2.extensionBundle import FolderExtensionBundle
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.installedIndex import installedExtensions
+
+
+class RecordingExtensionBundle(FolderExtensionBundle):
+
+    installed = []
+
+    def install(self, showMessages=False):
+        self.installed.append(self.path)
+        return super().install(showMessages=showMessages)
+
+
+class DeltaDownloadTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.installBundle("Tool.roboFontExt", "1.0", files={"lib/same.py": b"same", "lib/changed.py": b"old", "lib/removed.py": b"removed"})
+        files = {"lib/same.py": b"same", "lib/changed.py": b"new", "lib/added.py": b"added"}
+        self.server.addFile("/owner/repo/archive/master.zip", self.zipData("repo-master", "Tool.roboFontExt", "2.0", files))
+        self.item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=True)
+        self.item.useDeltaDownloads = True
+        RecordingExtensionBundle.installed = []
+
+    def test_update(self):
+        with mock.patch.object(extensionItem, "ExtensionBundle", RecordingExtensionBundle):
+            self.item.remoteInstall(forcedUpdate=True)
+        # installed with the extension bundle from the staging folder
+        self.assertEqual(len(RecordingExtensionBundle.installed), 1)
+        self.assertTrue(RecordingExtensionBundle.installed[0].startswith(stagingFolder))
+        # the installed state is updated
+        self.assertEqual(installedExtensions.version("Tool.roboFontExt"), "2.0")
+        self.assertEqual(str(self.item.extensionVersion()), "2.0")
+        path = os.path.join(self.extensionsFolder, "Tool.roboFontExt")
+        files = sorted(os.path.relpath(os.path.join(root, fileName), path) for root, dirs, fileNames in os.walk(path) for fileName in fileNames)
+        self.assertEqual(files, ["info.plist", "lib/added.py", "lib/changed.py", "lib/same.py"])
+        with open(os.path.join(path, "lib", "changed.py"), "rb") as f:
+            self.assertEqual(f.read(), b"new")
+        # nothing is staged in the extensions folder and the staged bundle is removed
+        self.assertEqual(os.listdir(self.extensionsFolder), ["Tool.roboFontExt"])
+        self.assertEqual(os.listdir(stagingFolder), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2.httpCache import HTTPCache
+from mechanic2.mechanicTools import getDataFromURL, httpCache
+
+
+class HTTPCacheTest(StandInTestCase):
+
+    def test_revalidate(self):
+        self.server.addFile("/data.json", b'{"extensions": []}')
+        url = self.server.url("/data.json")
+        self.assertEqual(getDataFromURL(url), b'{"extensions": []}')
+        self.server.resetCounters()
+        self.assertEqual(getDataFromURL(url), b'{"extensions": []}')
+        self.assertEqual(self.server.bytesSent, 0)
+        self.server.addFile("/data.json", b'{"extensions": [{}]}')
+        self.assertEqual(getDataFromURL(url), b'{"extensions": [{}]}')
+
+    def test_noValidators(self):
+        self.server.addFile("/data.json", b"data", etag=False)
+        url = self.server.url("/data.json")
+        getDataFromURL(url)
+        self.assertIsNone(httpCache.read(url))
+
+    def test_batchedIndexWrites(self):
+        cache = HTTPCache(os.path.join(self.tempFolder, "http"))
+        indexWrites = []
+        writeFile = cache._writeFile
+
+        def _writeFile(fileName, data):
+            if fileName == cache.indexFileName:
+                indexWrites.append(fileName)
+            writeFile(fileName, data)
+
+        with mock.patch.object(cache, "_writeFile", _writeFile):
+            for index in range(100):
+                cache.store("https://example.com/%s" % index, b"data", {"ETag": '"%s"' % index})
+            self.assertEqual(len(indexWrites), 1)
+            cache.flush()
+            self.assertEqual(len(indexWrites), 2)
+            cache.flush()
+            self.assertEqual(len(indexWrites), 2)
+        # the index is read back in a new session
+        cache = HTTPCache(os.path.join(self.tempFolder, "http"))
+        self.assertEqual(cache.read("https://example.com/99"), b"data")
+        self.assertEqual(cache.validators("https://example.com/99"), {"If-None-Match": '"99"'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import zipfile
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.installPipeline import InstallPipeline
+from mechanic2.installedIndex import installedExtensions
+
+
+class InstallPipelineTest(StandInTestCase):
+
+    serverOptions = dict(supportsRanges=False)
+
+    def setUp(self):
+        super().setUp()
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zipFile:
+            for bundleName in ("Tool.roboFontExt", "Other.roboFontExt"):
+                zipFile.writestr("repo-master/%s/info.plist" % bundleName, self.infoPlist(bundleName.split(".")[0], "1.0"))
+        self.server.addFile("/owner/repo/archive/master.zip", data.getvalue())
+        self.server.addFile("/owner/single/archive/master.zip", self.zipData("single-master", "Single.roboFontExt", "1.0"))
+        self.items = [
+            self.repositoryItem("/owner/repo", "Tool.roboFontExt"),
+            self.repositoryItem("/owner/single", "Single.roboFontExt"),
+            self.repositoryItem("/owner/repo", "Other.roboFontExt"),
+            self.repositoryItem("/owner/missing", "Missing.roboFontExt"),
+        ]
+
+    def repositoryItem(self, repositoryPath, extensionPath):
+        return ExtensionRepository(dict(repository="https://github.com%s" % repositoryPath, extensionPath=extensionPath), checkForUpdates=True)
+
+    def zipRequests(self, zipPath):
+        return [ranges for method, path, ranges in self.server.requests if path == zipPath]
+
+    def test_sharedZipFile(self):
+        handled = []
+        results = InstallPipeline().run(self.items, callback=lambda item, error: handled.append(item))
+        # called in the order of the given items
+        self.assertEqual(handled, self.items)
+        self.assertEqual([results[item] for item in self.items[:3]], [None, None, None])
+        self.assertIsNotNone(results[self.items[3]])
+        self.assertEqual(installedExtensions.bundleNames(), ["Other.roboFontExt", "Single.roboFontExt", "Tool.roboFontExt"])
+        # items sharing a zip file download it once, after the refused range request
+        for path in ("/owner/repo/archive/master.zip", "/owner/single/archive/master.zip"):
+            self.assertEqual(self.zipRequests(path), ["bytes=-%s" % (65536 + 22), None])
+
+    def test_upToDate(self):
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.server.addFile("/owner/repo/master/Tool.roboFontExt/info.plist", self.infoPlist("Tool", "1.0"))
+        results = InstallPipeline().run(self.items[:1])
+        self.assertEqual(results, {self.items[0]: None})
+        self.assertEqual(self.zipRequests("/owner/repo/archive/master.zip"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
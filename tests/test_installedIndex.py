@@ -0,0 +1,41 @@
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2.installedIndex import InstalledExtensionsIndex, extensionsFolder
+
+
+class FakeExtensionBundle(object):
+
+    def __init__(self, name=None, path=None):
+        self.bundlePath = os.path.join("/RoboFont/extensions", name)
+
+
+class InstalledIndexTest(StandInTestCase):
+
+    def test_headlessFolder(self):
+        with mock.patch.dict(sys.modules, {"mojo": None, "mojo.extensions": None}):
+            index = InstalledExtensionsIndex()
+        self.assertEqual(index.folder, extensionsFolder)
+
+    def test_roboFontFolder(self):
+        mojo = types.ModuleType("mojo")
+        mojo.extensions = types.ModuleType("mojo.extensions")
+        mojo.extensions.ExtensionBundle = FakeExtensionBundle
+        with mock.patch.dict(sys.modules, {"mojo": mojo, "mojo.extensions": mojo.extensions}):
+            index = InstalledExtensionsIndex()
+        self.assertEqual(index.folder, "/RoboFont/extensions")
+
+    def test_folder(self):
+        index = InstalledExtensionsIndex(folder=self.extensionsFolder)
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.assertEqual(index.bundleNames(), ["Tool.roboFontExt"])
+        self.assertEqual(index.version("Tool.roboFontExt"), "1.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import json
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.manifest import Manifest, Lockfile, syncManifest
+from mechanic2.installedIndex import installedExtensions
+from mechanic2.repositoryHeads import repositoryHeads
+
+
+class SyncManifestTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry = dict(extensions=[dict(extensionName="Tool", repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt")])
+        self.server.addFile("/registry.json", json.dumps(registry))
+        self.publish("1.0")
+        self.manifestPath = os.path.join(self.tempFolder, "extensions.json")
+
+    def publish(self, version):
+        sha = ("%s" % version).replace(".", "") * 20
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha[:40]})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha[:40], self.infoPlist("Tool", version))
+        self.server.addFile("/owner/repo/archive/master.zip", self.zipData("repo-master", "Tool.roboFontExt", version))
+        repositoryHeads._heads.clear()
+
+    def sync(self, extensions, update=False):
+        with open(self.manifestPath, "w") as f:
+            json.dump(dict(streams=[self.server.url("/registry.json")], extensions=extensions), f)
+        manifest = Manifest.read(self.manifestPath)
+        self.server.resetCounters()
+        return syncManifest(manifest, Lockfile(manifest.lockPath()), update=update)
+
+    def test_installAndLock(self):
+        results = self.sync(["Tool"])
+        self.assertEqual([(result["name"], result["version"], result["action"]) for result in results], [("Tool", "1.0", "installed")])
+        self.assertEqual(installedExtensions.version("Tool.roboFontExt"), "1.0")
+        lockfile = Lockfile(os.path.join(self.tempFolder, "extensions.lock.json"))
+        self.assertEqual(lockfile.get("tool")["version"], "1.0")
+        # nothing changed, no requests
+        results = self.sync(["Tool"])
+        self.assertEqual([result["action"] for result in results], ["unchanged"])
+        self.assertEqual(self.server.requestCount, 0)
+
+    def test_update(self):
+        self.sync(["Tool"])
+        self.publish("2.0")
+        self.assertEqual([result["action"] for result in self.sync(["Tool"])], ["unchanged"])
+        results = self.sync(["Tool"], update=True)
+        self.assertEqual([(result["version"], result["action"]) for result in results], [("2.0", "installed")])
+
+    def test_pinnedRollback(self):
+        self.sync([dict(name="Tool", version="1.0")])
+        self.publish("2.0")
+        self.assertEqual([result["version"] for result in self.sync([dict(name="Tool", version="2.0")])], ["2.0"])
+        # the previous version is installed from the bundle store
+        results = self.sync([dict(name="Tool", version="1.0")])
+        self.assertEqual([(result["version"], result["action"]) for result in results], [("1.0", "installed")])
+        self.assertEqual(self.server.requestCount, 0)
+
+    def test_sameExtension(self):
+        results = self.sync(["Tool", "Tool.roboFontExt"])
+        self.assertEqual([(result["name"], result["version"], result["action"]) for result in results], [("Tool", "1.0", "installed"), ("Tool", "1.0", "installed")])
+        lockfile = Lockfile(os.path.join(self.tempFolder, "extensions.lock.json"))
+        self.assertEqual(sorted(lockfile.extensions), ["tool", "tool.robofontext"])
+        self.assertEqual([result["action"] for result in self.sync(["Tool", "Tool.roboFontExt"])], ["unchanged", "unchanged"])
+
+    def test_conflictingVersions(self):
+        results = self.sync([dict(name="Tool", version="1.0"), dict(name="Tool.roboFontExt", version="2.0")])
+        self.assertEqual([result["action"] for result in results], ["installed", "failed"])
+        self.assertEqual(installedExtensions.version("Tool.roboFontExt"), "1.0")
+
+    def test_missing(self):
+        results = self.sync(["Other"])
+        self.assertEqual([result["action"] for result in results], ["failed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
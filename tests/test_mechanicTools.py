@@ -0,0 +1,129 @@
+import os
+import gc
+import time
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2 import mechanicTools
+from mechanic2.mechanicTools import downloadURLToFile, remember, clearRemembered, getRemembered, setRemembered, RememberedRegistry
+
+
+class Counted(object):
+
+    def __init__(self):
+        self.calls = []
+        self.base = 1
+
+    @remember(ttl=10)
+    def countedBase(self):
+        self.calls.append("countedBase")
+        return self.base
+
+    @remember(dependsOn=("countedBase",))
+    def countedDependent(self):
+        self.calls.append("countedDependent")
+        return self.countedBase() * 10
+
+    @remember
+    def countedArgument(self, value):
+        self.calls.append(value)
+        return value * 2
+
+
+class RememberTest(unittest.TestCase):
+
+    def test_remember(self):
+        obj = Counted()
+        self.assertEqual(obj.countedArgument(2), 4)
+        self.assertEqual(obj.countedArgument(2), 4)
+        self.assertEqual(obj.countedArgument(3), 6)
+        self.assertEqual(obj.calls, [2, 3])
+        # values are stored per instance
+        other = Counted()
+        other.countedArgument(2)
+        self.assertEqual(other.calls, [2])
+
+    def test_timeToLive(self):
+        obj = Counted()
+        now = time.time()
+        self.assertEqual(obj.countedBase(), 1)
+        obj.base = 2
+        with mock.patch.object(mechanicTools.time, "time", return_value=now + 5):
+            self.assertEqual(obj.countedBase(), 1)
+        with mock.patch.object(mechanicTools.time, "time", return_value=now + 11):
+            self.assertIsNone(getRemembered(obj, "countedBase"))
+            self.assertEqual(getRemembered(obj, "countedBase", allowExpired=True), 1)
+            self.assertEqual(obj.countedBase(), 2)
+
+    def test_setRememberedAt(self):
+        obj = Counted()
+        setRemembered(obj, "countedBase", 5, rememberedAt=time.time() - 11)
+        self.assertIsNone(getRemembered(obj, "countedBase"))
+        setRemembered(obj, "countedBase", 5)
+        self.assertEqual(obj.countedBase(), 5)
+        self.assertEqual(obj.calls, [])
+
+    def test_dependsOn(self):
+        obj = Counted()
+        self.assertEqual(obj.countedDependent(), 10)
+        obj.base = 2
+        self.assertEqual(obj.countedDependent(), 10)
+        clearRemembered(obj, "countedBase")
+        self.assertEqual(obj.countedDependent(), 20)
+        self.assertEqual(obj.calls, ["countedDependent", "countedBase", "countedDependent", "countedBase"])
+        # setting a value clears the dependent values too
+        setRemembered(obj, "countedBase", 7)
+        self.assertEqual(obj.countedDependent(), 70)
+
+    def test_weakReferences(self):
+        registry = RememberedRegistry()
+        with mock.patch.object(mechanicTools, "rememberedRegistry", registry):
+            obj = Counted()
+            obj.countedBase()
+            obj.countedArgument(1)
+            self.assertEqual(len(registry), 2)
+            del obj
+            gc.collect()
+            self.assertEqual(len(registry), 0)
+
+    def test_maxEntries(self):
+        registry = RememberedRegistry(maxEntries=2)
+        with mock.patch.object(mechanicTools, "rememberedRegistry", registry):
+            first, second, third = Counted(), Counted(), Counted()
+            first.countedArgument(1)
+            second.countedArgument(1)
+            first.countedArgument(1)
+            third.countedArgument(1)
+            self.assertEqual(len(registry), 2)
+            # the least recently used value is cleared
+            first.countedArgument(1)
+            self.assertEqual(first.calls, [1])
+            second.countedArgument(1)
+            self.assertEqual(second.calls, [1, 1])
+
+    def test_removeReferenceWhileLocked(self):
+        registry = RememberedRegistry()
+        with mock.patch.object(mechanicTools, "rememberedRegistry", registry):
+            obj = Counted()
+            obj.countedBase()
+            ref = obj.__dict__["_rememberedRef"]
+        # the garbage collector finalizes an instance while the same thread holds the lock
+        with registry._lock:
+            registry._removeReference(ref)
+        self.assertEqual(len(registry), 0)
+
+class DownloadTest(StandInTestCase):
+
+    def test_downloadURLToFile(self):
+        data = os.urandom(300 * 1024)
+        self.server.addFile("/archive.zip", data)
+        path = os.path.join(self.tempFolder, "archive.zip")
+        downloadURLToFile(self.server.url("/archive.zip"), path, chunkSize=1000)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
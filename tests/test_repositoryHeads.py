@@ -0,0 +1,67 @@
+import os
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.repositoryHeads import parseRefs, repositoryHeads
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.updateChecker import UpdateChecker
+from standInServer import refsAdvertisement
+
+
+shaA = "a" * 40
+shaB = "b" * 40
+
+
+class ParseRefsTest(unittest.TestCase):
+
+    def test_parseRefs(self):
+        refs = {"refs/heads/master": shaA, "refs/heads/develop": shaB, "HEAD": shaA}
+        self.assertEqual(parseRefs(refsAdvertisement(refs)), refs)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parseRefs(b"<html>")
+
+
+class RemoteVersionTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=True)
+        self.setHead(shaA, "1.0")
+
+    def setHead(self, sha, version):
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha, self.infoPlist("Tool", version))
+
+    def checkAgain(self):
+        self.item.resetRemembered()
+        repositoryHeads._heads.clear()
+        self.server.resetCounters()
+        return self.item.remoteVersion()
+
+    def test_unchangedHead(self):
+        self.assertEqual(str(self.item.remoteVersion()), "1.0")
+        self.assertEqual(str(self.checkAgain()), "1.0")
+        # only the refs are requested
+        self.assertEqual([path for method, path, ranges in self.server.requests], ["/owner/repo.git/info/refs?service=git-upload-pack"])
+
+    def test_movedHead(self):
+        # the master branch file is still cached after the push
+        self.server.addFile("/owner/repo/master/Tool.roboFontExt/info.plist", self.infoPlist("Tool", "1.0"))
+        self.assertEqual(str(self.item.remoteVersion()), "1.0")
+        self.setHead(shaB, "2.0")
+        self.assertEqual(str(self.checkAgain()), "2.0")
+        self.assertEqual(repositoryHeads.version(self.item.remoteInfoPath(), shaB), "2.0")
+
+    def test_flushAfterCheck(self):
+        self.installBundle("Tool.roboFontExt", "1.0")
+        os.remove(repositoryHeads.path)
+        results = UpdateChecker().check([self.item])
+        self.assertEqual(results, {self.item: False})
+        self.assertTrue(os.path.exists(repositoryHeads.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+
+from mechanic2.searchIndex import SearchIndex, FacetIndex, indexesToBitset, bitsetToIndexes, bitsetCount
+
+
+class StandInItem(object):
+
+    def __init__(self, name, installed=False, needsUpdate=False, developer="Developer", tags=()):
+        self.name = name
+        self.installed = installed
+        self.needsUpdate = needsUpdate
+        self.developer = developer
+        self.tags = list(tags)
+
+    def extensionName(self):
+        return self.name
+
+    def extensionDeveloper(self):
+        return self.developer
+
+    def extensionDescription(self):
+        return "A %s extension." % self.name
+
+    def extensionTags(self):
+        return self.tags
+
+    def knownExtensionNeedsUpdate(self):
+        return self.needsUpdate
+
+    def isExtensionInstalled(self):
+        return self.installed
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [StandInItem("Batch", installed=True, needsUpdate=True), StandInItem("Glyph Construction", installed=True, needsUpdate=True)]
+
+    def typeQuery(self, index, query):
+        for i in range(1, len(query) + 1):
+            result = index.search(query[:i])
+        return result
+
+    def test_words(self):
+        index = SearchIndex(self.items)
+        self.assertEqual(index.search("glyph"), {1})
+        self.assertEqual(index.search("glyph constr"), {1})
+        self.assertEqual(index.search("developer"), {0, 1})
+        self.assertEqual(index.search(""), {0, 1})
+
+    def test_typingNarrows(self):
+        index = SearchIndex(self.items)
+        self.assertEqual(self.typeQuery(index, "construction"), {1})
+        self.assertEqual(self.typeQuery(index, "bat"), {0})
+
+    def test_typingStateWords(self):
+        index = SearchIndex(self.items)
+        self.assertEqual(self.typeQuery(index, "?update?"), SearchIndex(self.items).search("?update?"))
+        self.assertEqual(self.typeQuery(index, "?update?"), {0, 1})
+        self.assertEqual(self.typeQuery(index, "?update? batch"), {0})
+
+    def test_stateChanges(self):
+        self.items[1].installed = False
+        index = SearchIndex(self.items)
+        self.assertEqual(index.search("?installed?"), {0})
+        self.items[1].installed = True
+        self.assertEqual(index.search("?installed?"), {0, 1})
+        self.assertEqual(self.typeQuery(index, "?installed? glyph"), {1})
+        self.items[1].installed = False
+        index.invalidate()
+        self.assertEqual(index.search("?installed? glyph"), set())
+
+
+class BitsetTest(unittest.TestCase):
+
+    def test_roundTrip(self):
+        for indexes in ([], [0], [3, 1, 64, 200], range(100)):
+            bitset = indexesToBitset(indexes)
+            self.assertEqual(bitsetToIndexes(bitset), sorted(indexes))
+            self.assertEqual(bitsetCount(bitset), len(set(indexes)))
+
+    def test_values(self):
+        self.assertEqual(indexesToBitset([0, 2]), 0b101)
+        self.assertEqual(indexesToBitset([1, 1]), 0b10)
+        self.assertEqual(bitsetToIndexes(0), [])
+
+
+class FacetIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [
+            StandInItem("Batch", developer="TypeMyType", tags=["export", "generate"]),
+            StandInItem("Glyph Construction", developer="Frederik", tags=["construction"]),
+            StandInItem("Outliner", developer="TypeMyType", tags=["construction", "outline"]),
+            StandInItem("Untagged", developer="Somebody"),
+        ]
+        self.index = FacetIndex(self.items, {
+            "developer": lambda item: [item.extensionDeveloper()],
+            "tags": lambda item: item.extensionTags(),
+        })
+
+    def test_values(self):
+        self.assertEqual(self.index.facetNames(), ["developer", "tags"])
+        self.assertEqual(self.index.values("developer"), ["Frederik", "Somebody", "TypeMyType"])
+        self.assertEqual(self.index.values("tags"), ["construction", "export", "generate", "outline"])
+        self.assertEqual(bitsetToIndexes(self.index.bitset("tags", "construction")), [1, 2])
+        self.assertEqual(self.index.bitset("tags", "unknown"), 0)
+
+    def test_filter(self):
+        self.assertEqual(bitsetToIndexes(self.index.filter(dict())), [0, 1, 2, 3])
+        self.assertEqual(bitsetToIndexes(self.index.filter({"tags": []})), [0, 1, 2, 3])
+        # values of a facet are combined with or
+        self.assertEqual(bitsetToIndexes(self.index.filter({"tags": ["export", "outline"]})), [0, 2])
+        # facets are combined with and
+        self.assertEqual(bitsetToIndexes(self.index.filter({"tags": ["construction"], "developer": ["TypeMyType"]})), [2])
+        self.assertEqual(bitsetToIndexes(self.index.filter({"tags": ["construction"], "developer": ["TypeMyType"]}, exclude="developer")), [1, 2])
+        self.assertEqual(self.index.filter({"tags": ["unknown"]}), 0)
+
+    def test_counts(self):
+        selection = {"developer": ["TypeMyType"]}
+        self.assertEqual(self.index.counts("tags", selection), {"construction": 1, "export": 1, "generate": 1, "outline": 1})
+        # the selection of the counted facet itself is ignored
+        self.assertEqual(self.index.counts("developer", selection), {"TypeMyType": 2, "Frederik": 1, "Somebody": 1})
+        searchResult = indexesToBitset(SearchIndex(self.items).search("outliner"))
+        self.assertEqual(self.index.counts("developer", dict(), bitset=searchResult), {"TypeMyType": 1, "Frederik": 0, "Somebody": 0})
+
+    def test_empty(self):
+        index = FacetIndex([], {"tags": lambda item: item.extensionTags()})
+        self.assertEqual(index.filter({"tags": ["export"]}), 0)
+        self.assertEqual(index.counts("tags", dict()), dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
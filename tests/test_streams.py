@@ -0,0 +1,119 @@
+import json
+import threading
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.streams import StreamLoader, fetchStreams, createStreamItems
+
+
+streamURL = "https://robofont-mechanic.github.io/stream.json"
+otherStreamURL = "https://robofont-mechanic.github.io/other.json"
+missingStreamURL = "https://robofont-mechanic.github.io/missing.json"
+
+toolEntry = dict(extensionName="Tool", repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt")
+
+
+class StreamLoaderTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.addFile("/stream.json", json.dumps(dict(extensions=[toolEntry])).encode("utf-8"))
+        self.server.addFile("/other.json", json.dumps(dict(extensions=[])).encode("utf-8"))
+        self.loaded = []
+        self.done = threading.Event()
+        self.result = None
+
+    def callback(self, url, entries, error):
+        self.loaded.append((url, entries, error))
+
+    def doneCallback(self, streams, errors):
+        self.result = streams, errors
+        self.done.set()
+
+    def test_callbacks(self):
+        loader = StreamLoader([streamURL, otherStreamURL, missingStreamURL], callback=self.callback, doneCallback=self.doneCallback)
+        loader.start()
+        self.assertTrue(self.done.wait(10))
+        self.assertTrue(loader.isDone())
+        streams, errors = self.result
+        self.assertEqual(streams, {streamURL: [toolEntry], otherStreamURL: []})
+        self.assertEqual(list(errors), [missingStreamURL])
+        # every stream is delivered once, a failed stream without entries
+        self.assertEqual(sorted(url for url, entries, error in self.loaded), sorted([streamURL, otherStreamURL, missingStreamURL]))
+        for url, entries, error in self.loaded:
+            if url == missingStreamURL:
+                self.assertIsNone(entries)
+                self.assertIsNotNone(error)
+            else:
+                self.assertIsNone(error)
+
+    def test_dispatch(self):
+        dispatched = []
+
+        def dispatch(function, *args):
+            dispatched.append(function.__name__)
+            function(*args)
+
+        loader = StreamLoader([streamURL, otherStreamURL], callback=self.callback, doneCallback=self.doneCallback, dispatch=dispatch)
+        loader.start()
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(dispatched, ["_loaded", "_loaded"])
+        self.assertEqual(len(self.loaded), 2)
+
+    def test_noURLs(self):
+        loader = StreamLoader([], callback=self.callback, doneCallback=self.doneCallback)
+        loader.start()
+        self.assertTrue(self.done.is_set())
+        self.assertEqual(self.result, (dict(), dict()))
+        self.assertTrue(loader.isDone())
+
+    def test_cancel(self):
+        release = threading.Event()
+        requested = threading.Event()
+
+        def slowStream(path, headers):
+            requested.set()
+            release.wait(10)
+            return 200, dict(), json.dumps(dict(extensions=[])).encode("utf-8")
+
+        self.server.addHandler("/slow.json", slowStream)
+        loader = StreamLoader(["https://robofont-mechanic.github.io/slow.json"], callback=self.callback, doneCallback=self.doneCallback)
+        loader.start()
+        self.assertTrue(requested.wait(10))
+        loader.cancel()
+        release.set()
+        loader._executor.shutdown(wait=True)
+        self.assertEqual(self.loaded, [])
+        self.assertFalse(self.done.is_set())
+
+
+class FetchStreamsTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.addFile("/stream.json", json.dumps(dict(extensions=[toolEntry])).encode("utf-8"))
+
+    def test_fallback(self):
+        fallback = {missingStreamURL: [toolEntry], streamURL: []}
+        streams = fetchStreams([streamURL, missingStreamURL], fallback=fallback)
+        self.assertEqual(streams, {streamURL: [toolEntry], missingStreamURL: [toolEntry]})
+        self.assertEqual(fetchStreams([missingStreamURL]), {missingStreamURL: []})
+        self.assertEqual(fetchStreams([]), dict())
+
+    def test_errors(self):
+        errors = dict()
+        streams = fetchStreams([streamURL, missingStreamURL], errors=errors)
+        self.assertEqual(streams, {streamURL: [toolEntry], missingStreamURL: []})
+        self.assertEqual(list(errors), [missingStreamURL])
+
+    def test_createStreamItems(self):
+        items = createStreamItems(streamURL, [toolEntry, dict(extensionName="Broken")])
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], ExtensionRepository)
+        self.assertEqual(items[0].extensionSource(), streamURL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from . import StandInTestCase
+
+from mechanic2.extensionItem import ExtensionRepository, remoteVersionTimeToLive
+from mechanic2.mechanicTools import setRemembered
+from mechanic2.updateChecker import UpdatePlan, UpdateChecker, RemoteVersionRefresher
+
+
+sha = "a" * 40
+
+
+class UpdatePlanTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha, self.infoPlist("Tool", "2.0"))
+        # the same extension listed in two streams
+        self.tool = self.repositoryItem("/owner/repo", "Tool.roboFontExt")
+        self.toolCopy = self.repositoryItem("/owner/repo", "Tool.roboFontExt")
+        self.notInstalled = self.repositoryItem("/owner/other", "Other.roboFontExt")
+
+    def repositoryItem(self, repositoryPath, extensionPath):
+        return ExtensionRepository(dict(repository="https://github.com%s" % repositoryPath, extensionPath=extensionPath), checkForUpdates=True)
+
+    def test_plan(self):
+        plan = UpdatePlan([self.tool, self.notInstalled, self.toolCopy])
+        self.assertEqual(plan.skipped, [self.notInstalled])
+        self.assertEqual(plan.fetchCount(), 1)
+        self.assertEqual(plan.fetches(), [("raw.githubusercontent.com", self.tool.remoteInfoPath(), [self.tool, self.toolCopy])])
+
+    def test_check(self):
+        results = UpdateChecker().check([self.tool, self.notInstalled, self.toolCopy])
+        self.assertEqual(results, {self.tool: True, self.toolCopy: True, self.notInstalled: False})
+        self.assertEqual(str(self.toolCopy.remoteVersion()), "2.0")
+        # a single info.plist fetch and nothing for the item which is not installed
+        paths = [path for method, path, ranges in self.server.requests]
+        self.assertEqual(paths.count("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha), 1)
+        self.assertFalse([path for path in paths if path.startswith("/owner/other")])
+
+
+
+class StandInView(object):
+
+    def __init__(self):
+        self.redrawn = threading.Event()
+
+    def setNeedsDisplay_(self, value):
+        self.redrawn.set()
+
+
+class RemoteVersionRefresherTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.server.addRefs("/owner/repo", {"refs/heads/master": sha})
+        self.server.addFile("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha, self.infoPlist("Tool", "3.0"))
+        self.item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=True)
+        self.refresher = RemoteVersionRefresher()
+        self.checkedOn = []
+        remoteVersion = ExtensionRepository.remoteVersion
+
+        def _remoteVersion(item):
+            self.checkedOn.append(threading.current_thread())
+            return remoteVersion(item)
+
+        patcher = mock.patch.object(ExtensionRepository, "remoteVersion", _remoteVersion)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expired(self):
+        setRemembered(self.item, "remoteVersion", "2.0", rememberedAt=time.time() - remoteVersionTimeToLive - 1)
+        view = StandInView()
+        # the expired version is used, the new version is retrieved in the background
+        self.assertTrue(self.refresher.needsUpdate(self.item, view))
+        self.assertTrue(view.redrawn.wait(5))
+        self.assertEqual(str(self.item.knownRemoteVersion()), "3.0")
+        self.assertTrue(self.refresher.needsUpdate(self.item))
+        self.assertNotIn(threading.main_thread(), self.checkedOn)
+        paths = [path for method, path, ranges in self.server.requests]
+        self.assertEqual(paths.count("/owner/repo/%s/Tool.roboFontExt/info.plist" % sha), 1)
+
+    def test_valid(self):
+        setRemembered(self.item, "remoteVersion", "1.0")
+        self.assertFalse(self.refresher.needsUpdate(self.item, StandInView()))
+        self.assertFalse(self.refresher.isRunning())
+        self.assertEqual(self.checkedOn, [])
+        self.assertEqual(self.server.requestCount, 0)
+
+    def test_notChecked(self):
+        item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=False)
+        self.assertFalse(self.refresher.needsUpdate(item, StandInView()))
+        self.assertFalse(self.refresher.isRunning())
+
+
+if __name__ == "__main__":
+    unittest.main()
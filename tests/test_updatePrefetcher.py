@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.mechanicTools import setRemembered
+from mechanic2.bundleStore import bundleStore
+from mechanic2.extensionItem import ExtensionRepository
+from mechanic2.updatePrefetcher import UpdatePrefetcher
+
+
+class UpdatePrefetcherTest(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.installBundle("Tool.roboFontExt", "1.0")
+        self.item = ExtensionRepository(dict(repository="https://github.com/owner/repo", extensionPath="Tool.roboFontExt"), checkForUpdates=True)
+        setRemembered(self.item, "remoteVersion", "2.0")
+
+    def addArchive(self, payloadSize):
+        files = {"payload.bin": os.urandom(payloadSize)}
+        self.server.addFile("/owner/repo/archive/master.zip", self.zipData("repo-master", "Tool.roboFontExt", "2.0", files))
+
+    def prefetch(self, maxBytesPerSecond):
+        done = threading.Event()
+        results = []
+
+        def callback(item, ready):
+            results.append(ready)
+            done.set()
+
+        prefetcher = UpdatePrefetcher(maxBytesPerSecond=maxBytesPerSecond)
+        prefetcher.start([self.item], callback=callback)
+        return prefetcher, done, results
+
+    def test_prefetch(self):
+        self.addArchive(1024)
+        prefetcher, done, results = self.prefetch(None)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(results, [True])
+        self.assertIsNotNone(bundleStore.find("Tool.roboFontExt", "2.0", url=self.item.remoteZipPath()))
+
+    def test_throttle(self):
+        maxBytesPerSecond = 256 * 1024
+        self.addArchive(256 * 1024)
+        start = time.time()
+        prefetcher, done, results = self.prefetch(maxBytesPerSecond)
+        self.assertTrue(done.wait(10))
+        elapsed = time.time() - start
+        self.assertEqual(results, [True])
+        # the speed is limited while downloading the zip file
+        self.assertGreater(prefetcher.bytesDownloaded, 256 * 1024)
+        self.assertGreaterEqual(elapsed, 0.9 * prefetcher.bytesDownloaded / maxBytesPerSecond)
+
+    def test_cancel(self):
+        size = 2 * 1024 * 1024
+        self.addArchive(size)
+        prefetcher, done, results = self.prefetch(256 * 1024)
+        time.sleep(0.3)
+        prefetcher.cancel()
+        start = time.time()
+        prefetcher._executor.shutdown(wait=True)
+        # the running download is aborted
+        self.assertLess(time.time() - start, 2)
+        self.assertLess(prefetcher.bytesDownloaded, size)
+        self.assertEqual(results, [])
+        self.assertIsNone(bundleStore.find("Tool.roboFontExt", "2.0", url=self.item.remoteZipPath()))
+
+
+if __name__ == "__main__":
+    unittest.main()
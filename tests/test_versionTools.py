@@ -0,0 +1,28 @@
+import unittest
+
+from mechanic2.versionTools import LooseVersion
+
+
+class LooseVersionTest(unittest.TestCase):
+
+    def test_compare(self):
+        self.assertLess(LooseVersion("1.0"), LooseVersion("1.0.1"))
+        self.assertLess(LooseVersion("1.9"), LooseVersion("1.10"))
+        self.assertLess(LooseVersion("0.6"), LooseVersion("1"))
+        self.assertLess(LooseVersion("1.0a"), LooseVersion("1.0.1"))
+        self.assertLess(LooseVersion("1.0"), LooseVersion("1.0b1"))
+        self.assertGreater(LooseVersion("2.0"), LooseVersion("1.99"))
+
+    def test_equal(self):
+        self.assertEqual(LooseVersion("1.0"), LooseVersion("1.0"))
+        self.assertEqual(LooseVersion("1.0"), "1.0")
+        self.assertNotEqual(LooseVersion("1.0"), LooseVersion("1"))
+        self.assertEqual(len({LooseVersion("1.0"), LooseVersion("1.0")}), 1)
+
+    def test_str(self):
+        self.assertEqual(str(LooseVersion("1.0b2")), "1.0b2")
+        self.assertEqual(str(LooseVersion(2)), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import io
+import zipfile
+import unittest
+
+from . import StandInTestCase
+
+from mechanic2.archiveCache import archiveCache
+from mechanic2.zipTools import HTTPRangeFile, RangeNotSupported, extractBundle
+
+
+class RemoteZipTestMixin(object):
+
+    path = "/owner/repo/archive/master.zip"
+
+    def addArchive(self):
+        # a small bundle next to a large one in the same zip file
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zipFile:
+            zipFile.writestr("repo-master/Large.roboFontExt/info.plist", self.infoPlist("Large", "1.0"))
+            zipFile.writestr("repo-master/Large.roboFontExt/payload.bin", os.urandom(512 * 1024))
+            zipFile.writestr("repo-master/Tool.roboFontExt/info.plist", self.infoPlist("Tool", "1.0"))
+            zipFile.writestr("repo-master/Tool.roboFontExt/lib/main.py", b"print('tool')")
+        data = data.getvalue()
+        self.server.addFile(self.path, data)
+        return data
+
+    def cachedSource(self):
+        return archiveCache._entries[self.server.url(self.path)]["source"]
+
+    def extractTool(self):
+        with archiveCache.open(self.server.url(self.path)) as zipFile:
+            path = extractBundle(zipFile, "Tool.roboFontExt", os.path.join(self.tempFolder, "extracted"))
+        files = sorted(os.path.relpath(os.path.join(root, fileName), path) for root, dirs, fileNames in os.walk(path) for fileName in fileNames)
+        self.assertEqual(files, ["info.plist", "lib/main.py"])
+        with open(os.path.join(path, "lib", "main.py"), "rb") as f:
+            self.assertEqual(f.read(), b"print('tool')")
+        return path
+
+
+class RangeReadTest(RemoteZipTestMixin, StandInTestCase):
+
+    def test_extractOnlyTheBundle(self):
+        data = self.addArchive()
+        self.extractTool()
+        # the tail and the members of the small bundle, not the payload
+        self.assertLess(self.server.bytesSent, len(data) / 4)
+        self.assertTrue(all(ranges for method, path, ranges in self.server.requests))
+        self.assertIsInstance(self.cachedSource(), HTTPRangeFile)
+
+    def test_read(self):
+        data = self.addArchive()
+        rangeFile = HTTPRangeFile(self.server.url(self.path), blockSize=1024)
+        self.assertEqual(rangeFile.size(), len(data))
+        rangeFile.seek(1000)
+        self.assertEqual(rangeFile.read(5000), data[1000:6000])
+        rangeFile.seek(-10, io.SEEK_END)
+        self.assertEqual(rangeFile.read(), data[-10:])
+        self.assertEqual(rangeFile.bytesDownloaded, 65536 + 22 + 5000)
+
+
+class RangeNotSupportedTest(RemoteZipTestMixin, StandInTestCase):
+
+    serverOptions = dict(supportsRanges=False)
+
+    def test_rangeNotSupported(self):
+        self.addArchive()
+        with self.assertRaises(RangeNotSupported):
+            HTTPRangeFile(self.server.url(self.path))
+
+    def test_fallback(self):
+        data = self.addArchive()
+        self.server.resetCounters()
+        self.extractTool()
+        # the range request is refused, the whole zip file is downloaded once
+        self.assertEqual([ranges for method, path, ranges in self.server.requests], ["bytes=-%s" % (65536 + 22), None])
+        with open(self.cachedSource(), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,404 @@
+"""
+Benchmarks for Mechanic against a local stand-in registry server.
+
+A synthetic registry with 100 to 10,000 extensions, an extension store
+stream, info.plists, ref advertisements and zip files is served by the
+stand-in server, with optional latency and failure rate. Each scenario
+runs in a fresh process with an empty home folder, against stand-in
+modules for mojo, AppKit and vanilla, and reports the wall time, the
+amount of requests, the bytes downloaded and the peak memory. The peak
+memory is measured in a second run, tracing would skew the wall time.
+
+    python benchmark.py
+    python benchmark.py --entries 100 10000 --latency 0.05 --scenarios loadExtensions checkUpdates
+    python benchmark.py --json results.json
+    python benchmark.py --compare results.json --tolerance 0.2
+
+With `--compare` the exit code is 1 when a scenario is slower, makes
+more requests, downloads more or uses more memory than the given results.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import tracemalloc
+import subprocess
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+benchmarksFolder = os.path.dirname(os.path.abspath(__file__))
+toolsFolder = os.path.dirname(benchmarksFolder)
+stubsFolder = os.path.join(benchmarksFolder, "stubs")
+libFolder = os.path.join(os.path.dirname(toolsFolder), "Mechanic2.roboFontExt", "lib")
+
+sys.path.insert(0, toolsFolder)
+from standInServer import StandInServer  # noqa: E402
+
+hosts = ("robofont-mechanic.github.io", "extensionstore.robofont.com", "github.com", "raw.githubusercontent.com")
+
+searchQueries = ["glyph", "kern", "Extension00", "developer 1", "?installed?", "?update?", "synthetic batch", "zzz"]
+
+metrics = ("wallTime", "requests", "bytes", "peakMemory")
+
+
+# scenarios, run in a benchmark process
+
+def loadItems(urls, checkForUpdates=False):
+    from mechanic2.streams import fetchStreams, createStreamItems
+
+    streams = fetchStreams(urls)
+    items = []
+    for url in urls:
+        items.extend(createStreamItems(url, streams.get(url, []), checkForUpdates=checkForUpdates))
+    return items
+
+
+def repositoryItems(registry, urls):
+    from mechanic2.extensionItem import ExtensionRepository
+
+    return [item for item in loadItems(urls) if isinstance(item, ExtensionRepository)]
+
+
+def openController(urls):
+    from mojo.extensions import setExtensionDefault
+    from PyObjCTools.AppHelper import runEventLoop
+    from mechanic2.ui.controller import MechanicController
+
+    setExtensionDefault("com.mechanic.urlstreams", urls)
+    setExtensionDefault("com.mechanic.prefetchUpdates", False)
+    controller = MechanicController()
+    controller.loadExtensions()
+    runEventLoop(until=lambda: controller._streamLoader is None)
+    return controller
+
+
+def benchmarkLoadStreams(registry, urls, measure, result):
+    with measure():
+        items = loadItems(urls)
+    result["items"] = len(items)
+
+
+def benchmarkLoadExtensions(registry, urls, measure, result):
+    from mojo.extensions import setExtensionDefault
+    from PyObjCTools.AppHelper import runEventLoop
+    from mechanic2.ui.controller import MechanicController
+
+    setExtensionDefault("com.mechanic.urlstreams", urls)
+    setExtensionDefault("com.mechanic.prefetchUpdates", False)
+    with measure():
+        controller = MechanicController()
+        controller.loadExtensions()
+        runEventLoop(until=lambda: controller._streamLoader is None)
+    result["items"] = len(controller._extensionItems)
+
+
+def benchmarkReloadExtensions(registry, urls, measure, result):
+    from PyObjCTools.AppHelper import runEventLoop
+    from mechanic2.ui.controller import MechanicController
+
+    # the second time the window opens, with a catalog snapshot and a warm http cache
+    openController(urls).windowCloseCallback(None)
+    with measure():
+        controller = MechanicController()
+        controller.loadExtensions()
+        runEventLoop(until=lambda: controller._streamLoader is None)
+    result["items"] = len(controller._extensionItems)
+
+
+def benchmarkSearch(registry, urls, measure, result):
+    controller = openController(urls)
+    developersList = controller._developersGroup.developersList
+    with measure():
+        for query in searchQueries:
+            controller._toolbarSearch.set(query)
+            controller.toolbarSearch(None)
+            # narrow down to a developer and back
+            developersList.setSelection([0])
+            controller.filtersCallback(developersList)
+            developersList.setSelection([])
+            controller.filtersCallback(developersList)
+    result["queries"] = len(searchQueries) * 3
+
+
+def benchmarkCheckUpdates(registry, urls, measure, result):
+    from mechanic2.updateChecker import UpdateChecker
+
+    items = loadItems(urls, checkForUpdates=True)
+    with measure():
+        results = UpdateChecker().check(items)
+    result["items"] = len(items)
+    result["updates"] = sum(1 for needsUpdate in results.values() if needsUpdate)
+
+
+def benchmarkRecheckUpdates(registry, urls, measure, result):
+    from mechanic2.updateChecker import UpdateChecker
+    from mechanic2.repositoryHeads import repositoryHeads
+
+    # checking again later only asks for the repository heads
+    items = loadItems(urls, checkForUpdates=True)
+    UpdateChecker().check(items)
+    for item in items:
+        item.resetRemembered("remoteVersion")
+    repositoryHeads.maxAge = 0
+    with measure():
+        results = UpdateChecker().check(items)
+    result["items"] = len(items)
+    result["updates"] = sum(1 for needsUpdate in results.values() if needsUpdate)
+
+
+def benchmarkInstall(registry, urls, measure, result):
+    from mechanic2.installPipeline import InstallPipeline
+
+    items = repositoryItems(registry, urls)[:registry.zipCount]
+    with measure():
+        results = InstallPipeline().run(items, forcedUpdate=True)
+    result["items"] = len(items)
+    result["errors"] = sum(1 for error in results.values() if error is not None)
+
+
+def benchmarkRemoteInstall(registry, urls, measure, result):
+    items = repositoryItems(registry, urls)[:registry.zipCount]
+    errors = 0
+    with measure():
+        for item in items:
+            try:
+                item.remoteInstall(forcedUpdate=True)
+            except Exception:
+                errors += 1
+    result["items"] = len(items)
+    result["errors"] = errors
+
+
+scenarios = OrderedDict([
+    ("loadStreams", benchmarkLoadStreams),
+    ("loadExtensions", benchmarkLoadExtensions),
+    ("reloadExtensions", benchmarkReloadExtensions),
+    ("search", benchmarkSearch),
+    ("checkUpdates", benchmarkCheckUpdates),
+    ("recheckUpdates", benchmarkRecheckUpdates),
+    ("install", benchmarkInstall),
+    ("remoteInstall", benchmarkRemoteInstall),
+])
+
+
+def serverRequest(serverURL, name):
+    with urllib.request.urlopen("%s/_benchmark/%s" % (serverURL, name)) as response:
+        return json.loads(response.read() or b"{}")
+
+
+def runScenario(name, serverURL, options, traceMemory=True):
+    """
+    Run a scenario in this process and return the result dict.
+    """
+    from syntheticRegistry import SyntheticRegistry
+    from mechanic2.connectionPool import sharedConnectionPool
+    from mechanic2.installedIndex import installedExtensions
+    from mechanic2.defaults import extensionStoreDataURL, mechanicDataURL
+
+    # import everything up front, only the scenario is measured
+    import mechanic2.streams  # noqa: F401
+    import mechanic2.updateChecker  # noqa: F401
+    import mechanic2.installPipeline  # noqa: F401
+    import mechanic2.ui.controller  # noqa: F401
+
+    registry = SyntheticRegistry(**options)
+    for host in hosts:
+        sharedConnectionPool.setHostAlias(host, serverURL)
+    os.makedirs(installedExtensions.folder, exist_ok=True)
+    registry.installBundles(installedExtensions.folder)
+    # the default streams, the store items are only created for the store url
+    urls = [extensionStoreDataURL, mechanicDataURL]
+
+    result = dict(scenario=name, entries=registry.entries)
+
+    @contextmanager
+    def measure():
+        serverRequest(serverURL, "reset")
+        if traceMemory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            result["wallTime"] = time.perf_counter() - start
+            if traceMemory:
+                result["peakMemory"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            result.update(serverRequest(serverURL, "stats"))
+
+    scenarios[name](registry, urls, measure, result)
+    return result
+
+
+# runner
+
+class BenchmarkServer(StandInServer):
+
+    """
+    A stand-in server the benchmark processes can reset and read the counters of.
+    These requests never wait, never fail and are not counted.
+    """
+
+    def _response(self, method, path, headers):
+        if path == "/_benchmark/reset":
+            self.resetCounters()
+            return 200, dict(), b""
+        if path == "/_benchmark/stats":
+            with self._lock:
+                body = json.dumps(dict(requests=len(self.requests), bytes=self.bytesSent))
+            return 200, {"Content-Type": "application/json"}, body.encode("utf-8")
+        return super(BenchmarkServer, self)._response(method, path, headers)
+
+
+def spawnScenario(name, server, registry, python=sys.executable, traceMemory=True, timeout=600):
+    """
+    Run a scenario in a fresh process with an empty home folder and return the result dict.
+
+    With `traceMemory` the peak memory is measured in a second process,
+    tracing slows down python code, most of all with worker threads,
+    and would skew the wall time.
+    """
+    result = _spawnScenario(name, server, registry, python, False, timeout)
+    if traceMemory and "error" not in result:
+        traced = _spawnScenario(name, server, registry, python, True, timeout)
+        if "error" in traced:
+            return traced
+        result["peakMemory"] = traced["peakMemory"]
+    return result
+
+
+def _spawnScenario(name, server, registry, python, traceMemory, timeout):
+    home = tempfile.mkdtemp(prefix="mechanic-benchmark-")
+    try:
+        env = dict(os.environ)
+        env["HOME"] = home
+        env["PYTHONPATH"] = os.pathsep.join([stubsFolder, libFolder, benchmarksFolder, toolsFolder])
+        command = [python, os.path.abspath(__file__), "--run", name, "--server", server.url(), "--options", json.dumps(registry.options())]
+        if not traceMemory:
+            command.append("--no-memory")
+        output = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+        if output.returncode != 0:
+            return dict(scenario=name, entries=registry.entries, error=output.stderr.strip().splitlines()[-1:])
+        return json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def compareResults(results, baseline, tolerance=0.2):
+    """
+    Return a list of regressions of `results` compared with `baseline`.
+    """
+    previous = dict(((result["scenario"], result["entries"]), result) for result in baseline)
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["entries"]))
+        if before is None or "error" in result or "error" in before:
+            continue
+        for metric in metrics:
+            if metric not in result or not before.get(metric):
+                continue
+            if result[metric] > before[metric] * (1 + tolerance):
+                regressions.append("%s (%s entries): %s %s -> %s" % (result["scenario"], result["entries"], metric, formatValue(metric, before[metric]), formatValue(metric, result[metric])))
+    return regressions
+
+
+def formatValue(metric, value):
+    if value is None:
+        return "-"
+    if metric == "wallTime":
+        return "%.3f s" % value
+    if metric in ("bytes", "peakMemory"):
+        return "%.1f KB" % (value / 1024.0)
+    return str(value)
+
+
+resultFormat = "%-18s %8s %10s %9s %12s %12s"
+
+
+def printResult(result):
+    if "error" in result:
+        print("%-18s %8s  failed: %s" % (result["scenario"], result["entries"], " ".join(result["error"])))
+        return
+    print(resultFormat % (
+        result["scenario"],
+        result["entries"],
+        formatValue("wallTime", result["wallTime"]),
+        result["requests"],
+        formatValue("bytes", result["bytes"]),
+        formatValue("peakMemory", result.get("peakMemory")),
+    ))
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark Mechanic against a local stand-in registry server.")
+    parser.add_argument("--entries", type=int, nargs="+", default=[100, 1000, 10000], help="Registry sizes.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(scenarios), default=list(scenarios))
+    parser.add_argument("--latency", type=float, default=0, help="Seconds each request waits.")
+    parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of requests failing with a 503.")
+    parser.add_argument("--installed", type=float, default=0.2, help="Fraction of the extensions installed.")
+    parser.add_argument("--outdated", type=float, default=0.5, help="Fraction of the installed extensions with an update.")
+    parser.add_argument("--zip-count", type=int, default=50, help="Amount of extensions with a zip file, installed by the install scenarios.")
+    parser.add_argument("--zip-size", type=int, default=64 * 1024, help="Payload bytes in each zip file.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure the peak memory, it is measured in a second run of each scenario.")
+    parser.add_argument("--python", default=sys.executable, help="The python interpreter to run the scenarios with.")
+    parser.add_argument("--json", metavar="PATH", help="Write the results to a json file.")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with the results in a json file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase before a metric is a regression.")
+    # running a single scenario in a benchmark process
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    arguments = parser.parse_args(args)
+
+    if arguments.run:
+        result = runScenario(arguments.run, arguments.server, json.loads(arguments.options), traceMemory=not arguments.no_memory)
+        print(json.dumps(result))
+        return 0
+
+    from syntheticRegistry import SyntheticRegistry
+
+    results = []
+    print(resultFormat % ("scenario", "entries", "wall", "requests", "downloaded", "peak memory"))
+    for entries in arguments.entries:
+        registry = SyntheticRegistry(
+            entries=entries,
+            installedFraction=arguments.installed,
+            outdatedFraction=arguments.outdated,
+            zipCount=arguments.zip_count,
+            zipSize=arguments.zip_size,
+            seed=arguments.seed,
+        )
+        server = BenchmarkServer(latency=arguments.latency, failureRate=arguments.failure_rate)
+        registry.publish(server)
+        server.start()
+        try:
+            for name in arguments.scenarios:
+                result = spawnScenario(name, server, registry, python=arguments.python, traceMemory=not arguments.no_memory)
+                result.update(latency=arguments.latency, failureRate=arguments.failure_rate)
+                results.append(result)
+                printResult(result)
+        finally:
+            server.stop()
+
+    if arguments.json:
+        with open(arguments.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            regressions = compareResults(results, json.load(f), arguments.tolerance)
+        for regression in regressions:
+            print("regression: %s" % regression)
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
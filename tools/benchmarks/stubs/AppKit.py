@@ -0,0 +1,76 @@
+"""
+Stand-in for AppKit, just enough to import and drive the Mechanic ui without PyObjC.
+Only used by the benchmarks.
+"""
+
+
+class _Anything(object):
+
+    # any attribute, call or operator returns another stand-in
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Anything()
+
+    def __call__(self, *args, **kwargs):
+        return _Anything()
+
+    def __or__(self, other):
+        return self
+
+    __and__ = __ror__ = __rand__ = __or__
+
+
+class NSObject(object):
+
+    @classmethod
+    def alloc(cls):
+        return object.__new__(cls)
+
+    @classmethod
+    def allocWithZone_(cls, zone):
+        return object.__new__(cls)
+
+    def init(self):
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Anything()
+
+
+class NSActionCell(NSObject):
+    pass
+
+
+class NSTextFieldCell(NSActionCell):
+    pass
+
+
+class NSFormatter(NSObject):
+    pass
+
+
+class NSNull(NSObject):
+    pass
+
+
+_constants = [
+    "NSAlternateKeyMask", "NSAttributedString", "NSBezierPath", "NSBitmapImageRep", "NSColor",
+    "NSCompositeCopy", "NSCompositeSourceOver", "NSData", "NSDeviceRGBColorSpace", "NSDragOperationMove",
+    "NSEvent", "NSFont", "NSFontAttributeName", "NSForegroundColorAttributeName", "NSGraphicsContext",
+    "NSImage", "NSImageInterpolationHigh", "NSLineBreakByTruncatingTail", "NSMutableAttributedString",
+    "NSMutableParagraphStyle", "NSPNGFileType", "NSParagraphStyleAttributeName", "NSSegmentStyleSmallSquare",
+    "NSTableViewSelectionHighlightStyleSourceList", "NSToolbarFlexibleSpaceItemIdentifier", "NSURL",
+    "NSWorkspace", "NSWorkspaceLaunchDefault", "NSWorkspaceLaunchWithoutActivation", "NSZeroRect",
+]
+
+for _name in _constants:
+    globals()[_name] = _Anything()
+
+__all__ = ["NSObject", "NSActionCell", "NSTextFieldCell", "NSFormatter", "NSNull"] + _constants
@@ -0,0 +1,2 @@
+# stand-in for Foundation, only used by the benchmarks
+from AppKit import *
@@ -0,0 +1,34 @@
+"""
+Stand-in for PyObjCTools.AppHelper, only used by the benchmarks.
+
+`callAfter` queues the call for the main thread, `runEventLoop` runs the
+queued calls like the application run loop would.
+"""
+
+import time
+import queue
+
+
+_calls = queue.Queue()
+
+
+def callAfter(function, *args, **kwargs):
+    _calls.put((function, args, kwargs))
+
+
+def runEventLoop(until=None, timeout=60):
+    """
+    Run the queued calls until `until()` returns `True` or the timeout is reached.
+    """
+    end = time.time() + timeout
+    while time.time() < end:
+        if until is not None and until():
+            return True
+        try:
+            function, args, kwargs = _calls.get(timeout=0.01)
+        except queue.Empty:
+            if until is None:
+                return True
+            continue
+        function(*args, **kwargs)
+    return False
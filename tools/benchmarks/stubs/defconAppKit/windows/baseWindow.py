@@ -0,0 +1,29 @@
+# stand-in for defconAppKit's BaseWindowController, only used by the benchmarks
+
+
+class _Progress(object):
+
+    def update(self, text=None):
+        pass
+
+    def setTickCount(self, value):
+        pass
+
+    def close(self):
+        pass
+
+
+class BaseWindowController(object):
+
+    def startProgress(self, text="", tickCount=None):
+        return _Progress()
+
+    def showMessage(self, messageText, informativeText, alertStyle=None, callback=None):
+        pass
+
+    def showAskYesNo(self, messageText, informativeText, alertStyle=None, callback=None):
+        if callback is not None:
+            callback(True)
+
+    def showGetFile(self, fileTypes, callback, allowsMultipleSelection=False):
+        pass
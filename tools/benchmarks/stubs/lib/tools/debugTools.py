@@ -0,0 +1,3 @@
+# stand-in for RoboFont's lib.tools.debugTools, only used by the benchmarks
+
+ClassNameIncrementer = type
@@ -0,0 +1,5 @@
+# stand-in for mojo.UI, only used by the benchmarks
+
+
+def PostBannerNotification(title, message):
+    pass
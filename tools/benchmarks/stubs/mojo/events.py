@@ -0,0 +1,9 @@
+# stand-in for mojo.events, only used by the benchmarks
+
+
+def addObserver(observer, method, event):
+    pass
+
+
+def removeObserver(observer, event):
+    pass
@@ -0,0 +1,50 @@
+"""
+Stand-in for mojo.extensions, only used by the benchmarks.
+Defaults are kept in memory, bundles are copied into the extensions folder.
+"""
+
+import os
+import shutil
+
+
+_defaults = dict()
+
+extensionsFolder = os.path.expanduser("~/Library/Application Support/RoboFont/plugins")
+
+
+def registerExtensionDefaults(defaults):
+    for key, value in defaults.items():
+        _defaults.setdefault(key, value)
+
+
+def getExtensionDefault(key, fallback=None):
+    return _defaults.get(key, fallback)
+
+
+def setExtensionDefault(key, value):
+    _defaults[key] = value
+
+
+def removeExtensionDefault(key):
+    _defaults.pop(key, None)
+
+
+class ExtensionBundle(object):
+
+    def __init__(self, name=None, path=None):
+        if path is None:
+            path = os.path.join(extensionsFolder, name)
+        self.path = self.bundlePath = path
+
+    def bundleExists(self):
+        return os.path.isdir(self.path)
+
+    def install(self, showMessages=False):
+        destination = os.path.join(extensionsFolder, os.path.basename(self.path))
+        if os.path.exists(destination):
+            shutil.rmtree(destination)
+        shutil.copytree(self.path, destination)
+        return True
+
+    def deinstall(self):
+        shutil.rmtree(self.path)
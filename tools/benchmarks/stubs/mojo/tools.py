@@ -0,0 +1,5 @@
+# stand-in for mojo.tools, only used by the benchmarks
+
+
+def registerFileExtension(fileExtension):
+    pass
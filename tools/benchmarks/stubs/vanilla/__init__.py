@@ -0,0 +1,109 @@
+"""
+Stand-in for vanilla, only used by the benchmarks.
+Controls keep their value, lists keep their items and selection.
+"""
+
+from AppKit import _Anything
+
+
+class _Control(object):
+
+    def __init__(self, posSize=None, *args, **kwargs):
+        self._value = kwargs.get("value")
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Anything()
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class Window(_Control):
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def bind(self, event, callback):
+        pass
+
+
+Sheet = Window
+
+
+class Group(_Control):
+    pass
+
+
+class SearchBox(_Control):
+
+    def __init__(self, posSize=None, text="", **kwargs):
+        self._value = text
+
+
+class _ArrayController(object):
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def selectedObjects(self):
+        return [self._owner._items[index] for index in self._owner._selection]
+
+
+class _TableView(_Anything):
+
+    def __init__(self, owner):
+        self._dataSource = _ArrayController(owner)
+
+    def dataSource(self):
+        return self._dataSource
+
+    def reloadData(self):
+        pass
+
+
+class List(_Control):
+
+    def __init__(self, posSize, items, **kwargs):
+        self._items = list(items)
+        self._selection = []
+        self._tableView = _TableView(self)
+
+    def get(self):
+        return list(self._items)
+
+    def set(self, items):
+        self._items = list(items)
+        self._selection = []
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def getSelection(self):
+        return list(self._selection)
+
+    def setSelection(self, selection):
+        self._selection = [index for index in selection if index < len(self._items)]
+
+    def getNSTableView(self):
+        return self._tableView
+
+
+class _Anyclass(_Control):
+    pass
+
+
+Button = SquareButton = TextBox = EditText = CheckBox = SegmentedButton = HorizontalLine = SplitView = _Anyclass
@@ -0,0 +1,9 @@
+# stand-in for vanilla.dialogs, only used by the benchmarks
+
+
+def message(messageText="", informativeText="", alertStyle=None, parentWindow=None, resultCallback=None):
+    pass
+
+
+class BaseMessageDialog(object):
+    pass
@@ -0,0 +1,150 @@
+"""
+Synthetic extension streams for the benchmarks.
+
+A registry with `entries` repository extensions and an extension store
+stream, with an info.plist and a git ref advertisement for every
+repository and zip files for the first `zipCount` repositories.
+Everything is generated from a seed, so the benchmark processes can
+recreate the same registry without a server.
+"""
+
+import io
+import os
+import json
+import random
+import hashlib
+import zipfile
+import plistlib
+
+
+# the paths of the default stream urls, point their hosts to the server
+registryPath = "/mechanic-2-server/api/v2/registry.json"
+storePath = "/data.json"
+
+words = (
+    "glyph kerning spacing outline contour component anchor font family "
+    "interpolation designspace metrics preview proof export batch unicode "
+    "feature marks accents layers sketch drawing curve point grid guide"
+).split()
+
+
+class SyntheticRegistry(object):
+
+    def __init__(self, entries=1000, storeEntries=None, installedFraction=0.2, outdatedFraction=0.5, zipCount=50, zipSize=64 * 1024, developers=None, seed=1):
+        self.entries = entries
+        self.storeEntries = entries // 10 if storeEntries is None else storeEntries
+        self.installedFraction = installedFraction
+        self.outdatedFraction = outdatedFraction
+        self.zipCount = min(zipCount, entries)
+        self.zipSize = zipSize
+        self.developers = developers or max(1, entries // 20)
+        self.seed = seed
+        random_ = random.Random(seed)
+        installed = random_.sample(range(entries), int(entries * installedFraction))
+        self.installed = set(installed)
+        self.outdated = set(installed[:int(len(installed) * outdatedFraction)])
+        self._tags = [random_.sample(words, random_.randint(1, 4)) for index in range(entries)]
+
+    def options(self):
+        return dict(
+            entries=self.entries,
+            storeEntries=self.storeEntries,
+            installedFraction=self.installedFraction,
+            outdatedFraction=self.outdatedFraction,
+            zipCount=self.zipCount,
+            zipSize=self.zipSize,
+            developers=self.developers,
+            seed=self.seed,
+        )
+
+    # entries
+
+    def extensionName(self, index):
+        return "Extension%05d" % index
+
+    def bundleName(self, index):
+        return "%s.roboFontExt" % self.extensionName(index)
+
+    def repositoryPath(self, index):
+        return "/developer%03d/repository%05d" % (index % self.developers, index)
+
+    def remoteVersion(self, index):
+        return "2.0" if index in self.outdated else "1.0"
+
+    def installedVersion(self, index):
+        return "1.0" if index in self.installed else None
+
+    def registryEntry(self, index):
+        return dict(
+            extensionName=self.extensionName(index),
+            repository="https://github.com%s" % self.repositoryPath(index),
+            extensionPath=self.bundleName(index),
+            developer="Developer %s" % (index % self.developers),
+            developerURL="https://developer%03d.example.com" % (index % self.developers),
+            description="A synthetic %s extension." % " ".join(self._tags[index]),
+            tags=self._tags[index],
+        )
+
+    def storeEntry(self, index):
+        name = "StoreExtension%05d" % index
+        return dict(
+            extensionName=name,
+            version="1.%s" % (index % 10),
+            link="https://extensionstore.example.com/%s/" % name,
+            purchaseURL="https://extensionstore.example.com/%s/buy" % name,
+            developer="Store Developer %s" % (index % 10),
+            description="A synthetic store extension.",
+            tags=[words[index % len(words)]],
+            price="$%s" % (index % 50),
+        )
+
+    def registryData(self):
+        return json.dumps(dict(extensions=[self.registryEntry(index) for index in range(self.entries)])).encode("utf-8")
+
+    def storeData(self):
+        return json.dumps(dict(extensions=[self.storeEntry(index) for index in range(self.storeEntries)])).encode("utf-8")
+
+    def infoPlist(self, index, version):
+        return plistlib.dumps(dict(name=self.extensionName(index), version=version, developer="Developer %s" % (index % self.developers)))
+
+    def zipData(self, index):
+        random_ = random.Random(self.seed * 100003 + index)
+        prefix = "repository%05d-master/%s" % (index, self.bundleName(index))
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w", zipfile.ZIP_STORED) as zipFile:
+            zipFile.writestr("%s/info.plist" % prefix, self.infoPlist(index, self.remoteVersion(index)))
+            zipFile.writestr("%s/lib/main.py" % prefix, "print('%s')\n" % self.extensionName(index))
+            zipFile.writestr("%s/lib/payload.bin" % prefix, random_.getrandbits(8 * self.zipSize).to_bytes(self.zipSize, "little"))
+        return data.getvalue()
+
+    # server
+
+    def publish(self, server):
+        """
+        Add all files of the registry to a `StandInServer`.
+        Point the hosts of the default stream urls, `github.com` and
+        `raw.githubusercontent.com` to the server to use them.
+        """
+        server.addFile(registryPath, self.registryData())
+        server.addFile(storePath, self.storeData())
+        for index in range(self.entries):
+            repositoryPath = self.repositoryPath(index)
+            version = self.remoteVersion(index)
+            sha = hashlib.sha1(("%s %s" % (index, version)).encode("utf-8")).hexdigest()
+            for ref in ("master", sha):
+                server.addFile("%s/%s/%s/info.plist" % (repositoryPath, ref, self.bundleName(index)), self.infoPlist(index, version))
+            server.addRefs(repositoryPath, {"refs/heads/master": sha})
+        for index in range(self.zipCount):
+            server.addFile("%s/archive/master.zip" % self.repositoryPath(index), self.zipData(index))
+
+    # installed extensions
+
+    def installBundles(self, folder):
+        """
+        Create the installed extension bundles in `folder`.
+        """
+        for index in sorted(self.installed):
+            path = os.path.join(folder, self.bundleName(index))
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "info.plist"), "wb") as f:
+                f.write(self.infoPlist(index, self.installedVersion(index)))
@@ -0,0 +1,97 @@
+"""
+Measure the import time of the Mechanic startup script.
+
+Compares the modules imported by `startup.py` with the modules the startup
+script imported before it imported the ui lazily. Each scenario is imported
+in a fresh interpreter with `python -X importtime`, the time of an empty
+interpreter is subtracted.
+
+Run it with the python used by RoboFont, or provide stand-in modules for
+mojo, AppKit and vanilla with `--path`:
+
+    python measureStartupImports.py --python path/to/python --path path/to/stubs
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+from collections import OrderedDict
+
+
+libFolder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Mechanic2.roboFontExt", "lib")
+
+scenarios = OrderedDict([
+    ("eager", [
+        "yaml",
+        "vanilla.dialogs",
+        "mojo.tools",
+        "mojo.events",
+        "mojo.extensions",
+        "mechanic2.extensionItem",
+        "mechanic2.ui.controller",
+    ]),
+    ("lazy", [
+        "mojo.tools",
+        "mojo.events",
+        "mojo.extensions",
+        "mechanic2.defaults",
+    ]),
+])
+
+
+def importTimes(modules, python=sys.executable, paths=()):
+    """
+    Return a dict with the module names and the self import time in microseconds
+    of all modules imported when importing the given `modules`.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(list(paths) + [libFolder])
+    code = "; ".join("import %s" % module for module in modules) or "pass"
+    result = subprocess.run([python, "-X", "importtime", "-c", code], env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True)
+    if result.returncode != 0:
+        traceback = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("Cannot import %s:\n%s" % (", ".join(modules), "\n".join(traceback)))
+    times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(selfTime)
+    return times
+
+
+def measureImports(modules, python=sys.executable, paths=(), repeat=5):
+    """
+    Return the median import time in milliseconds and the amount of imported modules,
+    without the modules imported by an empty interpreter.
+    """
+    baseline = importTimes([], python, paths)
+    totals = []
+    for _ in range(repeat):
+        times = importTimes(modules, python, paths)
+        totals.append(sum(value for name, value in times.items() if name not in baseline))
+    imported = [name for name in times if name not in baseline]
+    slowest = sorted(imported, key=lambda name: times[name], reverse=True)[:10]
+    return statistics.median(totals) / 1000.0, len(imported), [(name, times[name] / 1000.0) for name in slowest]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure the import time of the Mechanic startup script.")
+    parser.add_argument("--python", default=sys.executable, help="The python interpreter to measure with.")
+    parser.add_argument("--path", action="append", default=[], help="Extra folders to import from, like stand-in modules.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = OrderedDict()
+    for name, modules in scenarios.items():
+        results[name] = measureImports(modules, python=args.python, paths=args.path, repeat=args.repeat)
+        milliseconds, count, slowest = results[name]
+        print("%s: %.1f ms, %s modules" % (name, milliseconds, count))
+        for moduleName, moduleMilliseconds in slowest:
+            print("    %8.1f ms  %s" % (moduleMilliseconds, moduleName))
+    eager = results["eager"][0]
+    lazy = results["lazy"][0]
+    print("saved: %.1f ms (%.0f%%)" % (eager - lazy, (eager - lazy) / eager * 100 if eager else 0))
@@ -0,0 +1,249 @@
+"""
+A local stand-in for the http services Mechanic talks to.
+
+Serves in memory files with support for range requests, If-Range and etags,
+and counts requests and bytes, so fetch code can be exercised offline.
+
+    server = StandInServer()
+    server.addFile("/owner/repo/archive/master.zip", data)
+    server.start()
+    url = server.url("/owner/repo/archive/master.zip")
+    ...
+    server.stop()
+
+Repository heads are served as git smart http ref advertisements:
+
+    server.addRefs("/owner/repo", {"refs/heads/master": sha})
+
+Point the connection pool at the server to stand in for a real host:
+
+    sharedConnectionPool.setHostAlias("github.com", server.url())
+
+Run it as a script to serve a folder:
+
+    python standInServer.py path/to/folder --port 8000
+"""
+
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+import http.server
+from urllib.parse import urlsplit
+
+
+rangeRE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def pktLine(data):
+    if data is None:
+        return b"0000"
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return b"%04x" % (len(data) + 4) + data
+
+
+def refsAdvertisement(refs, service="git-upload-pack"):
+    """
+    Return the body of a git smart http ref advertisement for a dict of refs and commit shas.
+    """
+    lines = [pktLine("# service=%s\n" % service), pktLine(None)]
+    for index, (ref, sha) in enumerate(sorted(refs.items())):
+        line = "%s %s" % (sha, ref)
+        if index == 0:
+            line += "\0multi_ack side-band-64k"
+        lines.append(pktLine(line + "\n"))
+    lines.append(pktLine(None))
+    return b"".join(lines)
+
+
+class StandInServer(object):
+
+    def __init__(self, host="127.0.0.1", port=0, supportsRanges=True, latency=0, failureRate=0):
+        self.supportsRanges = supportsRanges
+        self.latency = latency
+        self.failureRate = failureRate
+        self.files = dict()
+        self.handlers = dict()
+        self.requests = []
+        self.bytesSent = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handlerClass())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    # files
+
+    def addFile(self, path, data, etag=True):
+        """
+        Serve `data` at `path`, optionally with an etag.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        headers = dict()
+        if etag:
+            headers["ETag"] = '"%s"' % hashlib.sha1(data).hexdigest()
+        self.files[path] = (data, headers)
+
+    def addHandler(self, path, callback):
+        """
+        Serve the result of `callback(path, headers)` at `path`,
+        the callback must return a `(status, headers, body)` tuple.
+        """
+        self.handlers[path] = callback
+
+    def addRefs(self, repositoryPath, refs):
+        """
+        Serve the `refs` dict of a repository at `<repositoryPath>.git/info/refs`.
+        """
+        self.addFile("%s.git/info/refs" % repositoryPath, refsAdvertisement(refs), etag=False)
+
+    def removeFile(self, path):
+        self.files.pop(path, None)
+        self.handlers.pop(path, None)
+
+    # server
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, path=""):
+        host, port = self._server.server_address[:2]
+        return "http://%s:%s%s" % (host, port, path)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def requestCount(self):
+        return len(self.requests)
+
+    def resetCounters(self):
+        with self._lock:
+            self.requests = []
+            self.bytesSent = 0
+
+    # helpers
+
+    def _response(self, method, path, headers):
+        with self._lock:
+            self.requests.append((method, path, headers.get("Range")))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failureRate and random.random() < self.failureRate:
+            return 503, dict(), b"Service Unavailable"
+        route = urlsplit(path).path
+        if path in self.handlers or route in self.handlers:
+            callback = self.handlers.get(path, self.handlers.get(route))
+            return callback(path, headers)
+        if path in self.files:
+            data, fileHeaders = self.files[path]
+        elif route in self.files:
+            data, fileHeaders = self.files[route]
+        else:
+            return 404, dict(), b"Not Found"
+        responseHeaders = dict(fileHeaders)
+        etag = fileHeaders.get("ETag")
+        if etag and headers.get("If-None-Match") == etag:
+            return 304, responseHeaders, b""
+        if self.supportsRanges:
+            responseHeaders["Accept-Ranges"] = "bytes"
+            match = rangeRE.match(headers.get("Range", "").strip())
+            ifRange = headers.get("If-Range")
+            if match and ifRange is not None and ifRange != etag:
+                # the file changed, send all of it
+                match = None
+            if match:
+                start, end = match.groups()
+                size = len(data)
+                if not start:
+                    # suffix range
+                    start = max(0, size - int(end))
+                    end = size - 1
+                else:
+                    start = int(start)
+                    end = min(size - 1, int(end)) if end else size - 1
+                if start >= size or start > end:
+                    responseHeaders["Content-Range"] = "bytes */%s" % size
+                    return 416, responseHeaders, b""
+                responseHeaders["Content-Range"] = "bytes %s-%s/%s" % (start, end, size)
+                return 206, responseHeaders, data[start:end + 1]
+        return 200, responseHeaders, data
+
+    def _handlerClass(self):
+        server = self
+
+        class StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._respond(sendBody=True)
+
+            def do_HEAD(self):
+                self._respond(sendBody=False)
+
+            def _respond(self, sendBody):
+                status, headers, body = server._response(self.command, self.path, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if sendBody and body and status != 304:
+                    # count before writing, the client can continue before this thread does
+                    with server._lock:
+                        server.bytesSent += len(body)
+                    try:
+                        self.wfile.write(body)
+                    except (ConnectionResetError, BrokenPipeError):
+                        # the client stopped reading, like after a refused range request
+                        with server._lock:
+                            server.bytesSent -= len(body)
+                        self.close_connection = True
+
+        return StandInRequestHandler
+
+
+def serveFolder(folder, port=8000, **kwargs):
+    """
+    Serve all files in a folder, with their paths relative to the folder.
+    """
+    server = StandInServer(port=port, **kwargs)
+    for root, dirs, files in os.walk(folder):
+        for fileName in files:
+            path = os.path.join(root, fileName)
+            with open(path, "rb") as f:
+                server.addFile("/" + os.path.relpath(path, folder).replace(os.sep, "/"), f.read())
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a folder with a local Mechanic stand-in server.")
+    parser.add_argument("folder")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--no-ranges", action="store_true")
+    args = parser.parse_args()
+
+    server = serveFolder(args.folder, port=args.port, latency=args.latency, failureRate=args.failure_rate, supportsRanges=not args.no_ranges)
+    print("Serving '%s' at %s" % (args.folder, server.url()))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass